@@ -0,0 +1,189 @@
+# consumers/api_auth.py
+"""
+Token authentication for the field app API.
+
+The Android app logs in through api_login and sends the returned session
+key as a bearer token (Authorization: Bearer <token>, or a "token" field
+in the JSON body for older app builds). Resolving it used to cost a
+Session lookup, a session decode and a User lookup on every call.
+
+Tokens are now resolved through two cache layers:
+
+1. An in-process LRU (API_TOKEN_LRU_SIZE entries) holding the User, kept
+   for at most API_TOKEN_LRU_TIMEOUT seconds so revocations made by
+   other workers are picked up quickly.
+2. The shared Django cache (api_token:<sha256>) holding the user ID,
+   kept for API_TOKEN_CACHE_TIMEOUT seconds.
+
+Neither layer outlives the session's own expire_date. ApiTokenMiddleware
+(consumers/middleware.py) resolves the token once per API request and
+attaches request.api_user; api_logout calls revoke_token().
+"""
+
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+TOKEN_CACHE_KEY = 'api_token:{digest}'
+
+
+class _TokenLRU:
+    """Thread-safe LRU of token digest -> (user, expires_at monotonic seconds)."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def set(self, digest, user, ttl):
+        max_size = getattr(django_settings, 'API_TOKEN_LRU_SIZE', 1024)
+        with self._lock:
+            self._entries[digest] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_token_lru = _TokenLRU()
+
+
+def _digest(token) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def get_request_token(request):
+    """
+    Return the API token sent with a request, or None.
+
+    The Authorization header is preferred. The JSON body is only parsed
+    when there is no header, for app builds that send {"token": ...};
+    multipart uploads may carry a "token" form field instead.
+    """
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[7:].strip() or None
+
+    if request.content_type == 'multipart/form-data':
+        return request.POST.get('token') or None
+
+    # Older app builds don't always send a JSON content type
+    if request.body.lstrip()[:1] == b'{':
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if isinstance(data, dict) and data.get('token'):
+            return str(data['token'])
+    return None
+
+
+def resolve_token(token):
+    """
+    Return the active User a token (session key) belongs to, or None.
+
+    Args:
+        token: Session key returned by api_login
+
+    Returns:
+        User instance, or None if the token is unknown, expired or the
+        user is inactive
+
+    Example:
+        >>> user = resolve_token(request.headers['Authorization'][7:])
+    """
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.models import Session
+
+    if not token:
+        return None
+
+    digest = _digest(token)
+    user = _token_lru.get(digest)
+    if user is not None:
+        # Requests may run concurrently in other threads; don't share one instance
+        return copy.copy(user)
+
+    now = timezone.now()
+    cache_key = TOKEN_CACHE_KEY.format(digest=digest)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        user_id, expire_date = cached
+    else:
+        try:
+            session = Session.objects.get(session_key=token, expire_date__gt=now)
+        except Session.DoesNotExist:
+            return None
+        user_id = session.get_decoded().get('_auth_user_id')
+        if not user_id:
+            return None
+        expire_date = session.expire_date
+
+    # Never cache past the session's own expiry
+    remaining = int((expire_date - now).total_seconds())
+    if remaining <= 0:
+        cache.delete(cache_key)
+        return None
+
+    user = User.objects.filter(id=user_id, is_active=True).first()
+    if user is None:
+        cache.delete(cache_key)
+        return None
+
+    if cached is None:
+        shared_timeout = min(remaining, getattr(django_settings, 'API_TOKEN_CACHE_TIMEOUT', 300))
+        cache.set(cache_key, (user_id, expire_date), shared_timeout)
+    _token_lru.set(digest, user, min(remaining, getattr(django_settings, 'API_TOKEN_LRU_TIMEOUT', 30)))
+    return user
+
+
+def authenticate_api_request(request):
+    """
+    Authenticate API request using session token from Authorization header or request body.
+    Returns the user if authenticated, None otherwise.
+
+    Uses request.api_user when ApiTokenMiddleware already resolved it.
+    """
+    if hasattr(request, 'api_user'):
+        return request.api_user
+    return resolve_token(get_request_token(request))
+
+
+def revoke_token(token) -> None:
+    """
+    Revoke an API token: delete its session and drop it from both cache layers.
+
+    Other workers' in-process LRU entries expire within API_TOKEN_LRU_TIMEOUT.
+    """
+    from django.contrib.sessions.models import Session
+
+    if not token:
+        return
+    digest = _digest(token)
+    _token_lru.discard(digest)
+    cache.delete(TOKEN_CACHE_KEY.format(digest=digest))
+    Session.objects.filter(session_key=token).delete()
@@ -0,0 +1,107 @@
+# consumers/api_encoding.py
+"""
+Compact encodings for the field app's list endpoints.
+
+api_consumers, api_get_consumer_bills and api_get_pending_readings return
+one JSON object per row, repeating every key and several derived aliases
+(name, address, previous_reading...). Over rural mobile links that is most
+of the payload.
+
+Clients opt into a compact encoding with the Accept header:
+
+- application/json (default): the original row objects, unchanged
+- application/vnd.waterworks.columnar+json: rows as columns, aliases dropped
+- application/msgpack: the columnar layout as MessagePack (only offered
+  when the msgpack package is installed)
+
+Columnar layout:
+    {"count": 2, "columns": {"id": [1, 2], "first_name": ["Juan", "Ana"], ...}}
+
+Responses above API_COMPRESSION_MIN_SIZE are additionally compressed by
+ApiCompressionMiddleware (consumers/middleware.py).
+"""
+
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import msgpack  # type: ignore
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+
+JSON_MEDIA_TYPE = 'application/json'
+COLUMNAR_MEDIA_TYPE = 'application/vnd.waterworks.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def to_columns(rows, drop=()) -> dict:
+    """
+    Convert a list of row dicts sharing the same keys to the columnar layout.
+
+    Args:
+        rows: List of dicts
+        drop: Keys to leave out (aliases the client can derive)
+
+    Returns:
+        Dictionary with 'count' and 'columns' (key -> list of values)
+
+    Example:
+        >>> to_columns([{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}], drop=('name',))
+        {'count': 2, 'columns': {'id': [1, 2]}}
+    """
+    keys = [key for key in rows[0] if key not in drop] if rows else []
+    return {
+        'count': len(rows),
+        'columns': {key: [row[key] for row in rows] for key in keys},
+    }
+
+
+def negotiate_media_type(request) -> str:
+    """Return the response media type the client prefers among those available."""
+    offered = [JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE]
+    if MSGPACK_AVAILABLE:
+        offered.append(MSGPACK_MEDIA_TYPE)
+    # JSON is listed first, so */* and a missing Accept header keep the original format
+    return request.get_preferred_type(offered) or JSON_MEDIA_TYPE
+
+
+def negotiated_response(request, payload, rows_key=None, aliases=(), status=200):
+    """
+    Build a response for a list payload in the encoding the client asked for.
+
+    Args:
+        request: The HttpRequest (its Accept header selects the encoding)
+        payload: List of row dicts, or a dict holding the rows under rows_key
+        rows_key: Key of the row list when payload is a dict
+        aliases: Row keys dropped from compact encodings
+        status: HTTP status code
+
+    Returns:
+        JsonResponse, or an HttpResponse with the columnar JSON or MessagePack body
+
+    Example:
+        >>> return negotiated_response(request, data, aliases=('name', 'address'))
+    """
+    media_type = negotiate_media_type(request)
+
+    if media_type == JSON_MEDIA_TYPE:
+        response = JsonResponse(payload, safe=False, status=status)
+    else:
+        if rows_key is None:
+            body = to_columns(payload, drop=aliases)
+        else:
+            body = dict(payload, **{rows_key: to_columns(payload[rows_key], drop=aliases)})
+
+        if media_type == MSGPACK_MEDIA_TYPE:
+            content = msgpack.packb(body, default=DjangoJSONEncoder().default, use_bin_type=True)
+        else:
+            content = json.dumps(body, cls=DjangoJSONEncoder, separators=(',', ':'))
+        response = HttpResponse(content, content_type=media_type, status=status)
+
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -0,0 +1,115 @@
+# consumers/badges.py
+"""
+Cached notification badge state for the navbar and sidebar.
+
+The notifications context processor runs on every HTML page, so its
+queries are served from the cache with a single get_many():
+
+- notif_badge:user:<id>  Per-user summary (10 latest unread + unread count)
+- notif_badge:generation Token replaced whenever a global notification
+                         (user=None) changes; per-user summaries stamped
+                         with an older token are treated as stale
+- pending_proof_count    Global count of app_manual readings awaiting review
+
+Writes to Notification and MeterReading invalidate the affected keys
+(see consumers/signals.py). Queryset update() calls bypass signals and
+must call the invalidate helpers themselves.
+"""
+
+import time
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import models as django_models
+from django.db import transaction
+
+
+USER_SUMMARY_KEY = 'notif_badge:user:{user_id}'
+GENERATION_KEY = 'notif_badge:generation'
+PENDING_PROOF_KEY = 'pending_proof_count'
+
+
+def _timeout() -> int:
+    return getattr(django_settings, 'NOTIFICATION_BADGE_CACHE_TIMEOUT', 300)
+
+
+def _user_summary(user, generation) -> dict:
+    from .models import Notification
+
+    unread = Notification.objects.filter(
+        is_read=False,
+        is_archived=False
+    ).filter(
+        django_models.Q(user=user) | django_models.Q(user__isnull=True)
+    )
+    return {
+        'generation': generation,
+        'unread_notifications': list(unread.order_by('-created_at')[:10]),  # Limit to 10 most recent
+        'unread_notifications_count': unread.count(),
+    }
+
+
+def _pending_proof_count() -> int:
+    from .models import MeterReading
+
+    return MeterReading.objects.filter(
+        is_confirmed=False,
+        is_rejected=False,
+        source='app_manual'  # Manual entry from Smart Meter Reader app
+    ).count()
+
+
+def get_badge_state(user, include_notifications=True) -> dict:
+    """
+    Return the notification badge context for a user.
+
+    Args:
+        user: Authenticated User
+        include_notifications: Whether to load the unread notification
+            summary (admins only); otherwise only the pending proof count
+
+    Returns:
+        Dictionary with unread_notifications, unread_notifications_count
+        and pending_proof_readings_count
+    """
+    user_key = USER_SUMMARY_KEY.format(user_id=user.pk)
+    cached = cache.get_many([user_key, GENERATION_KEY, PENDING_PROOF_KEY])
+
+    pending_proof_count = cached.get(PENDING_PROOF_KEY)
+    if pending_proof_count is None:
+        pending_proof_count = _pending_proof_count()
+        cache.set(PENDING_PROOF_KEY, pending_proof_count, _timeout())
+
+    if not include_notifications:
+        return {
+            'unread_notifications': [],
+            'unread_notifications_count': 0,
+            'pending_proof_readings_count': pending_proof_count,
+        }
+
+    generation = cached.get(GENERATION_KEY)
+    summary = cached.get(user_key)
+    if summary is None or summary['generation'] != generation:
+        summary = _user_summary(user, generation)
+        cache.set(user_key, summary, _timeout())
+
+    return {
+        'unread_notifications': summary['unread_notifications'],
+        'unread_notifications_count': summary['unread_notifications_count'],
+        'pending_proof_readings_count': pending_proof_count,
+    }
+
+
+def invalidate_user_notifications(user_id) -> None:
+    """Drop one user's cached notification summary once the current transaction commits."""
+    key = USER_SUMMARY_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_all_notifications() -> None:
+    """Mark every cached notification summary stale once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, time.time_ns(), None))
+
+
+def invalidate_pending_proof_count() -> None:
+    """Drop the cached pending proof count once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete(PENDING_PROOF_KEY))
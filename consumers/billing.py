@@ -0,0 +1,190 @@
+# consumers/billing.py
+"""
+Bulk billing run engine for the Balilihan Waterworks Management System.
+
+Confirms many meter readings and generates their bills in a fixed number
+of queries, instead of 4+ round trips per reading:
+
+1. One query loads the target readings annotated with the id of their
+   previous confirmed reading (an index seek on reading_latest_idx per
+   row), and one more query loads those previous readings.
+2. One settings snapshot prices every reading in a single batch
+   (see utils.calculate_tiered_water_bills).
+3. All Bill rows are written with bulk_create and all readings are
+   flipped to confirmed with one bulk_update, inside a transaction.
+   The affected MonthlyRollup buckets are refreshed once it commits.
+"""
+
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+def _previous_reading_id_subquery():
+    """Subquery returning the id of the latest confirmed reading before the outer reading."""
+    from .models import MeterReading
+
+    return Subquery(
+        MeterReading.objects.filter(
+            consumer=OuterRef('consumer'),
+            is_confirmed=True,
+            reading_date__lt=OuterRef('reading_date')
+        ).order_by('-reading_date', '-created_at').values('id')[:1]
+    )
+
+
+def generate_bills_for_readings(readings, confirmed_by=None, settings=None, senior_citizen_discount=False) -> dict:
+    """
+    Confirm unconfirmed meter readings and generate one Pending bill for each.
+
+    Readings that fail validation are not confirmed and are reported back
+    as rejects instead of being silently skipped.
+
+    Args:
+        readings: MeterReading queryset of readings to confirm. Already
+            confirmed or rejected readings are ignored.
+        confirmed_by: Optional User recorded as the confirming admin
+        settings: Optional SystemSetting or SettingsSnapshot (defaults to the cached snapshot)
+        senior_citizen_discount: Apply the 5% senior citizen discount to
+            bills of 30 m³ or less, as the mobile submission endpoint does
+
+    Returns:
+        Dictionary with:
+        - confirmed_count: Number of readings confirmed and billed
+        - bills: List of created Bill instances
+        - rejects: List of dicts with reading_id, consumer_id and reason
+
+    Example:
+        >>> result = generate_bills_for_readings(
+        ...     MeterReading.objects.filter(consumer__barangay=barangay),
+        ...     confirmed_by=request.user
+        ... )
+        >>> print(f"{result['confirmed_count']} billed, {len(result['rejects'])} rejected")
+    """
+    from .models import Bill, MeterReading
+    from .settings_cache import get_settings_snapshot
+    from .utils import compile_tier_rate_table, calculate_tiered_water_bills, tiered_bill_breakdown
+    from .rollups import bill_bucket, schedule_rollup_refresh
+    from .kpis import invalidate_dashboard_kpis
+    from .badges import invalidate_pending_proof_count
+
+    if settings is None:
+        settings = get_settings_snapshot()
+
+    billing_day = settings.billing_day_of_month if settings else 1
+    due_day = settings.due_day_of_month if settings else 20
+
+    with transaction.atomic():
+        # Lock the target readings so two admins cannot bill the same reading twice
+        target_readings = list(
+            readings.filter(is_confirmed=False, is_rejected=False)
+            .select_related('consumer')
+            .select_for_update(of=('self',))
+            .annotate(prev_reading_id=_previous_reading_id_subquery())
+            .order_by('consumer_id', 'reading_date', 'created_at')
+        )
+        previous_readings = MeterReading.objects.only('id', 'reading_date', 'reading_value').in_bulk(
+            {reading.prev_reading_id for reading in target_readings if reading.prev_reading_id}
+        )
+
+        # Resolve consumption and collect rejects
+        to_bill = []
+        rejects = []
+        last_billed = {}  # consumer_id -> reading billed earlier in this run
+        for reading in target_readings:
+            prev = previous_readings.get(reading.prev_reading_id)
+
+            # A reading confirmed earlier in this run supersedes the stored previous reading
+            earlier = last_billed.get(reading.consumer_id)
+            if earlier and earlier.reading_date < reading.reading_date and (
+                    prev is None or earlier.reading_date >= prev.reading_date):
+                prev = earlier
+
+            if prev:
+                baseline = prev.reading_value
+                label = 'previous'
+            else:
+                # First reading for this consumer - use consumer's first_reading as baseline
+                baseline = reading.consumer.first_reading or 0
+                label = 'initial'
+
+            if reading.reading_value < baseline:
+                rejects.append({
+                    'reading_id': reading.id,
+                    'consumer_id': reading.consumer_id,
+                    'reason': f"Current reading ({reading.reading_value}) cannot be less than {label} ({baseline}).",
+                })
+                continue
+
+            to_bill.append((reading, prev, reading.reading_value - baseline))
+            last_billed[reading.consumer_id] = reading
+
+        # Price every reading with one settings snapshot
+        batch = calculate_tiered_water_bills(
+            [consumption for _, _, consumption in to_bill],
+            [reading.consumer.usage_type for reading, _, _ in to_bill],
+            rate_table=compile_tier_rate_table(settings)
+        )
+
+        bills = []
+        for index, (reading, prev, consumption) in enumerate(to_bill):
+            breakdown = tiered_bill_breakdown(batch, index)
+            sc_discount = Decimal('0.00')
+            if senior_citizen_discount and reading.consumer.is_senior_citizen and consumption <= 30:
+                sc_discount = (breakdown['total_amount'] * Decimal('5') / Decimal('100')).quantize(Decimal('0.01'))
+            bills.append(Bill(
+                consumer_id=reading.consumer_id,
+                previous_reading=prev,
+                current_reading=reading,
+                billing_period=reading.reading_date.replace(day=billing_day),
+                due_date=reading.reading_date.replace(day=due_day),
+                consumption=consumption,
+                tier1_consumption=breakdown['tier1_units'],
+                tier1_amount=breakdown['tier1_amount'],
+                tier2_consumption=breakdown['tier2_units'],
+                tier2_rate=breakdown['tier2_rate'],
+                tier2_amount=breakdown['tier2_amount'],
+                tier3_consumption=breakdown['tier3_units'],
+                tier3_rate=breakdown['tier3_rate'],
+                tier3_amount=breakdown['tier3_amount'],
+                tier4_consumption=breakdown['tier4_units'],
+                tier4_rate=breakdown['tier4_rate'],
+                tier4_amount=breakdown['tier4_amount'],
+                tier5_consumption=breakdown['tier5_units'],
+                tier5_rate=breakdown['tier5_rate'],
+                tier5_amount=breakdown['tier5_amount'],
+                rate_per_cubic=breakdown['average_rate'],
+                fixed_charge=Decimal('0.00'),
+                total_amount=breakdown['total_amount'],
+                senior_citizen_discount=sc_discount,
+                status='Pending'
+            ))
+
+        Bill.objects.bulk_create(bills, batch_size=500)
+
+        # bulk_create skips model signals, so refresh the monthly rollups here
+        schedule_rollup_refresh(
+            bill_bucket(bill, reading.consumer) for bill, (reading, _, _) in zip(bills, to_bill)
+        )
+        if bills:
+            invalidate_dashboard_kpis()
+
+        # Flip all billed readings to confirmed in one statement
+        now = timezone.now()
+        confirmed_readings = [reading for reading, _, _ in to_bill]
+        for reading in confirmed_readings:
+            reading.is_confirmed = True
+            reading.confirmed_by = confirmed_by
+            reading.confirmed_at = now
+        MeterReading.objects.bulk_update(
+            confirmed_readings, ['is_confirmed', 'confirmed_by', 'confirmed_at'], batch_size=500
+        )
+        if confirmed_readings:
+            invalidate_pending_proof_count()
+
+    return {
+        'confirmed_count': len(confirmed_readings),
+        'bills': bills,
+        'rejects': rejects,
+    }
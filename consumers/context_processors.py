@@ -2,16 +2,16 @@
 """
 Context processors to make data available to all templates.
 """
-from django.db import models as django_models
-from .models import Notification, MeterReading
+from .badges import get_badge_state
 
 
 def notifications(request):
     """
     Add unread notifications to template context for authenticated users.
     Only shows notifications for admins and superusers.
-    Auto-archives notifications older than 30 days.
+    Old notifications are archived by the run_maintenance command, not here.
     Also provides count of pending proof readings for sidebar badge.
+    Both are served from the cache (see consumers.badges).
     """
     if request.user.is_authenticated:
         # Check if user is admin or superuser
@@ -26,51 +26,9 @@ def notifications(request):
             request.user.staffprofile.role == 'cashier'
         )
 
-        if is_admin:
-            # Auto-archive old notifications (older than 30 days)
-            Notification.archive_old_notifications()
-
-            # Get unread, non-archived notifications for this user or global notifications
-            unread_notifications = Notification.objects.filter(
-                is_read=False,
-                is_archived=False
-            ).filter(
-                django_models.Q(user=request.user) | django_models.Q(user__isnull=True)
-            ).order_by('-created_at')[:10]  # Limit to 10 most recent
-
-            unread_count = Notification.objects.filter(
-                is_read=False,
-                is_archived=False
-            ).filter(
-                django_models.Q(user=request.user) | django_models.Q(user__isnull=True)
-            ).count()
-
-            # Count pending proof readings for sidebar badge
-            pending_proof_count = MeterReading.objects.filter(
-                is_confirmed=False,
-                is_rejected=False,
-                source='app_manual'  # Manual entry from Smart Meter Reader app
-            ).count()
-
-            return {
-                'unread_notifications': unread_notifications,
-                'unread_notifications_count': unread_count,
-                'pending_proof_readings_count': pending_proof_count
-            }
-
-        elif is_staff:
-            # Staff members can see pending proof readings count
-            pending_proof_count = MeterReading.objects.filter(
-                is_confirmed=False,
-                is_rejected=False,
-                source='app_manual'  # Manual entry from Smart Meter Reader app
-            ).count()
-
-            return {
-                'unread_notifications': [],
-                'unread_notifications_count': 0,
-                'pending_proof_readings_count': pending_proof_count
-            }
+        if is_admin or is_staff:
+            # Admins see notifications; staff members only the pending proof readings count
+            return get_badge_state(request.user, include_notifications=is_admin)
 
     return {
         'unread_notifications': [],
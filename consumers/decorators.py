@@ -16,6 +16,7 @@ from django.shortcuts import render
 from django.contrib import messages
 from django.shortcuts import redirect
 from django.utils import timezone
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -560,6 +561,88 @@ def api_rate_limit(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+
+def get_api_caller(request):
+    """Return the user behind a request (session login or API token), or None."""
+    from .api_auth import authenticate_api_request
+
+    if request.user.is_authenticated:
+        return request.user
+    return authenticate_api_request(request)
+
+
+def api_caller_authenticated(request):
+    """authorize check for @idempotent: the caller is logged in or sent a valid API token."""
+    return get_api_caller(request) is not None
+
+
+def idempotent(scope, authorize=None):
+    """
+    Decorator making a JSON API endpoint replay-safe with idempotency keys.
+
+    When the request carries an Idempotency-Key header (or an
+    idempotency_key field in its JSON body) that was already processed,
+    the stored response is returned without calling the view. Otherwise
+    the view runs in a transaction and its 2xx response is stored with
+    the key, so a retry after a timeout cannot write twice.
+
+    Args:
+        scope: Name of the endpoint the keys belong to
+        authorize: Optional callable(request) -> bool. Stored responses are
+            only consulted for authorized requests; the view handles the rest.
+            Endpoints called by users must pass one (see api_caller_authenticated),
+            so a replay never skips authentication.
+
+    Keys are stored per caller (the session or API token user), so another
+    user reusing a key runs the view instead of receiving the stored response.
+
+    Usage:
+        @csrf_exempt
+        @idempotent('submit_reading', authorize=api_caller_authenticated)
+        def api_submit_reading(request):
+            ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            from django.db import IntegrityError, transaction
+            from .idempotency import get_request_key, get_stored_response, store_response
+
+            if request.method != 'POST' or (authorize and not authorize(request)):
+                return view_func(request, *args, **kwargs)
+            key = get_request_key(request)
+            if not key:
+                return view_func(request, *args, **kwargs)
+
+            user = get_api_caller(request)
+
+            def replay(stored):
+                response = JsonResponse(stored)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            stored = get_stored_response(scope, key, user=user)
+            if stored is not None:
+                return replay(stored)
+
+            try:
+                with transaction.atomic():
+                    response = view_func(request, *args, **kwargs)
+                    if 200 <= response.status_code < 300:
+                        store_response(scope, key, json.loads(response.content), user=user)
+                    elif response.status_code >= 500:
+                        # Don't keep half of a failed submission
+                        transaction.set_rollback(True)
+            except IntegrityError:
+                # A concurrent request with the same key committed first
+                stored = get_stored_response(scope, key, user=user)
+                if stored is None:
+                    return JsonResponse({'error': 'Request is already being processed. Retry shortly.'}, status=409)
+                return replay(stored)
+            return response
+        return wrapper
+    return decorator
+
 # ========================================================================================
 # ROLE-BASED ACCESS CONTROL DECORATORS - User Management & Dashboard System
 # ========================================================================================
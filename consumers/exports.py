@@ -0,0 +1,246 @@
+# consumers/exports.py
+"""
+Streaming report exports for the Balilihan Waterworks Management System.
+
+The Excel exports used to build a whole openpyxl workbook in memory, walk
+every cell again for borders, number formats and column widths, and
+return the bytes in a plain HttpResponse. A full-year revenue export held
+several copies of the data at once.
+
+stream_excel() instead writes the sheet with xlsxwriter in constant-memory
+mode: each row is flushed to a temporary file as soon as it is written,
+styling is set once per column, and the finished file is streamed to the
+client from disk by a FileResponse (a StreamingHttpResponse). Memory stays
+flat however many rows are exported.
+
+CSV needs no temporary file: stream_csv() formats each row as the client
+reads it. Fed from queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), rows
+come from a server-side cursor on PostgreSQL, so the first bytes go out
+before the query has been read to the end.
+
+Database backups go through write_fixture(), which serializes a table
+row by row straight into a ZIP member, so no table is ever held in memory.
+"""
+
+import csv
+import io
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+from django.core import serializers
+from django.http import FileResponse, StreamingHttpResponse
+
+import xlsxwriter
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows fetched per round trip by queryset.iterator() in streamed exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Fixture formats loaddata understands: one JSON array, or one object per line
+FIXTURE_FORMATS = ('json', 'jsonl')
+
+# Logo is scaled to this many pixels square
+LOGO_SIZE = 60
+
+HEADER_COLOR = '#4472C4'
+TOTAL_COLOR = '#E7E6E6'
+
+# Cell formats by ExcelColumn.style
+COLUMN_STYLES = {
+    'text': {'align': 'left'},
+    'center': {'align': 'center'},
+    'number': {'align': 'center', 'num_format': '0'},
+    'money': {'align': 'right', 'num_format': '₱#,##0.00'},
+}
+
+# Title line formats by style name
+TITLE_STYLES = {
+    'title': {'bold': True, 'font_size': 14},
+    'heading': {'bold': True, 'font_size': 16, 'font_color': '#003366', 'align': 'center', 'valign': 'vcenter'},
+    'subheading': {'bold': True, 'font_size': 11, 'font_color': '#0055AA', 'align': 'center', 'valign': 'vcenter'},
+    'centered': {'align': 'center'},
+    'note': {'font_size': 9, 'font_color': '#666666', 'align': 'center'},
+    'plain': {},
+}
+
+
+@dataclass(frozen=True)
+class ExcelColumn:
+    """One column of an exported sheet: header, width (characters) and style (see COLUMN_STYLES)."""
+    header: str
+    width: int = 14
+    style: str = 'text'
+
+
+@dataclass(frozen=True)
+class TitleLine:
+    """
+    A line above the table header.
+
+    first_col/last_col (0-based) merge the line across columns when they differ;
+    height is the row height in points (None keeps the default).
+    """
+    text: str
+    style: str = 'plain'
+    first_col: int = 0
+    last_col: int = 0
+    height: Optional[float] = None
+
+
+def stream_excel(filename, sheet_name, columns, rows, title_lines=(), totals=None,
+                 logo_path=None, border=True) -> FileResponse:
+    """
+    Write a single-sheet report in constant memory and stream it as an .xlsx download.
+
+    Args:
+        filename: Download file name
+        sheet_name: Worksheet name (truncated to Excel's 31 characters)
+        columns: List of ExcelColumn, one per value in each row
+        rows: Iterable of row value lists; a generator keeps memory flat
+        title_lines: TitleLine entries written above the header, followed
+            by a blank row
+        totals: Optional callable returning the totals row, called after
+            every row was written (so generators can accumulate totals)
+        logo_path: Optional image inserted at A1
+        border: Draw thin borders around header, data and totals cells
+
+    Returns:
+        FileResponse streaming the workbook from a temporary file
+
+    Example:
+        >>> return stream_excel(
+        ...     'Readings.xlsx', 'Readings',
+        ...     [ExcelColumn('ID Number', 15), ExcelColumn('Current', 12, 'number')],
+        ...     ([r.consumer.id_number, r.reading_value] for r in readings.iterator()),
+        ... )
+    """
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(sheet_name[:31])
+
+    border_props = {'border': 1} if border else {}
+    header_format = workbook.add_format({
+        'bold': True, 'font_color': '#FFFFFF', 'bg_color': HEADER_COLOR,
+        'align': 'center', 'valign': 'vcenter', **border_props
+    })
+    column_formats = [workbook.add_format({**COLUMN_STYLES[c.style], **border_props}) for c in columns]
+    total_formats = [
+        workbook.add_format({**COLUMN_STYLES[c.style], **border_props, 'bold': True, 'bg_color': TOTAL_COLOR})
+        for c in columns
+    ]
+    title_formats = {}
+
+    # Column-level styling applies to every cell written without its own format
+    for index, (column, column_format) in enumerate(zip(columns, column_formats)):
+        worksheet.set_column(index, index, column.width, column_format)
+
+    if logo_path:
+        from PIL import Image
+        with Image.open(logo_path) as logo:
+            scale = LOGO_SIZE / max(logo.size)
+        worksheet.insert_image(0, 0, logo_path, {'x_scale': scale, 'y_scale': scale})
+
+    row = 0
+    for line in title_lines:
+        if line.style not in title_formats:
+            title_formats[line.style] = workbook.add_format(TITLE_STYLES[line.style])
+        if line.height is not None:
+            worksheet.set_row(row, line.height)
+        if line.last_col > line.first_col:
+            worksheet.merge_range(row, line.first_col, row, line.last_col, line.text, title_formats[line.style])
+        else:
+            worksheet.write(row, line.first_col, line.text, title_formats[line.style])
+        row += 1
+    if title_lines:
+        row += 1  # Blank row before the table
+
+    worksheet.write_row(row, 0, [column.header for column in columns], header_format)
+    row += 1
+
+    for values in rows:
+        worksheet.write_row(row, 0, values)
+        row += 1
+
+    if totals is not None:
+        for index, value in enumerate(totals()):
+            worksheet.write(row, index, value, total_formats[index])
+
+    workbook.close()
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows) -> StreamingHttpResponse:
+    """
+    Stream a CSV download one row at a time.
+
+    Args:
+        filename: Download file name
+        header: List of column names
+        rows: Iterable of row value lists; a generator over
+            queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE) keeps memory flat
+
+    Returns:
+        StreamingHttpResponse with the CSV attachment
+
+    Example:
+        >>> return stream_csv(
+        ...     'consumers.csv', ['First Name', 'Last Name'],
+        ...     ([c.first_name, c.last_name] for c in consumers.iterator(chunk_size=EXPORT_CHUNK_SIZE)),
+        ... )
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for values in rows:
+            yield writer.writerow(values)
+
+    return StreamingHttpResponse(
+        lines(),
+        content_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+def write_fixture(stream, queryset, format='json') -> int:
+    """
+    Serialize a queryset as a loaddata fixture, one row at a time.
+
+    Args:
+        stream: Binary file object to write to (e.g. ZipFile.open(name, 'w'))
+        queryset: Rows to serialize; read with iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        format: 'json' (compact, no indentation) or 'jsonl' (newline-delimited)
+
+    Returns:
+        Number of rows written
+
+    Example:
+        >>> with zf.open('data/bills.jsonl', 'w', force_zip64=True) as member:
+        ...     count = write_fixture(member, Bill.objects.all(), 'jsonl')
+    """
+    count = 0
+
+    def rows():
+        nonlocal count
+        for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            count += 1
+            yield obj
+
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        serializers.serialize(format, rows(), stream=text)
+    finally:
+        # Flush into the underlying stream without closing it
+        text.flush()
+        text.detach()
+    return count
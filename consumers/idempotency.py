@@ -0,0 +1,183 @@
+# consumers/idempotency.py
+"""
+Idempotency key store for mobile submissions.
+
+The field app attaches a client-generated key to every reading it sends
+(the Idempotency-Key header or an idempotency_key field in the JSON
+body). Before writing, the endpoints look the key up here; keys that were
+already processed return their stored response, so a retry after a
+dropped connection never creates a second reading or bill.
+
+Storage:
+- IdempotencyKey table: the source of truth. Responses are stored in the
+  same transaction as the rows they describe, and the (scope, user, key)
+  unique constraint makes a concurrent duplicate fail with IntegrityError
+  instead of writing twice.
+- Cache front (idempotency:<scope>:<user>:<key>): filled on store and on
+  lookup, so most replays cost no query and the rest a single indexed lookup.
+
+Keys belong to the user who sent them: another user (or an anonymous
+caller) reusing the same key never gets the stored response back.
+
+Keys are remembered for IDEMPOTENCY_KEY_TTL seconds. Expired rows are
+ignored on lookup and deleted by the purge_idempotency_keys maintenance
+task.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+CACHE_KEY = 'idempotency:{scope}:{user_id}:{digest}'
+MAX_KEY_LENGTH = 100
+
+
+def key_ttl() -> int:
+    """Seconds an idempotency key is remembered."""
+    return getattr(django_settings, 'IDEMPOTENCY_KEY_TTL', 7 * 24 * 3600)
+
+
+def _cache_key(scope, key, user=None) -> str:
+    # Hashed so arbitrary client keys are always valid cache keys
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return CACHE_KEY.format(scope=scope, user_id=user.pk if user else '-', digest=digest)
+
+
+def get_request_key(request):
+    """
+    Return the idempotency key sent with a request, or None.
+
+    Read from the Idempotency-Key header, falling back to an
+    idempotency_key field in a JSON or multipart body.
+    """
+    key = request.META.get('HTTP_IDEMPOTENCY_KEY', '')
+    if not key and request.content_type == 'multipart/form-data':
+        key = request.POST.get('idempotency_key', '')
+    if not key and request.content_type == 'application/json' and request.body:
+        try:
+            data = json.loads(request.body.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            data = None
+        if isinstance(data, dict):
+            key = str(data.get('idempotency_key') or '')
+    key = key.strip()
+    return key if 0 < len(key) <= MAX_KEY_LENGTH else None
+
+
+def get_stored_responses(scope, keys, user=None) -> dict:
+    """
+    Look up the stored responses of already processed keys.
+
+    Cached keys are served from one get_many(); the rest are read with a
+    single indexed query and cached.
+
+    Args:
+        scope: Endpoint the keys belong to (e.g. 'reading_batch')
+        keys: Iterable of client idempotency keys
+        user: User who sent the keys (None for anonymous callers)
+
+    Returns:
+        Dictionary mapping each processed key to its stored response.
+        Unknown and expired keys are absent.
+
+    Example:
+        >>> stored = get_stored_responses('reading_batch', ['b5e1...', '9f0c...'], user=request.user)
+        >>> 'b5e1...' in stored
+        True
+    """
+    from .models import IdempotencyKey
+
+    keys = {key for key in keys if key}
+    if not keys:
+        return {}
+
+    cache_keys = {_cache_key(scope, key, user): key for key in keys}
+    cached = cache.get_many(list(cache_keys))
+    stored = {cache_keys[cache_key]: response for cache_key, response in cached.items()}
+
+    missing = keys - stored.keys()
+    if missing:
+        now = timezone.now()
+        rows = IdempotencyKey.objects.filter(
+            scope=scope,
+            user=user,
+            key__in=missing,
+            created_at__gte=now - timedelta(seconds=key_ttl())
+        ).values_list('key', 'response', 'created_at')
+
+        to_cache = {}
+        for key, response, created_at in rows:
+            stored[key] = response
+            remaining = key_ttl() - int((now - created_at).total_seconds())
+            if remaining > 0:
+                to_cache[_cache_key(scope, key, user)] = response
+        if to_cache:
+            cache.set_many(to_cache, key_ttl())
+
+    return stored
+
+
+def get_stored_response(scope, key, user=None):
+    """Return the stored response of one key sent by user, or None if it was not processed."""
+    return get_stored_responses(scope, [key], user=user).get(key)
+
+
+def store_responses(scope, responses, user=None) -> None:
+    """
+    Record the responses of newly processed keys.
+
+    Call inside the transaction that performs the writes. Raises
+    IntegrityError if another request stored one of the keys first.
+    The cache front is filled once the transaction commits.
+
+    Args:
+        scope: Endpoint the keys belong to
+        responses: Dictionary mapping key to the JSON-serializable response
+        user: User who made the request (None for anonymous callers);
+            only this user's lookups will find the responses
+    """
+    from .models import IdempotencyKey
+
+    if not responses:
+        return
+
+    # Expired rows that were not purged yet would block reusing their keys
+    IdempotencyKey.objects.filter(
+        scope=scope,
+        user=user,
+        key__in=list(responses),
+        created_at__lt=timezone.now() - timedelta(seconds=key_ttl())
+    ).delete()
+
+    IdempotencyKey.objects.bulk_create(
+        [IdempotencyKey(scope=scope, key=key, user=user, response=response)
+         for key, response in responses.items()],
+        batch_size=500,
+    )
+
+    to_cache = {_cache_key(scope, key, user): response for key, response in responses.items()}
+    transaction.on_commit(lambda: cache.set_many(to_cache, key_ttl()))
+
+
+def store_response(scope, key, response, user=None) -> None:
+    """Record the response of one newly processed key (see store_responses)."""
+    store_responses(scope, {key: response}, user=user)
+
+
+def purge_expired_keys() -> int:
+    """
+    Delete idempotency keys older than IDEMPOTENCY_KEY_TTL.
+
+    Returns:
+        Number of keys deleted
+    """
+    from .models import IdempotencyKey
+
+    cutoff = timezone.now() - timedelta(seconds=key_ttl())
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
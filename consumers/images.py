@@ -0,0 +1,93 @@
+# consumers/images.py
+"""
+Proof photo normalization for the Balilihan Waterworks Management System.
+
+Field staff attach full-resolution phone camera photos to manual
+readings. Before they are queued for upload (see consumers/uploads.py)
+each photo is:
+
+1. Decoded with Pillow and rotated upright from its EXIF orientation.
+2. Stripped of EXIF and other metadata (GPS, device info).
+3. Downscaled so its longest edge is at most PROOF_IMAGE_MAX_EDGE.
+4. Re-encoded as PROOF_IMAGE_FORMAT (WEBP or JPEG) at PROOF_IMAGE_QUALITY.
+
+A PROOF_THUMBNAIL_EDGE thumbnail is made from the same decode for the
+pending readings review list.
+"""
+
+from io import BytesIO
+from django.conf import settings as django_settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# Refuse decompression bombs well before Pillow's default limit
+MAX_SOURCE_PIXELS = 50_000_000
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def _encode(image, image_format, quality) -> bytes:
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, image_format, quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def normalize_proof_image(source) -> dict:
+    """
+    Decode, clean up, downscale and recompress a proof photo.
+
+    Args:
+        source: Image bytes or a binary file-like object (e.g. an UploadedFile)
+
+    Returns:
+        Dictionary with:
+        - image: Re-encoded image bytes
+        - thumbnail: Re-encoded thumbnail bytes
+        - extension: File extension for both ('webp' or 'jpg')
+        - width, height: Size of the normalized image
+
+    Raises:
+        ValueError: If the data is not a readable image or is too large
+
+    Example:
+        >>> result = normalize_proof_image(request.FILES['proof_image'])
+        >>> len(result['image']) < request.FILES['proof_image'].size
+        True
+    """
+    image_format = getattr(django_settings, 'PROOF_IMAGE_FORMAT', 'WEBP').upper()
+    if image_format not in EXTENSIONS:
+        image_format = 'JPEG'
+    quality = getattr(django_settings, 'PROOF_IMAGE_QUALITY', 75)
+    max_edge = getattr(django_settings, 'PROOF_IMAGE_MAX_EDGE', 1600)
+    thumbnail_edge = getattr(django_settings, 'PROOF_THUMBNAIL_EDGE', 320)
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    try:
+        with Image.open(source) as original:
+            if original.width * original.height > MAX_SOURCE_PIXELS:
+                raise ValueError("Image is too large")
+            # Only decode at the size we need (JPEG draft mode), then rotate upright
+            original.draft('RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGB')
+            # Drop EXIF (GPS, device), ICC and comments so they are never re-encoded
+            image.info = {}
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable image: {e}")
+
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_edge, thumbnail_edge), Image.Resampling.LANCZOS)
+
+    return {
+        'image': _encode(image, image_format, quality),
+        'thumbnail': _encode(thumbnail, image_format, quality),
+        'extension': EXTENSIONS[image_format],
+        'width': image.width,
+        'height': image.height,
+    }
@@ -0,0 +1,116 @@
+# consumers/kpis.py
+"""
+Dashboard KPI counters for the Balilihan Waterworks Management System.
+
+The staff dashboard and its HTMX stat polling read these counters from the
+Django cache instead of running a dozen count()/aggregate() queries on
+every render:
+
+- Consumer counts (connected, disconnected, delinquent)
+- Revenue (today, this month, this year, all time) and today's payments
+- Bill status counts (outstanding, paid, pending)
+
+The cached counters are dropped whenever a Payment, Bill or Consumer is
+saved or deleted (see consumers/signals.py) and recomputed by the next
+request. DASHBOARD_KPI_CACHE_TIMEOUT bounds staleness for writes that
+bypass model signals.
+"""
+
+from decimal import Decimal
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+KPI_CACHE_KEY = 'dashboard_kpis:{date}'
+
+
+def _kpi_cache_key(today) -> str:
+    # Keyed by date so day/month/year counters roll over at midnight
+    return KPI_CACHE_KEY.format(date=today.isoformat())
+
+
+def compute_dashboard_kpis(today=None) -> dict:
+    """
+    Compute all dashboard KPI counters from the database.
+
+    Args:
+        today: Optional local date to compute against (defaults to today)
+
+    Returns:
+        Dictionary of counters keyed by their dashboard context names
+    """
+    from .models import Consumer, Bill, Payment, MonthlyRollup
+
+    today = today or timezone.localdate()
+
+    consumer_counts = Consumer.objects.aggregate(
+        connected_count=Count('id', filter=Q(status='active')),
+        disconnected_count=Count('id', filter=Q(status='disconnected')),
+    )
+
+    # Consumers with pending bills older than today
+    delinquent_count = Consumer.objects.filter(
+        bills__status='Pending',
+        bills__billing_period__lt=today
+    ).distinct().count()
+
+    today_payments = Payment.objects.filter(payment_date__date=today).aggregate(
+        today_revenue=Sum('amount_paid'),
+        today_payment_count=Count('id'),
+    )
+
+    revenue_totals = MonthlyRollup.objects.aggregate(
+        monthly_revenue=Sum('income', filter=Q(year=today.year, month=today.month)),
+        annual_revenue=Sum('income', filter=Q(year=today.year)),
+        total_revenue=Sum('income'),
+    )
+
+    bill_counts = Bill.objects.aggregate(
+        total_bills=Count('id', filter=Q(status__in=['Pending', 'Unpaid', 'Overdue'])),  # Outstanding bills only
+        paid_bills=Count('id', filter=Q(status='Paid')),
+        pending_bills=Count('id', filter=Q(status='Pending')),
+    )
+
+    return {
+        'connected_count': consumer_counts['connected_count'],
+        'disconnected_count': consumer_counts['disconnected_count'],
+        'delinquent_count': delinquent_count,
+        'today_revenue': today_payments['today_revenue'] or Decimal('0.00'),
+        'today_payment_count': today_payments['today_payment_count'],
+        'monthly_revenue': revenue_totals['monthly_revenue'] or Decimal('0.00'),
+        'annual_revenue': revenue_totals['annual_revenue'] or Decimal('0.00'),
+        'total_revenue': revenue_totals['total_revenue'] or Decimal('0.00'),
+        'total_bills': bill_counts['total_bills'],
+        'paid_bills': bill_counts['paid_bills'],
+        'pending_bills': bill_counts['pending_bills'],
+    }
+
+
+def get_dashboard_kpis() -> dict:
+    """
+    Return the dashboard KPI counters, recomputing them on a cache miss.
+
+    Returns:
+        Dictionary of counters (see compute_dashboard_kpis)
+
+    Example:
+        >>> kpis = get_dashboard_kpis()
+        >>> print(f"Connected: {kpis['connected_count']}")
+    """
+    today = timezone.localdate()
+    cache_key = _kpi_cache_key(today)
+
+    kpis = cache.get(cache_key)
+    if kpis is None:
+        kpis = compute_dashboard_kpis(today)
+        cache.set(cache_key, kpis, getattr(django_settings, 'DASHBOARD_KPI_CACHE_TIMEOUT', 300))
+    return kpis
+
+
+def invalidate_dashboard_kpis() -> None:
+    """Drop today's cached KPI counters once the current transaction commits."""
+    cache_key = _kpi_cache_key(timezone.localdate())
+    transaction.on_commit(lambda: cache.delete(cache_key))
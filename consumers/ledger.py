@@ -0,0 +1,152 @@
+# consumers/ledger.py
+"""
+Barangay ledger builder for the Balilihan Waterworks Management System.
+
+Builds the 12-month ledger book (one card per consumer) for a barangay
+and year in a fixed number of queries:
+
+1. One query loads the active consumers of the barangay.
+2. One query loads every bill of the barangay-year with its current reading.
+3. One query loads every payment made against those bills.
+
+The bills and payments are then pivoted into the month grid in memory.
+
+The pivoted grid can optionally be cached as a precomputed ledger table
+keyed by (barangay, year). Set BARANGAY_LEDGER_CACHE_TIMEOUT (seconds)
+to enable it; staleness is bounded by that timeout, and
+invalidate_barangay_ledger() drops an entry immediately.
+"""
+
+import calendar
+from django.conf import settings as django_settings
+from django.core.cache import cache
+
+
+LEDGER_CACHE_KEY = 'barangay_ledger:{barangay_id}:{year}'
+
+
+def _ledger_cache_key(barangay_id, year) -> str:
+    return LEDGER_CACHE_KEY.format(barangay_id=barangay_id, year=year)
+
+
+def _empty_month(month_name) -> dict:
+    return {
+        'month': month_name,
+        'consumption': '',
+        'amount_due': '',
+        'penalty': '',
+        'amount_paid': '',
+        'receipt_number': '',
+        'date_issued': '',
+        'reading': '',
+        'initial': '',
+    }
+
+
+def build_ledger_rows(barangay_id, year) -> dict:
+    """
+    Pivot all bills and payments of a barangay-year into 12-month grids.
+
+    Args:
+        barangay_id: ID of the barangay
+        year: Billing year
+
+    Returns:
+        Dictionary mapping consumer_id to a list of 12 month entries
+        (January first). Consumers without bills in the year are absent.
+    """
+    from .models import Bill, Payment
+
+    month_names = [calendar.month_name[m] for m in range(1, 13)]
+
+    # Latest bill per (consumer, month) wins, matching Bill's default ordering
+    bill_for = {}
+    bills = Bill.objects.filter(
+        consumer__barangay_id=barangay_id,
+        billing_period__year=year
+    ).select_related('current_reading').order_by('-billing_period', '-created_at')
+    for bill in bills:
+        bill_for.setdefault((bill.consumer_id, bill.billing_period.month), bill)
+
+    # Latest payment per (consumer, month), matching Payment's default ordering
+    payment_for = {}
+    payments = Payment.objects.filter(
+        bill__consumer__barangay_id=barangay_id,
+        bill__billing_period__year=year
+    ).values(
+        'bill__consumer_id', 'bill__billing_period', 'amount_paid', 'or_number', 'payment_date'
+    ).order_by('-payment_date')
+    for payment in payments:
+        payment_for.setdefault((payment['bill__consumer_id'], payment['bill__billing_period'].month), payment)
+
+    rows = {}
+    for consumer_id, month_num in set(bill_for) | set(payment_for):
+        months = rows.get(consumer_id)
+        if months is None:
+            months = rows[consumer_id] = [_empty_month(name) for name in month_names]
+        entry = months[month_num - 1]
+
+        bill = bill_for.get((consumer_id, month_num))
+        if bill:
+            entry['consumption'] = bill.consumption
+            entry['amount_due'] = bill.total_amount
+            entry['penalty'] = bill.effective_penalty if bill.effective_penalty > 0 else ''
+            entry['reading'] = bill.current_reading.reading_value if bill.current_reading else ''
+
+        payment = payment_for.get((consumer_id, month_num))
+        if payment:
+            entry['amount_paid'] = payment['amount_paid']
+            entry['receipt_number'] = payment['or_number']
+            entry['date_issued'] = payment['payment_date']
+
+    return rows
+
+
+def get_barangay_ledger(barangay, year, use_cache=True) -> list:
+    """
+    Build the ledger book for all active consumers of a barangay.
+
+    Args:
+        barangay: Barangay instance
+        year: Billing year
+        use_cache: Read/write the precomputed ledger table when
+            BARANGAY_LEDGER_CACHE_TIMEOUT is set (default: True)
+
+    Returns:
+        List of dicts with 'consumer' and 'months' (12 month entries),
+        ordered by last name then first name.
+
+    Example:
+        >>> ledger = get_barangay_ledger(barangay, 2025)
+        >>> ledger[0]['months'][0]['amount_due']
+        Decimal('75.00')
+    """
+    from .models import Consumer
+
+    month_names = [calendar.month_name[m] for m in range(1, 13)]
+    timeout = getattr(django_settings, 'BARANGAY_LEDGER_CACHE_TIMEOUT', 0)
+    cache_key = _ledger_cache_key(barangay.id, year)
+
+    rows = cache.get(cache_key) if use_cache and timeout else None
+    if rows is None:
+        rows = build_ledger_rows(barangay.id, year)
+        if use_cache and timeout:
+            cache.set(cache_key, rows, timeout)
+
+    consumers = Consumer.objects.filter(
+        barangay=barangay,
+        status='active'
+    ).select_related('barangay', 'purok').order_by('last_name', 'first_name')
+
+    return [
+        {
+            'consumer': consumer,
+            'months': rows.get(consumer.id) or [_empty_month(name) for name in month_names],
+        }
+        for consumer in consumers
+    ]
+
+
+def invalidate_barangay_ledger(barangay_id, year) -> None:
+    """Drop the precomputed ledger table for a barangay-year, if cached."""
+    cache.delete(_ledger_cache_key(barangay_id, year))
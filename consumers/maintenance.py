@@ -0,0 +1,199 @@
+# consumers/maintenance.py
+"""
+Periodic maintenance tasks for the Balilihan Waterworks Management System.
+
+Housekeeping writes (archiving notifications, purging stale rows,
+penalty sweeps) run here from the run_maintenance management command
+instead of on page renders.
+
+Each task is registered with a minimum interval. The MaintenanceTaskRun
+ledger records when every task last ran, so the runner can be called
+frequently and only runs what is due. The run_report_jobs worker (the
+Procfile 'worker' process) calls it every REPORT_WORKER_MAINTENANCE_INTERVAL
+seconds. Deployments without that worker schedule the command instead,
+e.g. a Render cron job every 15 minutes:
+    python manage.py run_maintenance
+
+Register a new task with the decorator:
+    @maintenance_task('my_task', interval=timedelta(hours=1))
+    def my_task():
+        return "summary of what was done"
+"""
+
+import logging
+import time
+from datetime import timedelta
+from django.utils import timezone
+
+
+# Task name -> {'func': callable, 'interval': timedelta, 'description': str}
+MAINTENANCE_TASKS = {}
+
+NOTIFICATION_RETENTION_DAYS = 30
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+
+def maintenance_task(name, interval, description=''):
+    """
+    Register a function as a periodic maintenance task.
+
+    Args:
+        name: Unique task name (used in the ledger and on the command line)
+        interval: Minimum timedelta between runs
+        description: Optional one-line description (defaults to the docstring)
+    """
+    def decorator(func):
+        MAINTENANCE_TASKS[name] = {
+            'func': func,
+            'interval': interval,
+            'description': description or (func.__doc__ or '').strip().splitlines()[0],
+        }
+        return func
+    return decorator
+
+
+def run_maintenance(task_names=None, force=False, now=None) -> list:
+    """
+    Run the registered maintenance tasks that are due.
+
+    A failing task is logged and recorded in the ledger; the remaining
+    tasks still run.
+
+    Args:
+        task_names: Optional list of task names to consider (default: all)
+        force: Run the tasks even if their interval has not elapsed
+        now: Optional datetime to check due times against (defaults to now)
+
+    Returns:
+        List of dicts with name, status ('success', 'failed' or 'skipped')
+        and result text, in registration order
+
+    Example:
+        >>> for run in run_maintenance(['purge_notifications'], force=True):
+        ...     print(run['name'], run['status'], run['result'])
+    """
+    from .models import MaintenanceTaskRun
+
+    now = now or timezone.now()
+    unknown = set(task_names or []) - set(MAINTENANCE_TASKS)
+    if unknown:
+        raise ValueError(f"Unknown maintenance task(s): {', '.join(sorted(unknown))}")
+
+    ledger = MaintenanceTaskRun.objects.in_bulk(list(MAINTENANCE_TASKS), field_name='name')
+    results = []
+
+    for name, task in MAINTENANCE_TASKS.items():
+        if task_names and name not in task_names:
+            continue
+
+        run = ledger.get(name) or MaintenanceTaskRun(name=name)
+        if not force and run.last_run_at and now - run.last_run_at < task['interval']:
+            results.append({'name': name, 'status': 'skipped', 'result': 'Not due yet'})
+            continue
+
+        started = time.monotonic()
+        try:
+            result = task['func']()
+            status = 'success'
+        except Exception as e:
+            logging.error(f"Maintenance task {name} failed: {e}")
+            result = str(e)
+            status = 'failed'
+
+        run.last_run_at = now
+        run.last_status = status
+        run.last_result = str(result or '')
+        run.last_duration_ms = int((time.monotonic() - started) * 1000)
+        run.run_count += 1
+        run.save()
+
+        results.append({'name': name, 'status': status, 'result': run.last_result})
+
+    return results
+
+
+# ============================================================================
+# REGISTERED TASKS
+# ============================================================================
+@maintenance_task('archive_notifications', interval=timedelta(hours=1))
+def archive_notifications():
+    """Archive notifications older than 30 days."""
+    from .models import Notification
+    from .badges import invalidate_all_notifications
+
+    archived = Notification.archive_old_notifications()
+    if archived:
+        invalidate_all_notifications()
+    return f"{archived} notification(s) archived"
+
+
+@maintenance_task('purge_notifications', interval=timedelta(days=1))
+def purge_notifications():
+    """Delete notifications older than the retention period."""
+    from .models import Notification
+
+    cutoff = timezone.now() - timedelta(days=NOTIFICATION_RETENTION_DAYS)
+    deleted, _ = Notification.objects.filter(created_at__lt=cutoff).delete()
+    return f"{deleted} notification(s) deleted"
+
+
+@maintenance_task('cleanup_login_attempts', interval=timedelta(hours=1))
+def cleanup_login_attempts():
+    """Delete login attempt records older than 24 hours."""
+    from .models import LoginAttemptTracker
+
+    deleted = LoginAttemptTracker.cleanup_old_attempts()
+    return f"{deleted} login attempt(s) deleted"
+
+
+@maintenance_task('cleanup_password_reset_tokens', interval=timedelta(days=1))
+def cleanup_password_reset_tokens():
+    """Delete expired password reset tokens."""
+    from .models import PasswordResetToken
+
+    deleted, _ = PasswordResetToken.objects.filter(expires_at__lt=timezone.now()).delete()
+    return f"{deleted} expired token(s) deleted"
+
+
+@maintenance_task('purge_sync_tombstones', interval=timedelta(days=1))
+def purge_sync_tombstones():
+    """Delete consumer sync tombstones older than the retention period."""
+    from .models import ConsumerTombstone
+
+    cutoff = timezone.now() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = ConsumerTombstone.objects.filter(removed_at__lt=cutoff).delete()
+    return f"{deleted} tombstone(s) deleted"
+
+
+@maintenance_task('purge_idempotency_keys', interval=timedelta(days=1))
+def purge_idempotency_keys():
+    """Delete idempotency keys older than IDEMPOTENCY_KEY_TTL."""
+    from .idempotency import purge_expired_keys
+
+    return f"{purge_expired_keys()} idempotency key(s) deleted"
+
+
+@maintenance_task('process_proof_uploads', interval=timedelta(minutes=15))
+def process_proof_uploads():
+    """Upload proof images left pending (e.g. queued before a restart)."""
+    from .uploads import process_pending_uploads
+
+    summary = process_pending_uploads(older_than=timedelta(minutes=10))
+    return ", ".join(f"{count} {status}" for status, count in sorted(summary.items())) or "Nothing pending"
+
+
+@maintenance_task('purge_report_jobs', interval=timedelta(days=1))
+def purge_report_jobs():
+    """Delete finished report jobs and their files after the retention period."""
+    from .report_jobs import purge_old_jobs
+
+    return f"{purge_old_jobs()} report job(s) deleted"
+
+
+@maintenance_task('sweep_penalties', interval=timedelta(hours=6))
+def sweep_pending_penalties():
+    """Recompute penalties and days overdue on pending bills."""
+    from .utils import sweep_penalties
+
+    summary = sweep_penalties()
+    return f"{summary['updated']} of {summary['checked']} pending bill(s) updated"
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild the MonthlyRollup and DailyRemittance summary tables.
+
+Usage:
+    python manage.py rebuild_monthly_rollups
+
+Rollups are normally kept current as payments and bills are saved. Run this
+after deploying, after bulk data imports, or after moving consumers between
+barangays or usage types so historical buckets are regrouped.
+"""
+
+from django.core.management.base import BaseCommand
+from consumers.rollups import rebuild_monthly_rollups, rebuild_daily_remittance
+
+
+class Command(BaseCommand):
+    help = 'Rebuild monthly revenue/consumption rollups and daily cashier remittances'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Rebuilding monthly rollups and daily remittances...'))
+
+        rows = rebuild_monthly_rollups()
+        self.stdout.write(f"  Monthly buckets written: {rows}")
+
+        rows = rebuild_daily_remittance()
+        self.stdout.write(f"  Daily remittance rows written: {rows}")
+
+        self.stdout.write(self.style.SUCCESS('Rollups rebuilt.'))
@@ -0,0 +1,55 @@
+"""
+Management command to run periodic maintenance tasks.
+
+Usage:
+    python manage.py run_maintenance                      # run every task that is due
+    python manage.py run_maintenance purge_notifications  # consider only the named task(s)
+    python manage.py run_maintenance --force              # ignore task intervals
+    python manage.py run_maintenance --list               # show tasks and their last run
+
+Schedule it frequently (e.g. a Render cron job every 15 minutes). Each
+task has its own interval and the MaintenanceTaskRun ledger ensures it
+only runs when due. See consumers/maintenance.py for the task registry.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from consumers.maintenance import MAINTENANCE_TASKS, run_maintenance
+from consumers.models import MaintenanceTaskRun
+
+
+class Command(BaseCommand):
+    help = 'Run periodic maintenance tasks that are due (cleanup, archival, penalty sweep)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tasks', nargs='*', help='Task names to run (default: all)')
+        parser.add_argument('--force', action='store_true', help='Run tasks even if not due yet')
+        parser.add_argument('--list', action='store_true', help='List registered tasks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            ledger = MaintenanceTaskRun.objects.in_bulk(list(MAINTENANCE_TASKS), field_name='name')
+            for name, task in MAINTENANCE_TASKS.items():
+                run = ledger.get(name)
+                last_run = f"{run.last_run_at:%Y-%m-%d %H:%M} ({run.last_status})" if run and run.last_run_at else 'never'
+                self.stdout.write(f"  {name:<32} every {task['interval']}  last run: {last_run}")
+                self.stdout.write(f"      {task['description']}")
+            return
+
+        self.stdout.write(self.style.WARNING('Running maintenance tasks...'))
+
+        try:
+            results = run_maintenance(options['tasks'] or None, force=options['force'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        failed = 0
+        for run in results:
+            if run['status'] == 'failed':
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"  {run['name']}: FAILED - {run['result']}"))
+            else:
+                self.stdout.write(f"  {run['name']}: {run['status']} - {run['result']}")
+
+        if failed:
+            raise CommandError(f"{failed} maintenance task(s) failed.")
+        self.stdout.write(self.style.SUCCESS('Maintenance complete.'))
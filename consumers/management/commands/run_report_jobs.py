@@ -0,0 +1,77 @@
+"""
+Management command that runs queued report jobs and due maintenance tasks.
+
+Usage:
+    python manage.py run_report_jobs                    # worker process: poll the queue forever
+    python manage.py run_report_jobs --once             # run what is queued and due, then exit
+    python manage.py run_report_jobs --no-maintenance   # leave maintenance to a cron job
+
+Run it as a separate process next to gunicorn (see the Procfile worker
+entry) so heavy reports never occupy a web worker. The queue lives in the
+ReportJob table; see consumers/report_jobs.py.
+
+Every REPORT_WORKER_MAINTENANCE_INTERVAL seconds the worker also runs the
+maintenance tasks that are due (consumers/maintenance.py), so notification
+cleanup, penalty sweeps and pending proof uploads happen without a
+separate scheduler.
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from consumers.maintenance import run_maintenance
+from consumers.report_jobs import fail_stale_jobs, process_report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Generate queued background reports and run due maintenance tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the queued jobs and exit')
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds between queue polls (default REPORT_JOB_POLL_INTERVAL)'
+        )
+        parser.add_argument(
+            '--no-maintenance', action='store_true',
+            help='Do not run due maintenance tasks (when run_maintenance is scheduled separately)'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'REPORT_JOB_POLL_INTERVAL', 5)
+        maintenance_interval = getattr(settings, 'REPORT_WORKER_MAINTENANCE_INTERVAL', 60)
+        next_maintenance = 0
+
+        while True:
+            close_old_connections()
+            if not options['no_maintenance'] and time.monotonic() >= next_maintenance:
+                self.run_due_maintenance()
+                next_maintenance = time.monotonic() + maintenance_interval
+
+            stale = fail_stale_jobs()
+            if stale:
+                self.stdout.write(self.style.WARNING(f"  {stale} stale job(s) marked failed"))
+
+            summary = process_report_jobs()
+            for status, count in sorted(summary.items()):
+                self.stdout.write(f"  {count} job(s) {status}")
+
+            if options['once']:
+                break
+            if not summary:
+                time.sleep(interval)
+
+    def run_due_maintenance(self):
+        try:
+            results = run_maintenance()
+        except Exception as e:
+            # Never let housekeeping stop the report queue
+            logging.error(f"Maintenance run failed: {e}", exc_info=True)
+            return
+        for run in results:
+            if run['status'] == 'failed':
+                self.stdout.write(self.style.ERROR(f"  {run['name']}: FAILED - {run['result']}"))
+            elif run['status'] == 'success':
+                self.stdout.write(f"  {run['name']}: {run['result']}")
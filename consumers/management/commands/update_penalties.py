@@ -0,0 +1,33 @@
+"""
+Management command to recompute late payment penalties on pending bills.
+
+Usage:
+    python manage.py update_penalties
+
+Intended to run nightly from a scheduler (e.g. a Render cron job).
+The sweep is set-based (see consumers.utils.sweep_penalties), so it runs
+in a fixed number of SQL statements regardless of how many bills are pending.
+"""
+
+from django.core.management.base import BaseCommand
+from consumers.utils import sweep_penalties, format_currency
+
+
+class Command(BaseCommand):
+    help = 'Recompute penalty amounts and days overdue for all pending bills'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Starting penalty sweep...'))
+
+        summary = sweep_penalties()
+
+        self.stdout.write(f"  Pending bills checked: {summary['checked']}")
+        self.stdout.write(f"  Bills updated: {summary['updated']}")
+        self.stdout.write(f"  Newly penalized: {summary['newly_penalized']}")
+        self.stdout.write(f"  Bills with penalty: {summary['penalized']}")
+        self.stdout.write(
+            f"  Total penalty: {format_currency(summary['previous_total_penalty'])} -> "
+            f"{format_currency(summary['total_penalty'])}"
+        )
+
+        self.stdout.write(self.style.SUCCESS('Penalty sweep complete.'))
@@ -0,0 +1,92 @@
+# consumers/middleware.py
+"""
+Request middleware for the consumers app.
+"""
+
+import re
+from django.conf import settings as django_settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .api_auth import get_request_token, resolve_token
+
+try:
+    import brotli  # type: ignore
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+BROTLI_RE = re.compile(r"\bbr\b")
+GZIP_RE = re.compile(r"\bgzip\b")
+
+
+class ApiTokenMiddleware:
+    """
+    Resolve the field app's bearer token once per API request.
+
+    Sets request.api_user to the session user or the token's user (None
+    if neither). Token users also become request.user, so login_required
+    API views accept them without a session cookie. Must come after
+    AuthenticationMiddleware.
+    """
+    API_PATH_PREFIX = '/api/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(self.API_PATH_PREFIX):
+            if request.user.is_authenticated:
+                request.api_user = request.user
+            else:
+                request.api_user = resolve_token(get_request_token(request))
+                if request.api_user is not None:
+                    request.user = request.api_user
+        return self.get_response(request)
+
+
+class ApiCompressionMiddleware:
+    """
+    Compress API responses larger than API_COMPRESSION_MIN_SIZE bytes.
+
+    Uses brotli when the client accepts it and the brotli package is
+    installed, gzip otherwise. Strong ETags are weakened, as Django's
+    GZipMiddleware does. Must come before middleware that reads or
+    changes the response body.
+    """
+    API_PATH_PREFIX = '/api/'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (not request.path.startswith(self.API_PATH_PREFIX) or response.streaming
+                or response.has_header('Content-Encoding')):
+            return response
+
+        content = response.content
+        if len(content) < getattr(django_settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if BROTLI_AVAILABLE and BROTLI_RE.search(accept_encoding):
+            compressed, encoding = brotli.compress(content, quality=5), 'br'
+        elif GZIP_RE.search(accept_encoding):
+            compressed, encoding = compress_string(content), 'gzip'
+        else:
+            return response
+
+        # Already-compact bodies may not shrink
+        if len(compressed) >= len(content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:21
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0045_bill_queued_for_payment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('usage_type', models.CharField(blank=True, max_length=20)),
+                ('income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total amount paid', max_digits=14)),
+                ('penalty_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Penalty included in payments', max_digits=14)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('paid_consumption', models.PositiveIntegerField(default=0, help_text='Consumption (m³) of the bills paid in this month')),
+                ('consumption', models.PositiveIntegerField(default=0, help_text='Billed consumption (m³)')),
+                ('bills_issued', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('barangay', models.ForeignKey(blank=True, help_text='Null for consumers without a barangay', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to='consumers.barangay')),
+            ],
+            options={
+                'verbose_name': 'Monthly Rollup',
+                'verbose_name_plural': 'Monthly Rollups',
+                'ordering': ['year', 'month'],
+                'indexes': [models.Index(fields=['year', 'month'], name='rollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('year', 'month', 'barangay', 'usage_type'), name='monthly_rollup_bucket_unique')],
+            },
+        ),
+    ]
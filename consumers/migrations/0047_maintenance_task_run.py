@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0046_monthly_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceTaskRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(blank=True, choices=[('success', 'Success'), ('failed', 'Failed')], max_length=10)),
+                ('last_result', models.TextField(blank=True, help_text='Summary or error message of the last run')),
+                ('last_duration_ms', models.PositiveIntegerField(default=0)),
+                ('run_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Maintenance Task Run',
+                'verbose_name_plural': 'Maintenance Task Runs',
+                'ordering': ['name'],
+            },
+        ),
+    ]
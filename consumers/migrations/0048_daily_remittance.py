@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:25
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0047_maintenance_task_run'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRemittance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_collected', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('payment_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cashier', models.ForeignKey(blank=True, help_text='Null for payments without a recorded processor', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_remittances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Remittance',
+                'verbose_name_plural': 'Daily Remittances',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['cashier', 'date'], name='remittance_cashier_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'cashier'), name='daily_remittance_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0048_daily_remittance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumerTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer_id', models.BigIntegerField(help_text='ID of the removed consumer (no FK: it may be deleted)')),
+                ('removed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('barangay', models.ForeignKey(blank=True, help_text='Barangay the consumer was removed from', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='consumer_tombstones', to='consumers.barangay')),
+            ],
+            options={
+                'verbose_name': 'Consumer Tombstone',
+                'verbose_name_plural': 'Consumer Tombstones',
+                'ordering': ['-removed_at'],
+                'indexes': [models.Index(fields=['barangay', 'removed_at'], name='tombstone_barangay_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0050_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProofImageUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spool_path', models.CharField(help_text='Local file holding the image until it is uploaded', max_length=500)),
+                ('public_id', models.CharField(help_text='Name of the image at the storage provider', max_length=200)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reading', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proof_uploads', to='consumers.meterreading')),
+            ],
+            options={
+                'verbose_name': 'Proof Image Upload',
+                'verbose_name_plural': 'Proof Image Uploads',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='proof_upload_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0051_proof_image_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meterreading',
+            name='proof_thumbnail_url',
+            field=models.URLField(blank=True, help_text='Small version of the proof photo for the review list', max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='proofimageupload',
+            name='kind',
+            field=models.CharField(choices=[('image', 'Proof Image'), ('thumbnail', 'Thumbnail')], default='image', max_length=10),
+        ),
+    ]
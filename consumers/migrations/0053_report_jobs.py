@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0052_proof_image_thumbnail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('meter_reading', 'Meter Reading Submitted'), ('reading_pending_confirmation', 'Reading Pending Confirmation'), ('payment', 'Payment Processed'), ('bill_generated', 'Bill Generated'), ('consumer_registered', 'New Consumer Registered'), ('system_alert', 'System Alert'), ('report_ready', 'Report Ready')], help_text='Type of notification', max_length=30),
+        ),
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('report_excel', 'Revenue/Delinquency/Summary Report (Excel)'), ('meter_readings_excel', 'Meter Readings (Excel)'), ('barangay_readings_excel', 'Barangay Meter Readings (Excel)'), ('barangay_ledger', 'Barangay Ledger'), ('meter_readings_print', 'Meter Readings (Print)'), ('meter_reading_overview_print', 'Meter Reading Overview (Print)'), ('consumers_csv', 'Consumers by Barangay (CSV)'), ('delinquent_consumers_csv', 'Delinquent Consumers (CSV)'), ('delinquent_report_print', 'Delinquent Report (Print)'), ('database_backup', 'Database Backup')], max_length=40)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Request parameters of the report')),
+                ('url_kwargs', models.JSONField(blank=True, default=dict, help_text='URL arguments (e.g. barangay_id)')),
+                ('host', models.CharField(blank=True, help_text='Host the report was requested from', max_length=255)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Percent complete')),
+                ('error', models.TextField(blank=True)),
+                ('artifact_path', models.CharField(blank=True, help_text='Generated file on local storage', max_length=500)),
+                ('artifact_name', models.CharField(blank=True, help_text='Download file name', max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('artifact_size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Report Job',
+                'verbose_name_plural': 'Report Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='report_job_status_idx'), models.Index(fields=['requested_by', '-created_at'], name='report_job_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:24
+
+from pathlib import Path
+
+from django.db import migrations, models
+
+
+def load_spooled_images(apps, schema_editor):
+    """
+    Copy images still waiting in the local spool directory into the row.
+
+    Uploads whose file is gone (another instance's disk, or already
+    removed) cannot be completed and are marked failed.
+    """
+    ProofImageUpload = apps.get_model('consumers', 'ProofImageUpload')
+
+    for upload in ProofImageUpload.objects.filter(status__in=['pending', 'failed']):
+        path = Path(upload.spool_path)
+        try:
+            upload.image_data = path.read_bytes()
+        except OSError:
+            upload.status = 'failed'
+            upload.last_error = "Spooled image was not found when moving it to the database"
+        else:
+            upload.extension = path.suffix.lstrip('.') or 'jpg'
+        upload.save(update_fields=['image_data', 'extension', 'status', 'last_error'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0054_idempotency_key_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proofimageupload',
+            name='extension',
+            field=models.CharField(default='jpg', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='proofimageupload',
+            name='image_data',
+            field=models.BinaryField(blank=True, default=b'', help_text='Image content until it is uploaded'),
+        ),
+        migrations.RunPython(load_spooled_images, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='proofimageupload',
+            name='spool_path',
+        ),
+        migrations.AlterField(
+            model_name='proofimageupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploading', 'Uploading'), ('uploaded', 'Uploaded'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=10),
+        ),
+    ]
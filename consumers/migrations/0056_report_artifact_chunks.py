@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def load_artifact_files(apps, schema_editor):
+    """
+    Move finished jobs' files from local disk into chunk rows.
+
+    Jobs whose file is not on this machine's disk can no longer be
+    downloaded and are marked failed.
+    """
+    ReportJob = apps.get_model('consumers', 'ReportJob')
+    ReportArtifactChunk = apps.get_model('consumers', 'ReportArtifactChunk')
+
+    for job in ReportJob.objects.filter(status='done'):
+        try:
+            with open(job.artifact_path, 'rb') as artifact:
+                index = 0
+                while chunk := artifact.read(1024 * 1024):
+                    ReportArtifactChunk.objects.create(job=job, index=index, data=chunk)
+                    index += 1
+        except OSError:
+            job.status = 'failed'
+            job.error = "The generated file was not found when moving it to the database."
+            job.save(update_fields=['status', 'error'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0055_proof_upload_image_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportArtifactChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifact_chunks', to='consumers.reportjob')),
+            ],
+            options={
+                'verbose_name': 'Report Artifact Chunk',
+                'verbose_name_plural': 'Report Artifact Chunks',
+                'ordering': ['job', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('job', 'index'), name='unique_report_artifact_chunk')],
+            },
+        ),
+        migrations.RunPython(load_artifact_files, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='reportjob',
+            name='artifact_path',
+        ),
+    ]
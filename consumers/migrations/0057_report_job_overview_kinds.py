@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consumers', '0056_report_artifact_chunks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='kind',
+            field=models.CharField(choices=[('report_excel', 'Revenue/Delinquency/Summary Report (Excel)'), ('meter_readings_excel', 'Meter Readings (Excel)'), ('barangay_readings_excel', 'Barangay Meter Readings (Excel)'), ('barangay_readings_print', 'Barangay Meter Readings (Print)'), ('barangay_ledger', 'Barangay Ledger'), ('meter_readings_print', 'Meter Readings (Print)'), ('meter_reading_overview_print', 'Meter Reading Overview (Print)'), ('meter_reading_overview_excel', 'Meter Reading Overview (Excel)'), ('consumers_csv', 'Consumers by Barangay (CSV)'), ('delinquent_consumers_csv', 'Delinquent Consumers (CSV)'), ('delinquent_report_print', 'Delinquent Report (Print)'), ('database_backup', 'Database Backup')], max_length=40),
+        ),
+    ]
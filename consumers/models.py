@@ -790,6 +790,12 @@ class MeterReading(models.Model):
         null=True,
         help_text="Cloudinary URL of meter photo proof"
     )
+    proof_thumbnail_url = models.URLField(
+        max_length=500,
+        blank=True,
+        null=True,
+        help_text="Small version of the proof photo for the review list"
+    )
 
     # -------------------------
     # CONFIRMATION STATUS
@@ -1525,6 +1531,7 @@ class Notification(models.Model):
         ('bill_generated', 'Bill Generated'),
         ('consumer_registered', 'New Consumer Registered'),
         ('system_alert', 'System Alert'),
+        ('report_ready', 'Report Ready'),
     ]
 
     # Who should see this notification (null = all admins/superusers)
@@ -1610,3 +1617,359 @@ class Notification(models.Model):
         if user:
             queryset = queryset.filter(models.Q(user=user) | models.Q(user__isnull=True))
         return queryset.order_by('-created_at')
+
+
+# ============================================================================
+# MONTHLY ROLLUP MODEL - Precomputed revenue and consumption per month
+# ============================================================================
+class MonthlyRollup(models.Model):
+    """
+    Monthly revenue and consumption totals per barangay and usage type.
+
+    Reports and dashboard charts read these rows instead of aggregating the
+    full Payment and Bill tables on every request. Rows are refreshed
+    whenever a Payment or Bill is saved or deleted (see consumers.rollups)
+    and can be rebuilt from scratch with:
+        python manage.py rebuild_monthly_rollups
+
+    Payment figures are bucketed by payment month, bill figures by
+    billing period month.
+    """
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    barangay = models.ForeignKey(
+        Barangay,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='monthly_rollups',
+        help_text="Null for consumers without a barangay"
+    )
+    usage_type = models.CharField(max_length=20, blank=True)
+
+    # Payments made in this month
+    income = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'),
+        help_text="Total amount paid"
+    )
+    penalty_collected = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'),
+        help_text="Penalty included in payments"
+    )
+    payment_count = models.PositiveIntegerField(default=0)
+    paid_consumption = models.PositiveIntegerField(
+        default=0,
+        help_text="Consumption (m³) of the bills paid in this month"
+    )
+
+    # Bills issued for this billing period
+    consumption = models.PositiveIntegerField(default=0, help_text="Billed consumption (m³)")
+    bills_issued = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['year', 'month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['year', 'month', 'barangay', 'usage_type'],
+                name='monthly_rollup_bucket_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='rollup_period_idx'),
+        ]
+        verbose_name = "Monthly Rollup"
+        verbose_name_plural = "Monthly Rollups"
+
+    def __str__(self):
+        barangay_name = self.barangay.name if self.barangay else "Unassigned"
+        return f"{self.year}-{self.month:02d} {barangay_name} {self.usage_type}"
+
+
+# ============================================================================
+# MAINTENANCE TASK RUN MODEL - Last-run ledger for periodic maintenance
+# ============================================================================
+class MaintenanceTaskRun(models.Model):
+    """
+    Last-run ledger for the periodic maintenance tasks.
+
+    One row per registered task (see consumers.maintenance). The
+    run_maintenance command reads it to decide which tasks are due and
+    records the outcome of every run.
+    """
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, choices=STATUS_CHOICES, blank=True)
+    last_result = models.TextField(blank=True, help_text="Summary or error message of the last run")
+    last_duration_ms = models.PositiveIntegerField(default=0)
+    run_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Maintenance Task Run"
+        verbose_name_plural = "Maintenance Task Runs"
+
+    def __str__(self):
+        last_run = self.last_run_at.strftime('%Y-%m-%d %H:%M') if self.last_run_at else 'never'
+        return f"{self.name} - {self.last_status or 'pending'} - {last_run}"
+
+
+# ============================================================================
+# DAILY REMITTANCE MODEL - Precomputed collections per cashier per day
+# ============================================================================
+class DailyRemittance(models.Model):
+    """
+    Amount collected and payments processed per cashier per local day.
+
+    Optional source for the cashier income dashboard and remittance print
+    (enabled with CASHIER_REMITTANCE_USE_DAILY_TABLE). Kept current like
+    MonthlyRollup: refreshed when a Payment is saved or deleted, and
+    rebuilt with python manage.py rebuild_monthly_rollups.
+    """
+    date = models.DateField()
+    cashier = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_remittances',
+        help_text="Null for payments without a recorded processor"
+    )
+    total_collected = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    payment_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'cashier'], name='daily_remittance_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['cashier', 'date'], name='remittance_cashier_date_idx'),
+        ]
+        verbose_name = "Daily Remittance"
+        verbose_name_plural = "Daily Remittances"
+
+    def __str__(self):
+        cashier_name = self.cashier.username if self.cashier else "Unassigned"
+        return f"{self.date} {cashier_name} - ₱{self.total_collected}"
+
+
+# ============================================================================
+# CONSUMER TOMBSTONE MODEL - Removals for the mobile delta sync
+# ============================================================================
+class ConsumerTombstone(models.Model):
+    """
+    Records a consumer leaving a barangay's list (deleted or moved away).
+
+    The field-staff delta sync (api_consumers_sync) returns these so phones
+    can drop consumers they cached earlier. Old rows are purged by the
+    run_maintenance command; clients with an older cursor get a full sync.
+    """
+    consumer_id = models.BigIntegerField(help_text="ID of the removed consumer (no FK: it may be deleted)")
+    barangay = models.ForeignKey(
+        Barangay,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='consumer_tombstones',
+        help_text="Barangay the consumer was removed from"
+    )
+    removed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-removed_at']
+        indexes = [
+            models.Index(fields=['barangay', 'removed_at'], name='tombstone_barangay_idx'),
+        ]
+        verbose_name = "Consumer Tombstone"
+        verbose_name_plural = "Consumer Tombstones"
+
+    def __str__(self):
+        return f"Consumer #{self.consumer_id} removed {self.removed_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# ============================================================================
+# IDEMPOTENCY KEY MODEL - Replay-safe mobile submissions
+# ============================================================================
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a mobile submission, keyed by the client's idempotency key and its user.
+
+    The field app generates one key per reading before it is queued
+    offline. A retried submission with the same key returns the stored
+    response instead of creating the reading and bill again.
+    """
+    scope = models.CharField(max_length=50, help_text="Endpoint the key belongs to (e.g. reading_batch)")
+    key = models.CharField(max_length=100, help_text="Client-generated key (e.g. a UUID)")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='idempotency_keys'
+    )
+    response = models.JSONField(default=dict, help_text="Response returned for the original request")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'user', 'key'], name='unique_idempotency_key'),
+            # NULLs never conflict in a unique index; anonymous keys need their own
+            models.UniqueConstraint(
+                fields=['scope', 'key'], condition=models.Q(user__isnull=True),
+                name='unique_anonymous_idempotency_key'
+            ),
+        ]
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+
+# ============================================================================
+# PROOF IMAGE UPLOAD MODEL - Background upload queue for manual readings
+# ============================================================================
+class ProofImageUpload(models.Model):
+    """
+    Queued upload of a manual reading's proof photo.
+
+    api_submit_manual_reading stores the decoded image in this row, so
+    whichever process picks the upload up can read it; a background worker
+    uploads it and fills in MeterReading.proof_image_url (see
+    consumers/uploads.py). The bytes are cleared once the upload is done.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('uploading', 'Uploading'),
+        ('uploaded', 'Uploaded'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    KIND_CHOICES = [
+        ('image', 'Proof Image'),
+        ('thumbnail', 'Thumbnail'),
+    ]
+
+    reading = models.ForeignKey(
+        MeterReading,
+        on_delete=models.CASCADE,
+        related_name='proof_uploads'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='image')
+    image_data = models.BinaryField(blank=True, default=b'', help_text="Image content until it is uploaded")
+    extension = models.CharField(max_length=10, default='jpg')
+    public_id = models.CharField(max_length=200, help_text="Name of the image at the storage provider")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='proof_upload_status_idx'),
+        ]
+        verbose_name = "Proof Image Upload"
+        verbose_name_plural = "Proof Image Uploads"
+
+    def __str__(self):
+        return f"Proof for reading #{self.reading_id} - {self.get_status_display()}"
+
+
+# ============================================================================
+# REPORT JOB MODEL - Background report generation queue
+# ============================================================================
+class ReportJob(models.Model):
+    """
+    Queued run of a heavy report (Excel/CSV export, print view, backup).
+
+    The request that asks for the report only records a row here; the
+    run_report_jobs worker process generates it, stores the file in the
+    database as ReportArtifactChunk rows (so the web process can serve it)
+    and notifies the requester (see consumers/report_jobs.py).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [
+        ('report_excel', 'Revenue/Delinquency/Summary Report (Excel)'),
+        ('meter_readings_excel', 'Meter Readings (Excel)'),
+        ('barangay_readings_excel', 'Barangay Meter Readings (Excel)'),
+        ('barangay_readings_print', 'Barangay Meter Readings (Print)'),
+        ('barangay_ledger', 'Barangay Ledger'),
+        ('meter_readings_print', 'Meter Readings (Print)'),
+        ('meter_reading_overview_print', 'Meter Reading Overview (Print)'),
+        ('meter_reading_overview_excel', 'Meter Reading Overview (Excel)'),
+        ('consumers_csv', 'Consumers by Barangay (CSV)'),
+        ('delinquent_consumers_csv', 'Delinquent Consumers (CSV)'),
+        ('delinquent_report_print', 'Delinquent Report (Print)'),
+        ('database_backup', 'Database Backup'),
+    ]
+
+    kind = models.CharField(max_length=40, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True, help_text="Request parameters of the report")
+    url_kwargs = models.JSONField(default=dict, blank=True, help_text="URL arguments (e.g. barangay_id)")
+    host = models.CharField(max_length=255, blank=True, help_text="Host the report was requested from")
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    error = models.TextField(blank=True)
+
+    artifact_name = models.CharField(max_length=255, blank=True, help_text="Download file name")
+    content_type = models.CharField(max_length=100, blank=True)
+    artifact_size = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_job_status_idx'),
+            models.Index(fields=['requested_by', '-created_at'], name='report_job_user_idx'),
+        ]
+        verbose_name = "Report Job"
+        verbose_name_plural = "Report Jobs"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} - {self.get_status_display()}"
+
+
+class ReportArtifactChunk(models.Model):
+    """
+    One piece of a report job's generated file.
+
+    Files are split into REPORT_ARTIFACT_CHUNK_SIZE pieces so neither the
+    worker nor the download view holds a whole backup in memory. Chunks are
+    deleted with their job.
+    """
+    job = models.ForeignKey(ReportJob, on_delete=models.CASCADE, related_name='artifact_chunks')
+    index = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['job', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'index'], name='unique_report_artifact_chunk'),
+        ]
+        verbose_name = "Report Artifact Chunk"
+        verbose_name_plural = "Report Artifact Chunks"
+
+    def __str__(self):
+        return f"Report job #{self.job_id} chunk {self.index}"
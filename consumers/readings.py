@@ -0,0 +1,219 @@
+# consumers/readings.py
+"""
+Latest-reading lookups for the Balilihan Waterworks Management System.
+
+Meter reading lists show, per consumer, the latest reading and the
+confirmed reading before it. Fetching those per consumer (or prefetching
+each consumer's whole reading history) costs O(readings); the helpers
+here pick the latest row per consumer with correlated subqueries, so a
+list costs a fixed number of queries and O(consumers) rows:
+
+    rows = latest_reading_rows(consumers)
+    for row in rows:
+        row['consumer'], row['reading'], row['prev_reading'], row['consumption']
+
+Exports of arbitrary reading lists use previous_confirmed_values(), which
+finds every row's predecessor with one windowed query.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Lead
+
+LATEST_FIRST = ('-reading_date', '-created_at')
+
+
+def latest_reading_subquery(field='id', confirmed_only=False, start=None, end=None, consumer_ref='pk'):
+    """
+    Subquery returning one field of a consumer's latest meter reading.
+
+    Args:
+        field: MeterReading field to return (default: id)
+        confirmed_only: Only consider confirmed readings
+        start: Optional first reading date (inclusive)
+        end: Optional last reading date (inclusive)
+        consumer_ref: Outer query field holding the consumer ID
+
+    Returns:
+        Subquery usable in annotate()/filter() on a consumer-keyed queryset
+
+    Example:
+        >>> Consumer.objects.annotate(
+        ...     latest_value=latest_reading_subquery('reading_value', confirmed_only=True)
+        ... )
+    """
+    from .models import MeterReading
+
+    readings = MeterReading.objects.filter(consumer=OuterRef(consumer_ref))
+    if confirmed_only:
+        readings = readings.filter(is_confirmed=True)
+    if start:
+        readings = readings.filter(reading_date__gte=start)
+    if end:
+        readings = readings.filter(reading_date__lte=end)
+    return Subquery(readings.order_by(*LATEST_FIRST).values(field)[:1])
+
+
+def previous_confirmed_subquery(field='id'):
+    """
+    Subquery returning one field of the confirmed reading before a reading.
+
+    Used on MeterReading querysets: "before" means an earlier reading date
+    for the same consumer.
+    """
+    from .models import MeterReading
+
+    readings = MeterReading.objects.filter(
+        consumer=OuterRef('consumer_id'),
+        is_confirmed=True,
+        reading_date__lt=OuterRef('reading_date'),
+    )
+    return Subquery(readings.order_by(*LATEST_FIRST).values(field)[:1])
+
+
+def previous_confirmed_values(readings) -> dict:
+    """
+    Find the value of the confirmed reading before each of the given readings.
+
+    On databases with window functions this is one query over the
+    consumers' confirmed readings, each tagged with the date of the next
+    one (LEAD ... OVER (PARTITION BY consumer ORDER BY reading_date)).
+    Only readings whose successor falls inside the exported date range
+    are returned, so the cost follows the exported rows rather than the
+    consumers' full history. Elsewhere the readings are re-queried once,
+    annotated with previous_confirmed_subquery().
+
+    Args:
+        readings: List of MeterReading instances (any confirmation state)
+
+    Returns:
+        Dictionary mapping reading ID to the previous confirmed reading
+        value, or None when the consumer has no earlier confirmed reading
+
+    Example:
+        >>> readings = list(queryset[:2000])
+        >>> previous = previous_confirmed_values(readings)
+        >>> consumption = readings[0].reading_value - (previous[readings[0].id] or 0)
+    """
+    from .models import MeterReading
+
+    if not readings:
+        return {}
+
+    if not connection.features.supports_over_clause:
+        return dict(
+            MeterReading.objects.filter(id__in=[reading.id for reading in readings]).annotate(
+                prev_value=previous_confirmed_subquery('reading_value')
+            ).values_list('id', 'prev_value')
+        )
+
+    first_date = min(reading.reading_date for reading in readings)
+    last_date = max(reading.reading_date for reading in readings)
+
+    # Plain filters restrict the window's input; they must not drop readings
+    # before first_date, or the earliest exported rows would lose their predecessor.
+    confirmed = MeterReading.objects.filter(
+        consumer_id__in={reading.consumer_id for reading in readings},
+        is_confirmed=True,
+        reading_date__lt=last_date,
+    ).annotate(
+        next_date=Window(
+            Lead('reading_date'),
+            partition_by=[F('consumer_id')],
+            order_by=[F('reading_date').asc(), F('created_at').asc()],
+        )
+    ).filter(
+        # Filters on window annotations apply to the window's output
+        Q(next_date__gte=first_date) | Q(next_date__isnull=True)
+    ).order_by('consumer_id', 'reading_date', 'created_at').values_list(
+        'consumer_id', 'reading_date', 'reading_value'
+    )
+
+    dates = defaultdict(list)
+    values = defaultdict(list)
+    for consumer_id, reading_date, reading_value in confirmed:
+        dates[consumer_id].append(reading_date)
+        values[consumer_id].append(reading_value)
+
+    previous = {}
+    for reading in readings:
+        # Latest confirmed reading strictly before this reading's date
+        index = bisect_left(dates[reading.consumer_id], reading.reading_date)
+        previous[reading.id] = values[reading.consumer_id][index - 1] if index else None
+    return previous
+
+
+def latest_readings_for(consumers, start=None, end=None) -> dict:
+    """
+    Load the latest meter reading of each consumer in two queries.
+
+    Args:
+        consumers: Consumer queryset to look up
+        start: Optional first reading date (inclusive)
+        end: Optional last reading date (inclusive)
+
+    Returns:
+        Dictionary mapping consumer ID to its latest MeterReading, each
+        with a prev_reading attribute (previous confirmed MeterReading or
+        None). Consumers without a reading in range are absent.
+    """
+    from .models import MeterReading
+
+    latest_ids = consumers.order_by().annotate(
+        latest_reading_id=latest_reading_subquery(start=start, end=end)
+    ).filter(latest_reading_id__isnull=False).values('latest_reading_id')
+
+    readings = list(
+        MeterReading.objects.filter(id__in=latest_ids).annotate(
+            prev_reading_id=previous_confirmed_subquery()
+        )
+    )
+    previous = MeterReading.objects.in_bulk(
+        [reading.prev_reading_id for reading in readings if reading.prev_reading_id]
+    )
+
+    latest = {}
+    for reading in readings:
+        reading.prev_reading = previous.get(reading.prev_reading_id)
+        latest[reading.consumer_id] = reading
+    return latest
+
+
+def latest_reading_rows(consumers, start=None, end=None) -> list:
+    """
+    Build the per-consumer rows of the meter reading lists.
+
+    Args:
+        consumers: Consumer queryset, in display order
+        start: Optional first reading date (inclusive)
+        end: Optional last reading date (inclusive)
+
+    Returns:
+        List of dicts with consumer, reading (latest MeterReading or None),
+        prev_reading (previous confirmed MeterReading or None) and
+        consumption (None without a reading; measured from the consumer's
+        first_reading when there is no previous confirmed reading)
+    """
+    latest = latest_readings_for(consumers, start=start, end=end)
+
+    rows = []
+    for consumer in consumers:
+        reading = latest.get(consumer.id)
+        prev = reading.prev_reading if reading else None
+        if reading is None:
+            consumption = None
+        elif prev:
+            consumption = reading.reading_value - prev.reading_value
+        else:
+            # First reading - use consumer's first_reading as baseline
+            consumption = reading.reading_value - (consumer.first_reading or 0)
+
+        rows.append({
+            'consumer': consumer,
+            'reading': reading,
+            'prev_reading': prev,
+            'consumption': consumption,
+        })
+    return rows
@@ -0,0 +1,120 @@
+# consumers/remittance.py
+"""
+Cashier remittance totals for the Balilihan Waterworks Management System.
+
+The cashier income dashboard and the remittance print need, per cashier,
+today's / this month's / the selected period's / all-time collections and
+transaction counts. These are computed with conditional aggregation
+(Sum(..., filter=Q(...))) so every cashier is covered by one grouped
+query instead of six queries per cashier.
+
+When CASHIER_REMITTANCE_USE_DAILY_TABLE is enabled the same aggregates
+run over the precomputed DailyRemittance table (one row per cashier per
+day) instead of the Payment table. Barangay-filtered totals always read
+Payment, since the daily table is not split by barangay.
+"""
+
+import calendar
+from datetime import date
+from decimal import Decimal
+from django.conf import settings as django_settings
+from django.db.models import Count, Q, Sum
+
+
+TOTAL_FIELDS = ('today_total', 'month_total', 'period_total', 'alltime_total')
+COUNT_FIELDS = ('today_count', 'period_count')
+
+
+def _remittance_source(today, period_start, period_end, barangay_id=None):
+    """
+    Return (queryset, cashier field, aggregate expressions) for the totals.
+
+    Uses DailyRemittance when enabled and no barangay filter is applied,
+    otherwise Payment.
+    """
+    from .models import Payment, DailyRemittance
+
+    month_start = today.replace(day=1)
+    month_end = date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+
+    if getattr(django_settings, 'CASHIER_REMITTANCE_USE_DAILY_TABLE', False) and not barangay_id:
+        queryset = DailyRemittance.objects.all()
+        cashier_field, date_field, amount_field = 'cashier_id', 'date', 'total_collected'
+
+        def count(condition):
+            return Sum('payment_count', filter=condition)
+    else:
+        queryset = Payment.objects.all()
+        if barangay_id:
+            queryset = queryset.filter(bill__consumer__barangay_id=barangay_id)
+        cashier_field, date_field, amount_field = 'processed_by_id', 'payment_date__date', 'amount_paid'
+
+        def count(condition):
+            return Count('id', filter=condition)
+
+    is_today = Q(**{date_field: today})
+    in_month = Q(**{f'{date_field}__gte': month_start, f'{date_field}__lte': month_end})
+    in_period = Q(**{f'{date_field}__gte': period_start, f'{date_field}__lte': period_end})
+
+    aggregates = {
+        'today_total': Sum(amount_field, filter=is_today),
+        'today_count': count(is_today),
+        'month_total': Sum(amount_field, filter=in_month),
+        'period_total': Sum(amount_field, filter=in_period),
+        'period_count': count(in_period),
+        'alltime_total': Sum(amount_field),
+    }
+    return queryset, cashier_field, aggregates
+
+
+def _normalize(totals) -> dict:
+    """Replace the NULLs returned for empty groups with zero."""
+    normalized = {field: totals.get(field) or Decimal('0.00') for field in TOTAL_FIELDS}
+    normalized.update({field: totals.get(field) or 0 for field in COUNT_FIELDS})
+    return normalized
+
+
+def empty_remittance_totals() -> dict:
+    """Return zeroed totals for a cashier without payments."""
+    return _normalize({})
+
+
+def cashier_remittance_totals(today, period_start, period_end, cashier_ids=None, barangay_id=None) -> dict:
+    """
+    Compute remittance totals for every cashier in one grouped query.
+
+    Args:
+        today: Local date used for the today/month columns
+        period_start: First day of the selected period (inclusive)
+        period_end: Last day of the selected period (inclusive)
+        cashier_ids: Optional list of user IDs to restrict to
+        barangay_id: Optional barangay ID to restrict payments to
+
+    Returns:
+        Dictionary mapping user ID to a dict with today_total, today_count,
+        month_total, period_total, period_count and alltime_total.
+        Cashiers without payments are absent.
+
+    Example:
+        >>> totals = cashier_remittance_totals(today, today, today)
+        >>> totals[request.user.id]['today_total']
+        Decimal('1250.00')
+    """
+    queryset, cashier_field, aggregates = _remittance_source(today, period_start, period_end, barangay_id)
+    if cashier_ids is not None:
+        queryset = queryset.filter(**{f'{cashier_field}__in': cashier_ids})
+
+    groups = queryset.values(cashier_field).annotate(**aggregates).order_by()
+    return {group[cashier_field]: _normalize(group) for group in groups}
+
+
+def overall_remittance_totals(today, period_start, period_end) -> dict:
+    """
+    Compute the same totals across all payments in one query.
+
+    Returns:
+        Dict with today_total, today_count, month_total, period_total,
+        period_count and alltime_total
+    """
+    queryset, _, aggregates = _remittance_source(today, period_start, period_end)
+    return _normalize(queryset.aggregate(**aggregates))
@@ -0,0 +1,357 @@
+# consumers/report_jobs.py
+"""
+Background report jobs for the Balilihan Waterworks Management System.
+
+Excel/CSV exports, ledgers, print views and database backups used to run
+inside the request, holding the single gunicorn worker for up to its
+120-second timeout while cashiers waited to post payments. Any of them
+can now be queued instead:
+
+1. The browser POSTs the report's usual parameters to request_report_job
+   (enqueue_report_job records a ReportJob row) and gets back a status URL.
+2. The run_report_jobs worker process claims queued jobs from the
+   database (no broker needed), replays the report's own view as the
+   requesting user, and stores the response in the database as
+   ReportArtifactChunk rows, so any web process can serve it.
+3. The requester is notified (Notification 'report_ready') and can poll
+   report_job_status, then fetch the file from download_report_job.
+
+Replaying the existing view keeps each report's permission checks,
+filters and output identical to the synchronous download.
+
+Jobs and their stored files are deleted after REPORT_JOB_RETENTION_DAYS
+by the purge_report_jobs maintenance task.
+"""
+
+import logging
+import mimetypes
+import re
+from datetime import timedelta
+from importlib import import_module
+from django.conf import settings as django_settings
+from django.db import connection, transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# kind -> URL name of the report view, HTTP method, URL arguments taken
+# from the submitted parameters and fixed parameters added to them
+REPORT_JOB_KINDS = {
+    'report_excel': {'url': 'consumers:export_report_excel'},
+    'meter_readings_excel': {'url': 'consumers:meter_readings', 'params': {'export': 'excel'}},
+    'barangay_readings_excel': {'url': 'consumers:export_barangay_readings', 'kwargs': ('barangay_id',)},
+    'barangay_readings_print': {'url': 'consumers:barangay_meter_readings_print', 'kwargs': ('barangay_id',)},
+    'barangay_ledger': {'url': 'consumers:barangay_report', 'kwargs': ('barangay_id',)},
+    'meter_readings_print': {'url': 'consumers:meter_readings_print'},
+    'meter_reading_overview_print': {'url': 'consumers:meter_reading_overview', 'params': {'export': 'print'}},
+    'meter_reading_overview_excel': {'url': 'consumers:meter_reading_overview', 'params': {'export': 'excel'}},
+    'consumers_csv': {'url': 'consumers:export_consumers_by_barangay'},
+    'delinquent_consumers_csv': {'url': 'consumers:export_delinquent_consumers'},
+    'delinquent_report_print': {'url': 'consumers:delinquent_report_print'},
+    'database_backup': {'url': 'consumers:backup_database', 'method': 'POST'},
+}
+
+# Request fields that are not report parameters
+RESERVED_FIELDS = ('kind', 'csrfmiddlewaretoken')
+
+# Size of each stored piece of a generated file
+REPORT_ARTIFACT_CHUNK_SIZE = 1024 * 1024
+
+
+class _DiscardMessages:
+    """Message storage for replayed requests: there is no page to show messages on."""
+
+    def add(self, level, message, extra_tags=''):
+        logger.info(f"Report job message: {message}")
+
+    def __iter__(self):
+        return iter(())
+
+
+class _ArtifactWriter:
+    """File-like writer storing a job's file as REPORT_ARTIFACT_CHUNK_SIZE chunk rows."""
+
+    def __init__(self, job):
+        self.job = job
+        self.buffer = bytearray()
+        self.index = 0
+        self.size = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        while len(self.buffer) >= REPORT_ARTIFACT_CHUNK_SIZE:
+            self._save_chunk(self.buffer[:REPORT_ARTIFACT_CHUNK_SIZE])
+            del self.buffer[:REPORT_ARTIFACT_CHUNK_SIZE]
+
+    def close(self):
+        if self.buffer or not self.index:
+            self._save_chunk(self.buffer)
+            self.buffer = bytearray()
+
+    def _save_chunk(self, data):
+        from .models import ReportArtifactChunk
+
+        ReportArtifactChunk.objects.create(job=self.job, index=self.index, data=bytes(data))
+        self.index += 1
+
+
+def iter_artifact(job):
+    """
+    Yield a finished job's file chunk by chunk.
+
+    Each chunk is fetched with its own query, so only one chunk is held in
+    memory even where server-side cursors are disabled.
+    """
+    from .models import ReportArtifactChunk
+
+    chunk_ids = list(job.artifact_chunks.order_by('index').values_list('id', flat=True))
+    for chunk_id in chunk_ids:
+        yield bytes(ReportArtifactChunk.objects.values_list('data', flat=True).get(id=chunk_id))
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+def enqueue_report_job(request, kind, data=None):
+    """
+    Queue a report to be generated in the background for the current user.
+
+    Args:
+        request: The HttpRequest asking for the report
+        kind: Key of REPORT_JOB_KINDS
+        data: QueryDict or dict of the report's parameters (GET/POST fields
+            of the synchronous download); URL arguments such as barangay_id
+            are picked out of it
+
+    Returns:
+        The created ReportJob
+
+    Raises:
+        ValueError: If kind is unknown or a URL argument is missing
+
+    Example:
+        >>> job = enqueue_report_job(request, 'report_excel', request.POST)
+    """
+    from .models import ReportJob
+
+    spec = REPORT_JOB_KINDS.get(kind)
+    if spec is None:
+        raise ValueError(f"Unknown report type: {kind}")
+
+    if isinstance(data, QueryDict):
+        data = {key: values if len(values) > 1 else values[0] for key, values in data.lists()}
+    params = {key: value for key, value in (data or {}).items() if key not in RESERVED_FIELDS}
+
+    url_kwargs = {}
+    for name in spec.get('kwargs', ()):
+        value = params.pop(name, '')
+        if not str(value).isdigit():
+            raise ValueError(f"Missing or invalid {name}")
+        url_kwargs[name] = int(value)
+    params.update(spec.get('params', {}))
+
+    return ReportJob.objects.create(
+        kind=kind,
+        params=params,
+        url_kwargs=url_kwargs,
+        host=request.get_host(),
+        requested_by=request.user,
+    )
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running and return it (None if the queue is empty).
+
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where supported, so several
+    workers never claim the same job.
+    """
+    from .models import ReportJob
+
+    with transaction.atomic():
+        queued = ReportJob.objects.filter(status='queued').order_by('created_at')
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        job = queued.first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.progress = 0
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'started_at', 'updated_at'])
+    return job
+
+
+def _set_progress(job, progress):
+    job.progress = progress
+    job.save(update_fields=['progress', 'updated_at'])
+
+
+def build_job_request(job) -> HttpRequest:
+    """Rebuild the request the report view would have received from the requester."""
+    spec = REPORT_JOB_KINDS[job.kind]
+
+    query = QueryDict(mutable=True)
+    for key, value in job.params.items():
+        query.setlist(key, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+
+    request = HttpRequest()
+    request.method = spec.get('method', 'GET')
+    request.path = request.path_info = reverse(spec['url'], kwargs=job.url_kwargs)
+    if request.method == 'POST':
+        request.POST = query
+    else:
+        request.GET = query
+    request.META = {
+        'HTTP_HOST': job.host or 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_USER_AGENT': 'report-job-worker',
+        'REQUEST_METHOD': request.method,
+    }
+    request.user = job.requested_by
+    request.session = import_module(django_settings.SESSION_ENGINE).SessionStore()
+    request._messages = _DiscardMessages()
+    return request
+
+
+def _download_name(job, response) -> str:
+    match = re.search(r'filename="?([^";]+)"?', response.get('Content-Disposition', ''))
+    if match:
+        return match.group(1)
+    content_type = response.get('Content-Type', '').split(';')[0]
+    return f"{job.kind}_{job.id}{mimetypes.guess_extension(content_type) or ''}"
+
+
+def run_report_job(job) -> str:
+    """
+    Generate a claimed job's report and store it as the job's artifact.
+
+    Progress is coarse: 10 once the view runs, 50 when it returned its
+    response, 100 when the file is stored.
+
+    Args:
+        job: ReportJob in 'running' status
+
+    Returns:
+        Final status ('done' or 'failed')
+    """
+    from .models import Notification
+
+    try:
+        request = build_job_request(job)
+        match = resolve(request.path_info)
+        _set_progress(job, 10)
+
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+            response.render()
+        if response.status_code != 200:
+            # Views redirect or answer 400 on missing parameters or permissions
+            raise RuntimeError(
+                f"Report returned HTTP {response.status_code} "
+                f"(missing parameters or insufficient permissions)"
+            )
+        _set_progress(job, 50)
+
+        artifact = _ArtifactWriter(job)
+        if response.streaming:
+            for chunk in response.streaming_content:
+                artifact.write(chunk)
+        else:
+            artifact.write(response.content)
+        artifact.close()
+        # FileResponse keeps its source file open until closed
+        source = getattr(response, 'file_to_stream', None)
+        if source is not None:
+            source.close()
+
+        job.artifact_name = _download_name(job, response)
+        job.content_type = response.get('Content-Type', 'application/octet-stream')
+        job.artifact_size = artifact.size
+        job.status, job.progress, job.error = 'done', 100, ''
+    except Exception as e:
+        logger.error(f"Report job {job.id} ({job.kind}) failed: {e}", exc_info=True)
+        job.artifact_chunks.all().delete()
+        job.status, job.error = 'failed', str(e)
+
+    job.finished_at = timezone.now()
+    job.save()
+
+    if job.status == 'done':
+        Notification.objects.create(
+            user=job.requested_by,
+            notification_type='report_ready',
+            title=f"{job.get_kind_display()} is ready",
+            message=f"{job.artifact_name} can now be downloaded.",
+            related_object_id=job.id,
+            redirect_url=reverse('consumers:download_report_job', args=[job.id]),
+        )
+    else:
+        Notification.objects.create(
+            user=job.requested_by,
+            notification_type='system_alert',
+            title=f"{job.get_kind_display()} failed",
+            message=job.error[:500],
+            related_object_id=job.id,
+        )
+    return job.status
+
+
+def process_report_jobs(limit=None) -> dict:
+    """
+    Run queued jobs one after another until the queue is empty.
+
+    Args:
+        limit: Optional maximum number of jobs to run
+
+    Returns:
+        Dictionary mapping final status to count
+    """
+    summary = {}
+    while limit is None or sum(summary.values()) < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        status = run_report_job(job)
+        summary[status] = summary.get(status, 0) + 1
+    return summary
+
+
+def fail_stale_jobs() -> int:
+    """
+    Fail jobs left running longer than REPORT_JOB_TIMEOUT (their worker stopped).
+
+    Returns:
+        Number of jobs marked failed
+    """
+    from .models import ReportArtifactChunk, ReportJob
+
+    cutoff = timezone.now() - timedelta(seconds=getattr(django_settings, 'REPORT_JOB_TIMEOUT', 1800))
+    stale = ReportJob.objects.filter(status='running', started_at__lt=cutoff)
+    # Drop whatever part of the file was stored before the worker stopped
+    ReportArtifactChunk.objects.filter(job__in=stale).delete()
+    return stale.update(
+        status='failed', error="The worker stopped before the report finished.",
+        finished_at=timezone.now(), updated_at=timezone.now(),
+    )
+
+
+def purge_old_jobs() -> int:
+    """
+    Delete finished jobs older than REPORT_JOB_RETENTION_DAYS and their stored files.
+
+    Returns:
+        Number of jobs deleted
+    """
+    from .models import ReportJob
+
+    cutoff = timezone.now() - timedelta(days=getattr(django_settings, 'REPORT_JOB_RETENTION_DAYS', 7))
+    old_jobs = ReportJob.objects.filter(status__in=['done', 'failed'], created_at__lt=cutoff)
+    # Count jobs only; their artifact chunks are deleted with them
+    deleted = old_jobs.count()
+    old_jobs.delete()
+    return deleted
@@ -0,0 +1,309 @@
+# consumers/rollups.py
+"""
+Monthly rollup maintenance for the Balilihan Waterworks Management System.
+
+MonthlyRollup holds one row per (year, month, barangay, usage_type) bucket
+with the income, penalty collected, consumption, bills issued and payment
+counts for that month. Reports and dashboard charts read these rows so
+their cost stays flat as years of Payment and Bill history accumulate.
+
+Rows are kept current in two ways:
+
+1. Incrementally: when a Payment or Bill is saved or deleted, the bucket it
+   belongs to is recomputed after the transaction commits (see
+   consumers/signals.py). The bulk billing run bypasses model signals, so
+   it schedules its buckets explicitly. When a consumer moves to another
+   barangay or usage type, every month of its history is recomputed in
+   both the old and the new bucket.
+2. From scratch: rebuild_monthly_rollups() regroups the full tables in two
+   queries. Run it after imports that bypass model signals:
+       python manage.py rebuild_monthly_rollups
+
+DailyRemittance (collections per cashier per local day) is maintained the
+same way by refresh_daily_remittance() and rebuild_daily_remittance().
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncDate
+from django.utils import timezone
+
+
+def _month_bounds(year, month):
+    """Return (first day, first day of next month) as dates."""
+    start = datetime(year, month, 1).date()
+    end = datetime(year + 1, 1, 1).date() if month == 12 else datetime(year, month + 1, 1).date()
+    return start, end
+
+
+def bill_bucket(bill, consumer=None) -> tuple:
+    """
+    Return the (year, month, barangay_id, usage_type) bucket of a bill.
+
+    Args:
+        bill: Bill instance
+        consumer: Optional Consumer instance (avoids a lookup if already loaded)
+    """
+    consumer = consumer or bill.consumer
+    return (bill.billing_period.year, bill.billing_period.month, consumer.barangay_id, consumer.usage_type)
+
+
+def payment_bucket(payment) -> tuple:
+    """Return the (year, month, barangay_id, usage_type) bucket of a payment, by local payment month."""
+    from .models import Consumer
+
+    paid_at = timezone.localtime(payment.payment_date) if timezone.is_aware(payment.payment_date) else payment.payment_date
+    barangay_id, usage_type = Consumer.objects.filter(
+        bills__id=payment.bill_id
+    ).values_list('barangay_id', 'usage_type').get()
+    return (paid_at.year, paid_at.month, barangay_id, usage_type)
+
+
+def consumer_buckets(consumer_id, barangay_id, usage_type) -> set:
+    """
+    Return the buckets a consumer's bills and payments fall into under the given grouping.
+
+    Used when a consumer changes barangay or usage type: its months must be
+    recomputed under both the old and the new grouping.
+
+    Args:
+        consumer_id: Primary key of the consumer
+        barangay_id: Barangay to build the buckets for
+        usage_type: Usage type to build the buckets for
+
+    Returns:
+        Set of (year, month, barangay_id, usage_type) tuples
+    """
+    from .models import Bill, Payment
+
+    months = {
+        (month.year, month.month)
+        for month in Bill.objects.filter(consumer_id=consumer_id).dates('billing_period', 'month')
+    }
+    # datetimes() truncates in the current time zone, matching payment_bucket()
+    months.update(
+        (month.year, month.month)
+        for month in Payment.objects.filter(bill__consumer_id=consumer_id).datetimes('payment_date', 'month')
+    )
+    return {(year, month, barangay_id, usage_type) for year, month in months}
+
+
+def refresh_monthly_rollups(buckets) -> int:
+    """
+    Recompute the MonthlyRollup rows for the given buckets.
+
+    Each bucket is recomputed from the source tables restricted to its
+    month, barangay and usage type, so the result is correct no matter
+    which rows changed. Buckets that end up empty are deleted.
+
+    Args:
+        buckets: Iterable of (year, month, barangay_id, usage_type) tuples
+
+    Returns:
+        Number of buckets refreshed
+    """
+    from .models import Bill, Payment, MonthlyRollup
+
+    refreshed = 0
+    for year, month, barangay_id, usage_type in set(buckets):
+        start, end = _month_bounds(year, month)
+
+        payment_totals = Payment.objects.filter(
+            payment_date__gte=timezone.make_aware(datetime(start.year, start.month, 1)),
+            payment_date__lt=timezone.make_aware(datetime(end.year, end.month, 1)),
+            bill__consumer__barangay_id=barangay_id,
+            bill__consumer__usage_type=usage_type,
+        ).aggregate(
+            income=Sum('amount_paid'),
+            penalty_collected=Sum('penalty_amount'),
+            payment_count=Count('id'),
+            paid_consumption=Sum('bill__consumption'),
+        )
+        bill_totals = Bill.objects.filter(
+            billing_period__gte=start,
+            billing_period__lt=end,
+            consumer__barangay_id=barangay_id,
+            consumer__usage_type=usage_type,
+        ).aggregate(
+            consumption=Sum('consumption'),
+            bills_issued=Count('id'),
+        )
+
+        bucket = MonthlyRollup.objects.filter(
+            year=year, month=month, barangay_id=barangay_id, usage_type=usage_type
+        )
+        if not payment_totals['payment_count'] and not bill_totals['bills_issued']:
+            bucket.delete()
+        else:
+            MonthlyRollup.objects.update_or_create(
+                year=year, month=month, barangay_id=barangay_id, usage_type=usage_type,
+                defaults={
+                    'income': payment_totals['income'] or Decimal('0.00'),
+                    'penalty_collected': payment_totals['penalty_collected'] or Decimal('0.00'),
+                    'payment_count': payment_totals['payment_count'],
+                    'paid_consumption': payment_totals['paid_consumption'] or 0,
+                    'consumption': bill_totals['consumption'] or 0,
+                    'bills_issued': bill_totals['bills_issued'],
+                }
+            )
+        refreshed += 1
+
+    return refreshed
+
+
+def schedule_rollup_refresh(buckets) -> None:
+    """Refresh the given buckets once the current transaction commits."""
+    buckets = set(buckets)
+    if buckets:
+        transaction.on_commit(lambda: refresh_monthly_rollups(buckets))
+
+
+def rebuild_monthly_rollups() -> int:
+    """
+    Rebuild every MonthlyRollup row from the Payment and Bill tables.
+
+    Runs one grouped query over payments and one over bills, then replaces
+    the rollup table inside a transaction.
+
+    Returns:
+        Number of rollup rows written
+
+    Example:
+        >>> rows = rebuild_monthly_rollups()
+        >>> print(f"{rows} monthly buckets rebuilt")
+    """
+    from .models import Bill, Payment, MonthlyRollup
+
+    rows = {}
+
+    def row_for(key):
+        if key not in rows:
+            rows[key] = MonthlyRollup(
+                year=key[0], month=key[1], barangay_id=key[2], usage_type=key[3] or ''
+            )
+        return rows[key]
+
+    payment_groups = Payment.objects.annotate(
+        yr=ExtractYear('payment_date'),
+        mo=ExtractMonth('payment_date'),
+    ).values(
+        'yr', 'mo', 'bill__consumer__barangay_id', 'bill__consumer__usage_type'
+    ).annotate(
+        income=Sum('amount_paid'),
+        penalty_collected=Sum('penalty_amount'),
+        payment_count=Count('id'),
+        paid_consumption=Sum('bill__consumption'),
+    ).order_by()
+    for group in payment_groups:
+        row = row_for((group['yr'], group['mo'], group['bill__consumer__barangay_id'],
+                       group['bill__consumer__usage_type']))
+        row.income = group['income'] or Decimal('0.00')
+        row.penalty_collected = group['penalty_collected'] or Decimal('0.00')
+        row.payment_count = group['payment_count']
+        row.paid_consumption = group['paid_consumption'] or 0
+
+    bill_groups = Bill.objects.annotate(
+        yr=ExtractYear('billing_period'),
+        mo=ExtractMonth('billing_period'),
+    ).values(
+        'yr', 'mo', 'consumer__barangay_id', 'consumer__usage_type'
+    ).annotate(
+        consumption=Sum('consumption'),
+        bills_issued=Count('id'),
+    ).order_by()
+    for group in bill_groups:
+        row = row_for((group['yr'], group['mo'], group['consumer__barangay_id'],
+                       group['consumer__usage_type']))
+        row.consumption = group['consumption'] or 0
+        row.bills_issued = group['bills_issued']
+
+    with transaction.atomic():
+        MonthlyRollup.objects.all().delete()
+        MonthlyRollup.objects.bulk_create(rows.values(), batch_size=500)
+
+    return len(rows)
+
+
+def remittance_bucket(payment) -> tuple:
+    """Return the (local date, cashier_id) bucket of a payment."""
+    paid_at = timezone.localtime(payment.payment_date) if timezone.is_aware(payment.payment_date) else payment.payment_date
+    return (paid_at.date(), payment.processed_by_id)
+
+
+def refresh_daily_remittance(buckets) -> int:
+    """
+    Recompute the DailyRemittance rows for the given buckets.
+
+    Args:
+        buckets: Iterable of (date, cashier_id) tuples
+
+    Returns:
+        Number of buckets refreshed
+    """
+    from .models import Payment, DailyRemittance
+
+    refreshed = 0
+    for day, cashier_id in set(buckets):
+        totals = Payment.objects.filter(
+            payment_date__date=day,
+            processed_by_id=cashier_id,
+        ).aggregate(
+            total_collected=Sum('amount_paid'),
+            payment_count=Count('id'),
+        )
+
+        if not totals['payment_count']:
+            DailyRemittance.objects.filter(date=day, cashier_id=cashier_id).delete()
+        else:
+            DailyRemittance.objects.update_or_create(
+                date=day, cashier_id=cashier_id,
+                defaults={
+                    'total_collected': totals['total_collected'] or Decimal('0.00'),
+                    'payment_count': totals['payment_count'],
+                }
+            )
+        refreshed += 1
+
+    return refreshed
+
+
+def schedule_remittance_refresh(buckets) -> None:
+    """Refresh the given remittance buckets once the current transaction commits."""
+    buckets = set(buckets)
+    if buckets:
+        transaction.on_commit(lambda: refresh_daily_remittance(buckets))
+
+
+def rebuild_daily_remittance() -> int:
+    """
+    Rebuild every DailyRemittance row from the Payment table in one grouped query.
+
+    Returns:
+        Number of remittance rows written
+    """
+    from .models import Payment, DailyRemittance
+
+    groups = Payment.objects.annotate(
+        day=TruncDate('payment_date'),
+    ).values('day', 'processed_by_id').annotate(
+        total_collected=Sum('amount_paid'),
+        payment_count=Count('id'),
+    ).order_by()
+
+    rows = [
+        DailyRemittance(
+            date=group['day'],
+            cashier_id=group['processed_by_id'],
+            total_collected=group['total_collected'] or Decimal('0.00'),
+            payment_count=group['payment_count'],
+        )
+        for group in groups
+    ]
+
+    with transaction.atomic():
+        DailyRemittance.objects.all().delete()
+        DailyRemittance.objects.bulk_create(rows, batch_size=500)
+
+    return len(rows)
@@ -0,0 +1,280 @@
+# consumers/settings_cache.py
+"""
+Cached SystemSetting access for the Balilihan Waterworks Management System.
+
+SETTINGS SNAPSHOT
+-----------------
+Pricing, penalties, billing schedules and payment pages all need the
+SystemSetting row, and used to query it on every call. get_settings_snapshot()
+returns an immutable SettingsSnapshot instead:
+
+- Read-only attributes mirroring every SystemSetting field, so it can be
+  passed wherever a settings instance is only read
+- tier_table: the compiled rate table (see utils.compile_tier_rate_table)
+- penalty: the penalty parameters as a PenaltyParameters tuple
+
+The snapshot is kept per process and its field values in the shared
+cache. The process copy is compared with the cached settings version at
+most once per SETTINGS_VERSION_CHECK_INTERVAL (a cache read, which is a
+query with the database cache), so a billing run does not re-check it
+for every bill. SETTINGS_SNAPSHOT_LOCAL_TIMEOUT bounds how long a process
+keeps its copy at all.
+
+CONDITIONAL SETTINGS RESPONSES
+------------------------------
+
+Every device polls api_get_system_settings, api_get_current_rates and
+api_check_settings_version every few minutes. Each poll used to query
+SystemSetting and rebuild the same JSON.
+
+Now each response body is serialized once per settings version and kept
+in the Django cache together with its validators:
+
+- ETag: derived from SystemSetting.updated_at
+- Last-Modified: SystemSetting.updated_at
+
+A poll that sends a matching If-None-Match or If-Modified-Since gets an
+empty 304 without touching the database.
+
+Everything here is dropped whenever SystemSetting is saved or a
+SystemSettingChangeLog entry is recorded (see consumers/signals.py);
+SETTINGS_RESPONSE_CACHE_TIMEOUT bounds staleness for writes that bypass
+model signals.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType, SimpleNamespace
+from typing import NamedTuple
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+SETTINGS_VERSION_CACHE_KEY = 'system_settings:version'
+SETTINGS_SNAPSHOT_CACHE_KEY = 'system_settings:snapshot'
+SETTINGS_RESPONSE_CACHE_KEY = 'system_settings:response:{name}'
+
+# Names passed to cached_settings_response(); all are dropped on save
+RESPONSE_NAMES = ('rates', 'settings')
+
+
+def _timeout() -> int:
+    return getattr(django_settings, 'SETTINGS_RESPONSE_CACHE_TIMEOUT', 3600)
+
+
+# ============================================================================
+# SETTINGS SNAPSHOT
+# ============================================================================
+class PenaltyParameters(NamedTuple):
+    """Penalty rules from SystemSetting (see utils.calculate_penalty)."""
+    enabled: bool
+    type: str
+    rate: Decimal
+    fixed_amount: Decimal
+    grace_period_days: int
+    max_amount: Decimal
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """
+    Immutable view of the SystemSetting row at one version.
+
+    Field values are read as attributes (snapshot.residential_tier2_rate),
+    so a snapshot can be passed as the settings argument of the pricing
+    and penalty helpers in consumers/utils.py.
+    """
+    version: object
+    values: MappingProxyType
+    tier_table: MappingProxyType
+    penalty: PenaltyParameters
+
+    @classmethod
+    def from_values(cls, values):
+        from .utils import compile_tier_rate_table
+
+        row = SimpleNamespace(**values)
+        tier_table = compile_tier_rate_table(row)
+        return cls(
+            version=values['updated_at'],
+            values=MappingProxyType(dict(values)),
+            tier_table=MappingProxyType({
+                usage_type: MappingProxyType(rates) for usage_type, rates in tier_table.items()
+            }),
+            penalty=PenaltyParameters(
+                enabled=row.penalty_enabled,
+                type=row.penalty_type,
+                rate=row.penalty_rate,
+                fixed_amount=row.fixed_penalty_amount,
+                grace_period_days=row.penalty_grace_period_days,
+                max_amount=row.max_penalty_amount,
+            ),
+        )
+
+    def __getattr__(self, name):
+        # Only called for names that are not dataclass fields
+        if name.startswith('__') or name == 'values':
+            raise AttributeError(name)
+        try:
+            return self.values[name]
+        except KeyError:
+            raise AttributeError(f"SettingsSnapshot has no attribute {name!r}")
+
+
+# (snapshot, monotonic expiry, monotonic time of the last version check) for
+# this process; replaced wholesale, never mutated
+_local_snapshot = None
+
+
+def _load_snapshot_values():
+    from .models import SystemSetting
+
+    setting = SystemSetting.objects.first()
+    if setting is None:
+        return None
+    return {field.attname: getattr(setting, field.attname) for field in SystemSetting._meta.concrete_fields}
+
+
+def get_settings_snapshot():
+    """
+    Return the current SettingsSnapshot, or None if settings are not configured.
+
+    Served from this process while its version matches the cached settings
+    version, then from the shared cache, and only then from the database.
+
+    Example:
+        >>> snapshot = get_settings_snapshot()
+        >>> snapshot.tier_table['Residential']['minimum_charge']
+        Decimal('75.00')
+    """
+    global _local_snapshot
+
+    now = time.monotonic()
+    local = _local_snapshot
+    if local is not None and local[1] > now:
+        if now - local[2] < getattr(django_settings, 'SETTINGS_VERSION_CHECK_INTERVAL', 1):
+            return local[0]
+        version = cache.get(SETTINGS_VERSION_CACHE_KEY)
+        if version is not None and local[0].version == version:
+            _local_snapshot = (local[0], local[1], now)
+            return local[0]
+    else:
+        version = cache.get(SETTINGS_VERSION_CACHE_KEY)
+
+    values = cache.get(SETTINGS_SNAPSHOT_CACHE_KEY)
+    if values is None or (version is not None and values['updated_at'] != version):
+        values = _load_snapshot_values()
+        if values is None:
+            return None
+        cache.set(SETTINGS_SNAPSHOT_CACHE_KEY, values, _timeout())
+        cache.set(SETTINGS_VERSION_CACHE_KEY, values['updated_at'], _timeout())
+    elif version is None:
+        cache.set(SETTINGS_VERSION_CACHE_KEY, values['updated_at'], _timeout())
+
+    snapshot = SettingsSnapshot.from_values(values)
+    _local_snapshot = (snapshot, now + getattr(django_settings, 'SETTINGS_SNAPSHOT_LOCAL_TIMEOUT', 30), now)
+    return snapshot
+
+
+# ============================================================================
+# CONDITIONAL SETTINGS RESPONSES
+# ============================================================================
+def settings_etag(updated_at) -> str:
+    """Strong ETag for a settings version (microseconds since the epoch, in hex)."""
+    return '"%x"' % int(updated_at.timestamp() * 1_000_000)
+
+
+def get_settings_version():
+    """
+    Return SystemSetting.updated_at, cached, or None if settings are not configured.
+
+    Example:
+        >>> version = get_settings_version()
+        >>> settings_etag(version)
+        '"63f1c2a4b5d10"'
+    """
+    snapshot = get_settings_snapshot()
+    return snapshot.version if snapshot else None
+
+
+def conditional_response(request, updated_at, build_response):
+    """
+    Answer a GET/HEAD with 304 when the client already has this settings version.
+
+    Args:
+        request: The HttpRequest
+        updated_at: Settings version the response represents
+        build_response: Callable returning the full response on a miss
+
+    Returns:
+        HttpResponse carrying ETag and Last-Modified headers
+    """
+    etag = settings_etag(updated_at)
+    last_modified = int(updated_at.timestamp())
+
+    response = None
+    if request.method in ('GET', 'HEAD'):
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Devices may keep a copy but must revalidate it on every poll
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def cached_settings_response(request, name, build_payload):
+    """
+    Serve a settings payload from its pre-serialized cache entry, honoring conditional headers.
+
+    Args:
+        request: The HttpRequest
+        name: Cache entry name (one of RESPONSE_NAMES)
+        build_payload: Callable taking a SettingsSnapshot and returning a JSON-serializable dict
+
+    Returns:
+        HttpResponse (200 or 304), or None if settings are not configured
+
+    Example:
+        >>> response = cached_settings_response(request, 'rates', _rates_payload)
+    """
+    cache_key = SETTINGS_RESPONSE_CACHE_KEY.format(name=name)
+    entry = cache.get(cache_key)
+    if entry is None:
+        snapshot = get_settings_snapshot()
+        if not snapshot:
+            return None
+        entry = {
+            'updated_at': snapshot.version,
+            'body': json.dumps(build_payload(snapshot), cls=DjangoJSONEncoder).encode('utf-8'),
+        }
+        cache.set(cache_key, entry, _timeout())
+
+    return conditional_response(
+        request, entry['updated_at'],
+        lambda: HttpResponse(entry['body'], content_type='application/json')
+    )
+
+
+def invalidate_settings_cache() -> None:
+    """Drop the cached settings version, snapshot and responses, now and once the transaction commits."""
+    keys = [SETTINGS_VERSION_CACHE_KEY, SETTINGS_SNAPSHOT_CACHE_KEY] + [
+        SETTINGS_RESPONSE_CACHE_KEY.format(name=name) for name in RESPONSE_NAMES
+    ]
+
+    def drop():
+        global _local_snapshot
+        _local_snapshot = None
+        cache.delete_many(keys)
+
+    drop()
+    # A concurrent request may have re-cached the old row before the save committed
+    transaction.on_commit(drop)
@@ -0,0 +1,137 @@
+# consumers/signals.py
+"""
+Model signal receivers for the consumers app.
+
+Connected in ConsumersConfig.ready().
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .badges import invalidate_all_notifications, invalidate_pending_proof_count, invalidate_user_notifications
+from .kpis import invalidate_dashboard_kpis
+from .models import Bill, Consumer, ConsumerTombstone, MeterReading, Notification, Payment, SystemSetting, SystemSettingChangeLog
+from .rollups import (
+    bill_bucket, consumer_buckets, payment_bucket, remittance_bucket,
+    schedule_remittance_refresh, schedule_rollup_refresh
+)
+from .settings_cache import invalidate_settings_cache
+
+
+# ============================================================================
+# MONTHLY ROLLUPS - keep MonthlyRollup buckets current
+# ============================================================================
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def refresh_rollup_for_bill(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    schedule_rollup_refresh([bill_bucket(instance)])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_rollup_for_payment(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    schedule_rollup_refresh([payment_bucket(instance)])
+    schedule_remittance_refresh([remittance_bucket(instance)])
+
+
+@receiver(pre_save, sender=Consumer)
+def remember_consumer_grouping(sender, instance, **kwargs):
+    # Stored grouping before this save; also read by tombstone_moved_consumer
+    instance._previous_grouping = None
+    if kwargs.get('raw') or not instance.pk:
+        return
+    instance._previous_grouping = Consumer.objects.filter(pk=instance.pk).values_list(
+        'barangay_id', 'usage_type'
+    ).first()
+
+
+@receiver(post_save, sender=Consumer)
+def refresh_rollups_for_moved_consumer(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_grouping', None)
+    if kwargs.get('raw') or created or not previous:
+        return
+    if previous == (instance.barangay_id, instance.usage_type):
+        return
+    schedule_rollup_refresh(
+        consumer_buckets(instance.pk, *previous)
+        | consumer_buckets(instance.pk, instance.barangay_id, instance.usage_type)
+    )
+
+
+# ============================================================================
+# DASHBOARD KPIS - drop cached counters on writes
+# ============================================================================
+# Connected after the rollup receivers so the rollup refresh commits first
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_save, sender=Consumer)
+@receiver(post_delete, sender=Consumer)
+def invalidate_kpis_on_write(sender, instance, **kwargs):
+    invalidate_dashboard_kpis()
+
+
+# ============================================================================
+# NOTIFICATION BADGES - drop cached navbar/sidebar badge state on writes
+# ============================================================================
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_badges_for_notification(sender, instance, **kwargs):
+    if instance.user_id:
+        invalidate_user_notifications(instance.user_id)
+    else:
+        invalidate_all_notifications()
+
+
+@receiver(post_save, sender=MeterReading)
+@receiver(post_delete, sender=MeterReading)
+def invalidate_badges_for_reading(sender, instance, **kwargs):
+    invalidate_pending_proof_count()
+
+
+# ============================================================================
+# DELTA SYNC - record consumers leaving a barangay's list and bump consumers
+# whose bills or readings change in ways the sync filters cannot see
+# ============================================================================
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+@receiver(post_save, sender=MeterReading)
+@receiver(post_delete, sender=MeterReading)
+def touch_consumer_for_sync(sender, instance, created=False, **kwargs):
+    # New rows are found by their created_at; edits (status changes, admin
+    # corrections, cancellations) and deletes leave nothing to filter on
+    if kwargs.get('raw') or created:
+        return
+    Consumer.objects.filter(pk=instance.consumer_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Consumer)
+def tombstone_moved_consumer(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_grouping', None)
+    if kwargs.get('raw') or not previous:
+        return
+    previous_barangay_id = previous[0]
+    if previous_barangay_id and previous_barangay_id != instance.barangay_id:
+        ConsumerTombstone.objects.create(consumer_id=instance.pk, barangay_id=previous_barangay_id)
+
+
+@receiver(post_delete, sender=Consumer)
+def tombstone_deleted_consumer(sender, instance, **kwargs):
+    if instance.barangay_id:
+        ConsumerTombstone.objects.create(consumer_id=instance.pk, barangay_id=instance.barangay_id)
+
+
+# ============================================================================
+# SYSTEM SETTINGS - drop the cached snapshot and settings responses on writes
+# ============================================================================
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+@receiver(post_save, sender=SystemSettingChangeLog)
+def invalidate_settings_responses(sender, instance, **kwargs):
+    invalidate_settings_cache()
@@ -1,9 +1,83 @@
-from django.test import TestCase
+import base64
+import dataclasses
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
+import openpyxl
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from decimal import Decimal
 from django.utils import timezone
-from datetime import timedelta
-from consumers.models import SystemSetting, Consumer, Bill
-from consumers.utils import calculate_tiered_water_bill, calculate_penalty
+from datetime import date, timedelta
+from consumers.api_auth import _token_lru, resolve_token
+from consumers.api_encoding import COLUMNAR_MEDIA_TYPE
+from consumers.badges import get_badge_state
+from consumers.billing import generate_bills_for_readings
+from consumers.exports import write_fixture
+from consumers.kpis import get_dashboard_kpis
+from consumers.ledger import get_barangay_ledger
+from consumers.maintenance import run_maintenance
+from consumers.models import (
+    SystemSetting, Consumer, Bill, MeterReading, Barangay, Payment, MonthlyRollup,
+    MaintenanceTaskRun, Notification, StaffProfile, ProofImageUpload, SystemSettingChangeLog, ReportJob,
+)
+from consumers.readings import latest_reading_rows, previous_confirmed_values
+from consumers.remittance import cashier_remittance_totals, overall_remittance_totals
+from consumers.rollups import rebuild_daily_remittance, rebuild_monthly_rollups
+from consumers.settings_cache import get_settings_snapshot
+from consumers.uploads import process_pending_uploads, process_proof_upload
+from consumers.utils import (
+    calculate_tiered_water_bill, calculate_penalty,
+    compile_tier_rate_table, calculate_tiered_water_bills, tiered_bill_breakdown,
+    sweep_penalties,
+)
+
+
+def make_consumer(**fields):
+    """Create a Consumer with every required field filled in; keyword arguments override the defaults."""
+    defaults = {
+        'first_name': "Test",
+        'last_name': "Consumer",
+        'birth_date': "1980-01-01",
+        'gender': "Male",
+        'phone_number': "09123456789",
+        'civil_status': "Single",
+        'household_number': "HH-001",
+        'usage_type': "Residential",
+        'first_reading': 0,
+        'registration_date': timezone.now().date(),
+    }
+    defaults.update(fields)
+    return Consumer.objects.create(**defaults)
+
+
+def make_user(username, superuser=False, **fields):
+    """Create a user (password 'pass1234'); keyword arguments such as is_staff are set on it."""
+    email = f"{username}@example.com"
+    if superuser:
+        return User.objects.create_superuser(username, email, 'pass1234')
+    return User.objects.create_user(username, email, 'pass1234', **fields)
+
+
+def login_user(client, username, superuser=False, **fields):
+    """Create a user with make_user() and log the test client in as them."""
+    user = make_user(username, superuser, **fields)
+    client.force_login(user)
+    return user
+
 
 class BillingLogicTests(TestCase):
     def setUp(self):
@@ -64,6 +138,42 @@ class BillingLogicTests(TestCase):
         self.assertEqual(total, Decimal('290.00'))
 
 
+class BatchBillingTests(TestCase):
+    def setUp(self):
+        self.settings = SystemSetting.objects.create(
+            residential_minimum_charge=Decimal('75.00'),
+            residential_tier2_rate=Decimal('15.25'),
+            residential_tier3_rate=Decimal('16.00'),
+            residential_tier4_rate=Decimal('17.35'),
+            residential_tier5_rate=Decimal('18.00'),
+            commercial_minimum_charge=Decimal('100.00'),
+            commercial_tier2_rate=Decimal('18.00'),
+            commercial_tier3_rate=Decimal('20.10'),
+            commercial_tier4_rate=Decimal('22.00'),
+            commercial_tier5_rate=Decimal('24.75'),
+        )
+
+    def test_batch_matches_scalar(self):
+        consumptions = list(range(0, 121)) * 2
+        usage_types = ['Residential'] * 121 + ['Commercial'] * 121
+        batch = calculate_tiered_water_bills(
+            consumptions, usage_types, rate_table=compile_tier_rate_table(self.settings)
+        )
+        for i, (cons, usage) in enumerate(zip(consumptions, usage_types)):
+            total, avg_rate, expected = calculate_tiered_water_bill(cons, usage, self.settings)
+            breakdown = tiered_bill_breakdown(batch, i)
+            self.assertEqual(breakdown['total_amount'], total)
+            self.assertEqual(breakdown['average_rate'], avg_rate)
+            for key in expected:
+                if key != 'usage_type':
+                    self.assertEqual(breakdown[key], expected[key], f"{key} for {cons} {usage}")
+
+    def test_batch_fetches_settings_once(self):
+        with self.assertNumQueries(1):
+            batch = calculate_tiered_water_bills([3, 25], ['Residential', 'Commercial'])
+        self.assertEqual(batch['total_amount'][0], Decimal('75.00'))
+
+
 class PenaltyCalculationTests(TestCase):
     def setUp(self):
         self.settings = SystemSetting.objects.create(
@@ -127,3 +237,898 @@ class PenaltyCalculationTests(TestCase):
         self.mock_bill.due_date = self.today - timedelta(days=10)
         penalty, days, _ = calculate_penalty(self.mock_bill, self.settings)
         self.assertEqual(penalty, Decimal('500.00'))
+
+
+class BillingRunTests(TestCase):
+    def setUp(self):
+        self.settings = SystemSetting.objects.create()
+        self.today = timezone.now().date()
+
+    def test_bills_generated_and_rejects_reported(self):
+        first = make_consumer(first_reading=100)
+        MeterReading.objects.create(consumer=first, reading_date=self.today - timedelta(days=40),
+                                    reading_value=110, is_confirmed=True)
+        good = MeterReading.objects.create(consumer=first, reading_date=self.today, reading_value=135)
+
+        second = make_consumer(first_reading=50, usage_type='Commercial')
+        bad = MeterReading.objects.create(consumer=second, reading_date=self.today, reading_value=40)
+
+        result = generate_bills_for_readings(MeterReading.objects.filter(is_confirmed=False))
+
+        self.assertEqual(result['confirmed_count'], 1)
+        self.assertEqual([r['reading_id'] for r in result['rejects']], [bad.id])
+
+        bill = Bill.objects.get(current_reading=good)
+        expected_total, _, _ = calculate_tiered_water_bill(25, 'Residential', self.settings)
+        self.assertEqual(bill.consumption, 25)
+        self.assertEqual(bill.total_amount, expected_total)
+        self.assertEqual(bill.previous_reading.reading_value, 110)
+
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertTrue(good.is_confirmed)
+        self.assertFalse(bad.is_confirmed)
+
+    def test_query_count_is_constant(self):
+        for value in range(10):
+            consumer = make_consumer()
+            MeterReading.objects.create(consumer=consumer, reading_date=self.today, reading_value=value * 7)
+
+        # settings, readings, savepoint, bulk_create, bulk_update, release
+        with self.assertNumQueries(6):
+            result = generate_bills_for_readings(MeterReading.objects.all(), settings=None)
+        self.assertEqual(result['confirmed_count'], 10)
+
+
+class PenaltySweepTests(TestCase):
+    def setUp(self):
+        self.settings = SystemSetting.objects.create(
+            penalty_enabled=True,
+            penalty_type='percentage',
+            penalty_rate=Decimal('25.00'),
+            penalty_grace_period_days=3,
+            max_penalty_amount=Decimal('0.00'),
+        )
+        self.today = timezone.now().date()
+        self.consumer = make_consumer()
+
+    def make_bill(self, total, days_past_due, **kwargs):
+        reading = MeterReading.objects.create(
+            consumer=self.consumer, reading_date=self.today, reading_value=10, is_confirmed=True
+        )
+        return Bill.objects.create(
+            consumer=self.consumer,
+            current_reading=reading,
+            billing_period=self.today.replace(day=1),
+            due_date=self.today - timedelta(days=days_past_due),
+            consumption=10,
+            total_amount=Decimal(total),
+            **kwargs
+        )
+
+    def assert_matches_scalar(self, bills):
+        summary = sweep_penalties(settings=self.settings)
+        for bill in bills:
+            expected_penalty, expected_days, _ = calculate_penalty(bill, self.settings)
+            bill.refresh_from_db()
+            self.assertEqual(bill.penalty_amount, expected_penalty, f"total {bill.total_amount}")
+            self.assertEqual(bill.days_overdue, expected_days)
+        return summary
+
+    def test_percentage_sweep_matches_scalar(self):
+        bills = [
+            self.make_bill('10.10', 10),    # 2.525 rounds half up
+            self.make_bill('395.00', 4),
+            self.make_bill('75.00', 3),     # last day of grace
+            self.make_bill('120.30', 1),
+            self.make_bill('88.00', -5),    # not yet due
+        ]
+        summary = self.assert_matches_scalar(bills)
+        self.assertEqual(summary['checked'], 5)
+        self.assertEqual(summary['updated'], 4)
+        self.assertEqual(summary['newly_penalized'], 2)
+
+        # Second run is a no-op
+        self.assertEqual(sweep_penalties(settings=self.settings)['updated'], 0)
+
+    def test_fixed_cap_and_waived(self):
+        self.settings.penalty_type = 'fixed'
+        self.settings.fixed_penalty_amount = Decimal('80.00')
+        self.settings.max_penalty_amount = Decimal('60.00')
+        self.settings.save()
+        bill = self.make_bill('500.00', 10)
+        waived = self.make_bill('500.00', 10, penalty_waived=True)
+        self.assert_matches_scalar([bill])
+        self.assertEqual(bill.penalty_amount, Decimal('60.00'))
+        waived.refresh_from_db()
+        self.assertEqual(waived.penalty_amount, Decimal('0.00'))
+
+    def test_percentage_cap(self):
+        self.settings.max_penalty_amount = Decimal('50.00')
+        self.settings.save()
+        bills = [self.make_bill('1000.00', 10), self.make_bill('100.00', 10)]
+        self.assert_matches_scalar(bills)
+        self.assertEqual(bills[0].penalty_amount, Decimal('50.00'))
+        self.assertEqual(bills[1].penalty_amount, Decimal('25.00'))
+
+
+class InquireListTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.create()
+        self.today = timezone.now().date()
+        self.user = login_user(self.client, 'cashier', superuser=True)
+
+    def test_list_uses_latest_pending_bill_without_recomputing(self):
+        for index in range(3):
+            consumer = make_consumer(last_name=f"Consumer{index}")
+            for months_back in (2, 1):
+                reading = MeterReading.objects.create(
+                    consumer=consumer, reading_date=self.today - timedelta(days=30 * months_back),
+                    reading_value=10 * (3 - months_back), is_confirmed=True
+                )
+                Bill.objects.create(
+                    consumer=consumer,
+                    current_reading=reading,
+                    billing_period=self.today - timedelta(days=30 * months_back),
+                    due_date=self.today - timedelta(days=30 * months_back - 19),
+                    consumption=10,
+                    rate_per_cubic=Decimal('7.50'),
+                    total_amount=Decimal('75.00'),
+                    status='Pending',
+                )
+
+        response = self.client.get(reverse('consumers:inquire'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['consumers']), 3)
+        for consumer in response.context['consumers']:
+            bill = response.context['consumer_bills'][consumer.id]
+            self.assertEqual(bill.billing_period, self.today - timedelta(days=30))
+            # Stored penalty is shown as-is; the sweep owns recomputation
+            self.assertEqual(bill.penalty_amount, Decimal('0.00'))
+
+        # Selecting a consumer recomputes only that consumer's penalties
+        response = self.client.get(reverse('consumers:inquire'), {'consumer': consumer.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['pending_bills']), 2)
+
+
+class BarangayLedgerTests(TestCase):
+    def setUp(self):
+        self.barangay = Barangay.objects.create(name="Ledger Barangay")
+
+    def test_ledger_pivots_in_constant_queries(self):
+        for index in range(4):
+            consumer = make_consumer(last_name=f"Consumer{index}", barangay=self.barangay)
+            for month in (1, 2, 3):
+                reading = MeterReading.objects.create(
+                    consumer=consumer, reading_date=date(2025, month, 5),
+                    reading_value=10 * month, is_confirmed=True
+                )
+                bill = Bill.objects.create(
+                    consumer=consumer,
+                    current_reading=reading,
+                    billing_period=date(2025, month, 1),
+                    due_date=date(2025, month, 20),
+                    consumption=10,
+                    total_amount=Decimal('75.00'),
+                    status='Pending',
+                )
+            Payment.objects.create(
+                bill=bill, amount_paid=Decimal('75.00'), received_amount=Decimal('75.00'),
+                change=Decimal('0.00'), or_number=f"OR-{index}"
+            )
+        make_consumer(last_name="NoBills", barangay=self.barangay)
+
+        # consumers, bills, payments
+        with self.assertNumQueries(3):
+            ledger = get_barangay_ledger(self.barangay, 2025, use_cache=False)
+
+        self.assertEqual(len(ledger), 5)
+        months = ledger[0]['months']
+        self.assertEqual(months[1]['reading'], 20)
+        self.assertEqual(months[2]['amount_due'], Decimal('75.00'))
+        self.assertEqual(months[2]['receipt_number'], "OR-0")
+        self.assertEqual(months[3]['amount_due'], '')
+        self.assertTrue(all(m['amount_due'] == '' for m in ledger[-1]['months']))
+
+
+class MonthlyRollupTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.barangay = Barangay.objects.create(name="Rollup Barangay")
+        self.consumer = make_consumer(barangay=self.barangay)
+
+    def make_bill(self, consumption, total):
+        reading = MeterReading.objects.create(
+            consumer=self.consumer, reading_date=self.today, reading_value=consumption, is_confirmed=True
+        )
+        return Bill.objects.create(
+            consumer=self.consumer,
+            current_reading=reading,
+            billing_period=self.today.replace(day=1),
+            due_date=self.today,
+            consumption=consumption,
+            total_amount=Decimal(total),
+        )
+
+    def test_incremental_refresh_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.make_bill(10, '75.00')
+            self.make_bill(25, '300.00')
+            Payment.objects.create(
+                bill=first, amount_paid=Decimal('80.00'), received_amount=Decimal('100.00'),
+                penalty_amount=Decimal('5.00'), or_number="OR-ROLLUP-1"
+            )
+
+        rollup = MonthlyRollup.objects.get(barangay=self.barangay, usage_type="Residential")
+        self.assertEqual(rollup.bills_issued, 2)
+        self.assertEqual(rollup.consumption, 35)
+        self.assertEqual(rollup.payment_count, 1)
+        self.assertEqual(rollup.income, Decimal('80.00'))
+        self.assertEqual(rollup.penalty_collected, Decimal('5.00'))
+        self.assertEqual(rollup.paid_consumption, 10)
+
+        incremental = MonthlyRollup.objects.values(
+            'year', 'month', 'income', 'penalty_collected', 'payment_count',
+            'paid_consumption', 'consumption', 'bills_issued'
+        ).get()
+        self.assertEqual(rebuild_monthly_rollups(), 1)
+        self.assertEqual(MonthlyRollup.objects.values(*incremental).get(), incremental)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Bill.objects.all().delete()
+        self.assertFalse(MonthlyRollup.objects.exists())
+
+    def test_moving_consumer_refreshes_old_and_new_buckets(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_bill(10, '75.00')
+        other = Barangay.objects.create(name="Other Barangay")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.consumer.barangay = other
+            self.consumer.usage_type = "Commercial"
+            self.consumer.save()
+
+        rollup = MonthlyRollup.objects.get()
+        self.assertEqual((rollup.barangay_id, rollup.usage_type), (other.id, "Commercial"))
+        self.assertEqual(rollup.bills_issued, 1)
+
+
+class DashboardKpiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_cached_until_write(self):
+        kpis = get_dashboard_kpis()
+        self.assertEqual(kpis['connected_count'], 0)
+        with self.assertNumQueries(0):
+            get_dashboard_kpis()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_consumer(status='active')
+        self.assertEqual(get_dashboard_kpis()['connected_count'], 1)
+
+
+class MaintenanceTests(TestCase):
+    def test_due_tasks_run_and_ledger_recorded(self):
+        old = Notification.objects.create(
+            notification_type='system_alert', title="Old", message="Old",
+            created_at=timezone.now() - timedelta(days=45)
+        )
+        Notification.objects.create(notification_type='system_alert', title="New", message="New")
+
+        results = run_maintenance()
+        self.assertTrue(all(run['status'] == 'success' for run in results))
+        self.assertFalse(Notification.objects.filter(pk=old.pk).exists())
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(MaintenanceTaskRun.objects.get(name='purge_notifications').run_count, 1)
+
+        # Nothing is due on an immediate second run
+        results = run_maintenance()
+        self.assertTrue(all(run['status'] == 'skipped' for run in results))
+
+        results = run_maintenance(['purge_notifications'], force=True)
+        self.assertEqual([run['status'] for run in results], ['success'])
+        with self.assertRaises(ValueError):
+            run_maintenance(['no_such_task'])
+
+
+class NotificationBadgeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('badge', superuser=True)
+
+    def test_badge_state_cached_until_notification_written(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(notification_type='system_alert', title="Global", message="Hi")
+
+        state = get_badge_state(self.user)
+        self.assertEqual(state['unread_notifications_count'], 1)
+        self.assertEqual(state['pending_proof_readings_count'], 0)
+        with self.assertNumQueries(0):
+            get_badge_state(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(
+                user=self.user, notification_type='system_alert', title="Mine", message="Hi"
+            )
+        self.assertEqual(get_badge_state(self.user)['unread_notifications_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.get(title="Global").mark_as_read()
+        self.assertEqual(get_badge_state(self.user)['unread_notifications_count'], 1)
+
+
+class CashierRemittanceTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.cashiers = [make_user(f'cashier{i}') for i in range(3)]
+        consumer = make_consumer(registration_date=self.today)
+        for index, cashier in enumerate(self.cashiers):
+            for n in range(index + 1):
+                reading = MeterReading.objects.create(
+                    consumer=consumer, reading_date=self.today, reading_value=10, is_confirmed=True
+                )
+                bill = Bill.objects.create(
+                    consumer=consumer, current_reading=reading, billing_period=self.today.replace(day=1),
+                    due_date=self.today, consumption=10, total_amount=Decimal('75.00'),
+                )
+                Payment.objects.create(
+                    bill=bill, amount_paid=Decimal('75.00'), received_amount=Decimal('100.00'),
+                    or_number=f"OR-{index}-{n}", processed_by=cashier
+                )
+
+    def test_grouped_totals_match_per_cashier(self):
+        ids = [cashier.id for cashier in self.cashiers]
+        with self.assertNumQueries(1):
+            totals = cashier_remittance_totals(self.today, self.today, self.today, cashier_ids=ids)
+        for index, cashier in enumerate(self.cashiers):
+            self.assertEqual(totals[cashier.id]['today_count'], index + 1)
+            self.assertEqual(totals[cashier.id]['alltime_total'], Decimal('75.00') * (index + 1))
+        self.assertEqual(overall_remittance_totals(self.today, self.today, self.today)['period_count'], 6)
+
+        rebuild_daily_remittance()
+        with override_settings(CASHIER_REMITTANCE_USE_DAILY_TABLE=True):
+            self.assertEqual(cashier_remittance_totals(self.today, self.today, self.today, cashier_ids=ids), totals)
+
+
+class ConsumerDeltaSyncTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.create()
+        self.today = timezone.now().date()
+        self.barangay = Barangay.objects.create(name="Poblacion")
+        self.other_barangay = Barangay.objects.create(name="Cabad")
+        self.user = login_user(self.client, 'reader')
+        StaffProfile.objects.update_or_create(
+            user=self.user, defaults={'assigned_barangay': self.barangay, 'role': 'field_staff'}
+        )
+        self.consumers = [
+            make_consumer(last_name=f"Consumer{index}", barangay=self.barangay, registration_date=self.today)
+            for index in range(3)
+        ]
+
+    def test_sync_returns_changes_and_removals_since_cursor(self):
+        url = reverse('consumers:api_consumers_sync')
+        response = self.client.get(url).json()
+        self.assertTrue(response['full_sync'])
+        self.assertEqual(len(response['consumers']), 3)
+
+        # Push earlier changes outside the cursor overlap window
+        Consumer.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = timezone.now().isoformat()
+
+        changed, moved, _ = self.consumers
+        MeterReading.objects.create(consumer=changed, reading_date=self.today, reading_value=15, is_confirmed=True)
+        moved.barangay = self.other_barangay
+        moved.save()
+
+        response = self.client.get(url, {'since': cursor}).json()
+        self.assertFalse(response['full_sync'])
+        self.assertEqual([entry['id'] for entry in response['consumers']], [changed.id])
+        self.assertEqual(response['consumers'][0]['latest_confirmed_reading'], 15)
+        self.assertEqual(response['removed'], [moved.id])
+
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+
+    def test_sync_returns_consumers_whose_readings_were_deleted(self):
+        reading = MeterReading.objects.create(
+            consumer=self.consumers[0], reading_date=self.today, reading_value=15, is_confirmed=True
+        )
+        MeterReading.objects.filter(pk=reading.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        MeterReading.objects.filter(pk=reading.pk).update(confirmed_at=None)
+        Consumer.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        cursor = timezone.now().isoformat()
+
+        reading.delete()
+
+        response = self.client.get(reverse('consumers:api_consumers_sync'), {'since': cursor}).json()
+        self.assertEqual([entry['id'] for entry in response['consumers']], [self.consumers[0].id])
+        self.assertEqual(response['consumers'][0]['latest_confirmed_reading'], 0)
+
+
+class LatestReadingRowsTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.create()
+        self.today = timezone.now().date()
+        self.barangay = Barangay.objects.create(name="Poblacion")
+        self.user = login_user(self.client, 'admin', superuser=True)
+        for index in range(3):
+            consumer = make_consumer(
+                last_name=f"Consumer{index}", barangay=self.barangay, first_reading=5, registration_date=self.today
+            )
+            if index == 2:
+                continue  # No readings yet
+            MeterReading.objects.create(
+                consumer=consumer, reading_date=self.today - timedelta(days=60), reading_value=10, is_confirmed=True
+            )
+            MeterReading.objects.create(
+                consumer=consumer, reading_date=self.today - timedelta(days=30), reading_value=20, is_confirmed=True
+            )
+            MeterReading.objects.create(
+                consumer=consumer, reading_date=self.today, reading_value=32, source='app_manual'
+            )
+
+    def test_rows_pick_latest_and_previous_confirmed_reading(self):
+        with self.assertNumQueries(3):
+            rows = latest_reading_rows(Consumer.objects.filter(barangay=self.barangay).order_by('id'))
+
+        self.assertEqual([row['consumption'] for row in rows], [12, 12, None])
+        self.assertEqual(rows[0]['reading'].reading_value, 32)
+        self.assertEqual(rows[0]['prev_reading'].reading_value, 20)
+        self.assertIsNone(rows[2]['reading'])
+
+        response = self.client.get(reverse('consumers:barangay_meter_readings', args=[self.barangay.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['pending_count'], 2)
+        self.assertEqual(response.context['no_reading_count'], 1)
+
+        response = self.client.get(reverse('consumers:export_barangay_readings', args=[self.barangay.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+class ReadingBatchSubmissionTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.create()
+        self.today = timezone.now().date()
+        barangay = Barangay.objects.create(name="Poblacion")
+        self.user = login_user(self.client, 'reader')
+        self.consumers = [
+            make_consumer(
+                last_name=f"Consumer{index}", barangay=barangay, first_reading=100, registration_date=self.today
+            )
+            for index in range(2)
+        ]
+
+    def post_batch(self, readings):
+        return self.client.post(
+            reverse('consumers:api_submit_reading_batch'),
+            data=json.dumps({'readings': readings}),
+            content_type='application/json'
+        )
+
+    def test_batch_creates_bills_and_replays_retries(self):
+        readings = [
+            {'idempotency_key': 'k1', 'consumer_id': self.consumers[0].id, 'reading': 112},
+            {'idempotency_key': 'k2', 'consumer_id': self.consumers[1].id, 'reading': 90},  # Below first reading
+            {'idempotency_key': 'k3', 'consumer_id': 999999, 'reading': 5},
+        ]
+        response = self.post_batch(readings).json()
+        self.assertEqual([result['status'] for result in response['results']], ['created', 'error', 'error'])
+        self.assertEqual(response['results'][0]['consumption'], 12)
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual(MeterReading.objects.count(), 1)
+
+        # Retry after a dropped connection: the stored result comes back, nothing is written
+        readings[1]['reading'] = 130
+        response = self.post_batch(readings).json()
+        self.assertEqual([result['status'] for result in response['results']], ['replayed', 'created', 'error'])
+        self.assertEqual(response['results'][0]['consumption'], 12)
+        self.assertEqual(Bill.objects.count(), 2)
+        self.assertEqual(MeterReading.objects.count(), 2)
+
+    def test_single_submission_replays_idempotency_key(self):
+        url = reverse('consumers:api_submit_reading')
+        payload = json.dumps({'consumer_id': self.consumers[0].id, 'reading': 120})
+
+        first = self.client.post(url, data=payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(first.status_code, 200)
+
+        # Served from the cache front, then from the table once the cache is gone
+        for clear_cache in (False, True):
+            if clear_cache:
+                cache.clear()
+            retry = self.client.post(url, data=payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='retry-1')
+            self.assertEqual(retry.json(), first.json())
+            self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(MeterReading.objects.count(), 1)
+        self.assertEqual(Bill.objects.count(), 1)
+
+        # The key belongs to its user: anonymous callers and other users never get the stored response
+        self.client.logout()
+        anonymous = self.client.post(url, data=payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertFalse(anonymous.has_header('Idempotent-Replayed'))
+        self.assertNotEqual(anonymous.content, first.content)
+
+        login_user(self.client, 'other')
+        second = self.client.post(url, data=json.dumps({'consumer_id': self.consumers[1].id, 'reading': 120}),
+                                  content_type='application/json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertFalse(second.has_header('Idempotent-Replayed'))
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(Bill.objects.count(), 2)
+
+
+class ApiTokenAuthTests(TestCase):
+    def setUp(self):
+        _token_lru.clear()
+        self.user = make_user('reader')
+        StaffProfile.objects.update_or_create(
+            user=self.user, defaults={'assigned_barangay': Barangay.objects.create(name="Poblacion")}
+        )
+        session = SessionStore()
+        session['_auth_user_id'] = str(self.user.pk)
+        session.create()
+        self.token = session.session_key
+
+    def test_token_resolves_from_cache_and_is_revoked_on_logout(self):
+        self.assertEqual(resolve_token(self.token), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_token(self.token), self.user)
+
+        url = reverse('consumers:api_consumers_sync')
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+        self.assertEqual(self.client.get(url, **auth).status_code, 200)
+
+        self.client.post(reverse('consumers:api_logout'), **auth)
+        self.assertIsNone(resolve_token(self.token))
+        self.assertEqual(self.client.get(url, **auth).status_code, 302)
+
+
+def failing_uploader(file_path, public_id):
+    raise ConnectionError("Upload timed out")
+
+
+class ProofUploadQueueTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.create()
+        self.tmp = tempfile.mkdtemp()
+        self.user = login_user(self.client, 'reader')
+        self.consumer = make_consumer(barangay=Barangay.objects.create(name="Poblacion"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _photo(self, size=(4000, 3000)):
+        """A camera-sized JPEG carrying GPS-style EXIF metadata."""
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'  # Make
+        buffer = BytesIO()
+        Image.new('RGB', size, (40, 120, 200)).save(buffer, 'JPEG', quality=95, exif=exif)
+        return buffer.getvalue()
+
+    def test_manual_reading_queues_upload_for_worker(self):
+        with override_settings(PROOF_UPLOAD_WORKERS=0, PROOF_IMAGE_UPLOADER='local', MEDIA_ROOT=self.tmp):
+            response = self.client.post(
+                reverse('consumers:api_submit_manual_reading'),
+                data=json.dumps({
+                    'consumer_id': self.consumer.id,
+                    'reading': 15,
+                    'proof_image': base64.b64encode(self._photo((800, 600))).decode(),
+                }),
+                content_type='application/json'
+            ).json()
+            self.assertEqual(response['proof_upload_status'], 'queued')
+            reading = MeterReading.objects.get(id=response['reading_id'])
+            self.assertIsNone(reading.proof_image_url)
+
+            upload = ProofImageUpload.objects.get(reading=reading, kind='image')
+            self.assertTrue(upload.image_data)
+            self.assertEqual(process_pending_uploads(), {'uploaded': 2})
+            reading.refresh_from_db()
+            self.assertTrue(reading.proof_image_url.startswith('/media/meter_proofs/'))
+            upload.refresh_from_db()
+            self.assertEqual(bytes(upload.image_data), b'')
+            # Already claimed and finished: a second worker does nothing
+            self.assertEqual(process_proof_upload(upload.id), 'uploaded')
+
+        # A failing provider is retried, then the upload is marked failed and the image kept
+        upload = ProofImageUpload.objects.create(reading=reading, image_data=b'retry', public_id='retry')
+        with override_settings(PROOF_IMAGE_UPLOADER='consumers.tests.failing_uploader'):
+            self.assertEqual(process_proof_upload(upload.id, max_attempts=3, backoff=0), 'failed')
+        upload.refresh_from_db()
+        self.assertEqual(upload.attempts, 3)
+        self.assertIn('timed out', upload.last_error)
+        self.assertEqual(bytes(upload.image_data), b'retry')
+
+        # An upload whose worker died while uploading is queued again
+        stuck = ProofImageUpload.objects.create(reading=reading, image_data=b'stuck', public_id='stuck',
+                                                status='uploading')
+        ProofImageUpload.objects.filter(id=stuck.id).update(
+            created_at=timezone.now() - timedelta(hours=1), updated_at=timezone.now() - timedelta(hours=1)
+        )
+        with override_settings(PROOF_IMAGE_UPLOADER='local', MEDIA_ROOT=self.tmp):
+            self.assertEqual(process_pending_uploads(older_than=timedelta(minutes=10)), {'uploaded': 1})
+
+    def test_multipart_photo_is_downscaled_and_stripped(self):
+        photo = self._photo()
+        with override_settings(PROOF_UPLOAD_WORKERS=0, PROOF_IMAGE_UPLOADER='local', MEDIA_ROOT=self.tmp,
+                               PROOF_IMAGE_MAX_EDGE=1600, PROOF_THUMBNAIL_EDGE=320):
+            response = self.client.post(reverse('consumers:api_submit_manual_reading'), {
+                'consumer_id': self.consumer.id,
+                'reading': 15,
+                'proof_image': SimpleUploadedFile('meter.jpg', photo, content_type='image/jpeg'),
+            }).json()
+            self.assertEqual(response['proof_upload_status'], 'queued')
+            self.assertEqual(process_pending_uploads(), {'uploaded': 2})
+
+        reading = MeterReading.objects.get(id=response['reading_id'])
+        self.assertTrue(reading.proof_thumbnail_url.endswith('_thumb.webp'))
+        for url, edge in ((reading.proof_image_url, 1600), (reading.proof_thumbnail_url, 320)):
+            path = os.path.join(self.tmp, url.split('/media/', 1)[1])
+            with Image.open(path) as image:
+                self.assertEqual(max(image.size), edge)
+                self.assertFalse(image.getexif())
+            self.assertLess(os.path.getsize(path), len(photo))
+
+
+class SettingsConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # The singleton row is seeded by a data migration
+        self.settings = SystemSetting.objects.first()
+
+    def test_unchanged_settings_return_304_without_queries(self):
+        url = reverse('consumers:api_get_system_settings')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['reading_schedule']['start_day'], self.settings.reading_start_day)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        version_url = reverse('consumers:api_check_settings_version')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(version_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Saving settings drops the cached body and changes the ETag
+        self.settings.reading_start_day = 5
+        self.settings.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['reading_schedule']['start_day'], 5)
+
+
+class SettingsSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.settings = SystemSetting.objects.first()
+
+    def test_snapshot_is_cached_and_invalidated_on_change(self):
+        snapshot = get_settings_snapshot()
+        self.assertEqual(snapshot.residential_tier2_rate, self.settings.residential_tier2_rate)
+        self.assertEqual(snapshot.tier_table['Residential']['tier2_rate'], self.settings.residential_tier2_rate)
+        self.assertEqual(snapshot.penalty.grace_period_days, self.settings.penalty_grace_period_days)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            snapshot.residential_tier2_rate = Decimal('1.00')
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_settings_snapshot(), snapshot)
+            total, _, _ = calculate_tiered_water_bill(10, 'Residential')
+        self.assertEqual(total, self.settings.residential_minimum_charge + 5 * self.settings.residential_tier2_rate)
+
+        self.settings.residential_tier2_rate = Decimal('30.00')
+        self.settings.save()
+        self.assertEqual(get_settings_snapshot().residential_tier2_rate, Decimal('30.00'))
+
+        # Writes that bypass save() are picked up once the change is logged
+        SystemSetting.objects.filter(pk=self.settings.pk).update(
+            residential_tier2_rate=Decimal('31.00'), updated_at=timezone.now()
+        )
+        SystemSettingChangeLog.log_change(None, 'residential_rates', 'Rate update', {}, {})
+        self.assertEqual(get_settings_snapshot().tier_table['Residential']['tier2_rate'], Decimal('31.00'))
+
+
+class CompactApiEncodingTests(TestCase):
+    def setUp(self):
+        barangay = Barangay.objects.create(name="Poblacion")
+        self.user = login_user(self.client, 'reader')
+        StaffProfile.objects.update_or_create(
+            user=self.user, defaults={'assigned_barangay': barangay, 'role': 'field_staff'}
+        )
+        for index in range(20):
+            make_consumer(last_name=f"Consumer{index}", household_number=f"HH-{index:03d}", barangay=barangay)
+
+    def test_columnar_encoding_and_gzip(self):
+        url = reverse('consumers:api_consumers')
+        rows = self.client.get(url).json()
+        self.assertEqual(len(rows), 20)
+
+        response = self.client.get(url, HTTP_ACCEPT=COLUMNAR_MEDIA_TYPE)
+        self.assertEqual(response['Content-Type'], COLUMNAR_MEDIA_TYPE)
+        self.assertIn('Accept', response['Vary'])
+        body = json.loads(response.content)
+        self.assertEqual(body['count'], 20)
+        self.assertNotIn('name', body['columns'])
+        self.assertEqual(body['columns']['last_name'], [row['last_name'] for row in rows])
+        self.assertLess(len(response.content), len(json.dumps(rows)))
+
+        response = self.client.get(url, HTTP_ACCEPT=COLUMNAR_MEDIA_TYPE, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), body)
+
+
+class StreamingExcelExportTests(TestCase):
+    def test_revenue_report_streams_with_totals(self):
+        login_user(self.client, 'cashier', is_staff=True)
+        consumer = make_consumer()
+        reading = MeterReading.objects.create(
+            consumer=consumer, reading_date=date(2025, 1, 5), reading_value=10, is_confirmed=True
+        )
+        bill = Bill.objects.create(
+            consumer=consumer, current_reading=reading,
+            billing_period=date(2025, 1, 1), due_date=date(2025, 1, 20),
+            consumption=10, total_amount=Decimal('150.00'), status='Paid',
+        )
+        for index, amount in enumerate((Decimal('100.00'), Decimal('50.50'))):
+            Payment.objects.create(
+                bill=bill, amount_paid=amount, received_amount=amount + 10,
+                change=Decimal('10.00'), or_number=f"OR-{index}"
+            )
+
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('consumers:export_report_excel'), {
+            'report_type': 'revenue', 'date_from': '2000-01-01', 'date_to': tomorrow,
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="Revenue_Report_', response['Content-Disposition'])
+
+        sheet = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet['A5'].value, 'OR Number')
+        self.assertEqual([sheet['A6'].value, sheet['A7'].value], ['OR-0', 'OR-1'])
+        self.assertEqual(sheet['A8'].value, 'TOTAL')
+        self.assertEqual(sheet['E8'].value, 150.5)
+        self.assertEqual(sheet['E6'].number_format, '₱#,##0.00')
+
+
+class PreviousConfirmedValuesTests(TestCase):
+    def test_predecessors_found_in_one_query(self):
+        consumer = make_consumer()
+        first = MeterReading.objects.create(
+            consumer=consumer, reading_date=date(2025, 1, 5), reading_value=10, is_confirmed=True
+        )
+        MeterReading.objects.create(
+            consumer=consumer, reading_date=date(2025, 2, 5), reading_value=25, is_confirmed=True
+        )
+        MeterReading.objects.create(consumer=consumer, reading_date=date(2025, 2, 20), reading_value=30)
+        pending = MeterReading.objects.create(consumer=consumer, reading_date=date(2025, 3, 5), reading_value=40)
+
+        # The January reading is outside the exported rows but still their predecessor
+        readings = list(MeterReading.objects.filter(reading_date__gte=date(2025, 2, 1)).order_by('reading_date'))
+        expected = {readings[0].id: 10, readings[1].id: 25, pending.id: 25}
+
+        with self.assertNumQueries(1):
+            self.assertEqual(previous_confirmed_values(readings), expected)
+        with mock.patch.object(connection.features, 'supports_over_clause', False), self.assertNumQueries(1):
+            self.assertEqual(previous_confirmed_values(readings), expected)
+        self.assertIsNone(previous_confirmed_values([first])[first.id])
+
+
+class StreamingCsvExportTests(TestCase):
+    def test_delinquent_export_streams_grouped_totals(self):
+        login_user(self.client, 'staff', is_staff=True)
+        consumer = make_consumer()
+        for month, status, amount in ((1, 'Pending', '100.00'), (2, 'Pending', '50.50'), (3, 'Paid', '75.00')):
+            reading = MeterReading.objects.create(
+                consumer=consumer, reading_date=date(2025, month, 5), reading_value=month * 10, is_confirmed=True
+            )
+            Bill.objects.create(
+                consumer=consumer, current_reading=reading,
+                billing_period=date(2025, month, 1), due_date=date(2025, month, 20),
+                consumption=10, total_amount=Decimal(amount), status=status,
+            )
+
+        response = self.client.get(reverse('consumers:export_delinquent_consumers'), {'month': 2, 'year': 2025})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="delinquent_consumers_2_2025.csv"')
+
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'First Name,Middle Name,Last Name,Phone,Barangay,Serial,Pending Bills')
+        # Every pending bill counts, not only the selected month's
+        self.assertEqual(lines[1:], ['Test,,Consumer,09123456789,,,150.50'])
+
+
+class ReportJobTests(TestCase):
+    def test_queued_report_runs_in_worker_and_notifies(self):
+        user = login_user(self.client, 'staff', is_staff=True)
+        consumer = make_consumer()
+        reading = MeterReading.objects.create(
+            consumer=consumer, reading_date=date(2025, 1, 5), reading_value=10, is_confirmed=True
+        )
+        Bill.objects.create(
+            consumer=consumer, current_reading=reading,
+            billing_period=date(2025, 1, 1), due_date=date(2025, 1, 20),
+            consumption=10, total_amount=Decimal('100.00'), status='Pending',
+        )
+
+        response = self.client.post(reverse('consumers:request_report_job'), {
+            'kind': 'delinquent_consumers_csv', 'month': '1', 'year': '2025',
+        })
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['download_url']), ('queued', None))
+
+        # Small chunks so the file is stored as several rows
+        with mock.patch('consumers.report_jobs.REPORT_ARTIFACT_CHUNK_SIZE', 64):
+            call_command('run_report_jobs', '--once', stdout=StringIO())
+        self.assertGreater(ReportJob.objects.get().artifact_chunks.count(), 1)
+        # The worker also runs the maintenance tasks that are due
+        self.assertTrue(MaintenanceTaskRun.objects.filter(name='sweep_penalties').exists())
+
+        job = self.client.get(job['status_url']).json()
+        self.assertEqual((job['status'], job['progress']), ('done', 100))
+        notification = Notification.objects.get(user=user, notification_type='report_ready')
+        self.assertEqual(notification.redirect_url, job['download_url'])
+
+        download = self.client.get(job['download_url'])
+        self.assertIn('filename="delinquent_consumers_1_2025.csv"', download['Content-Disposition'])
+        self.assertIn(b'Test,,Consumer,09123456789,,,100.00', b''.join(download.streaming_content))
+        download.close()
+
+        # Page buttons queue the same views, e.g. the overview's Excel export
+        overview = self.client.post(reverse('consumers:request_report_job'), {
+            'kind': 'meter_reading_overview_excel', 'month': timezone.now().strftime('%Y-%m'),
+        }).json()
+        call_command('run_report_jobs', '--once', '--no-maintenance', stdout=StringIO())
+        overview = self.client.get(overview['status_url']).json()
+        self.assertEqual(overview['status'], 'done', overview['error'])
+        download = self.client.get(overview['download_url'])
+        self.assertIn('attachment', download['Content-Disposition'])
+        download.close()
+
+        # Other staff cannot see the job
+        login_user(self.client, 'other', is_staff=True)
+        self.assertEqual(self.client.get(job['status_url']).status_code, 404)
+        self.assertEqual(self.client.post(reverse('consumers:request_report_job'), {'kind': 'nope'}).status_code, 400)
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+
+class StreamingBackupTests(TestCase):
+    def test_backup_streams_compact_fixtures(self):
+        login_user(self.client, 'root', superuser=True)
+        consumer = make_consumer()
+
+        for backup_format in ('json', 'jsonl'):
+            response = self.client.post(reverse('consumers:backup_database'), {
+                'backup_month': 'all', 'backup_year': 'all', 'backup_format': backup_format,
+            })
+            self.assertTrue(response.streaming)
+
+            with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as zf:
+                data = zf.read(f'data/consumers.{backup_format}').decode()
+                self.assertNotIn('ERROR', ' '.join(zf.namelist()))
+
+            # No pretty-printing, and loaddata can read the fixture back
+            self.assertNotIn('\n  ', data)
+            objects = list(serializers.deserialize(backup_format, data))
+            self.assertEqual([obj.object.pk for obj in objects], [consumer.pk])
+
+        # A table failing halfway is left out, with only its error note
+        def failing_for_consumers(stream, queryset, format='json'):
+            if queryset.model is Consumer:
+                stream.write(b'[{"model": "consumers.consumer", ')
+                raise RuntimeError("connection lost")
+            return write_fixture(stream, queryset, format)
+
+        with mock.patch('consumers.exports.write_fixture', failing_for_consumers):
+            response = self.client.post(reverse('consumers:backup_database'), {
+                'backup_month': 'all', 'backup_year': 'all', 'backup_format': 'json',
+            })
+            with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as zf:
+                self.assertNotIn('data/consumers.json', zf.namelist())
+                self.assertIn('connection lost', zf.read('data/consumers.json.ERROR.txt').decode())
+                self.assertIn('data/bills.json', zf.namelist())
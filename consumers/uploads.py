@@ -0,0 +1,253 @@
+# consumers/uploads.py
+"""
+Background proof image uploads for the Balilihan Waterworks Management System.
+
+Uploading a manual reading's proof photo to Cloudinary used to happen
+inside the request, holding one of the two gunicorn threads for the
+whole upload. Now the request only:
+
+1. Saves the MeterReading.
+2. Records a ProofImageUpload row holding the decoded image
+   (enqueue_proof_upload).
+
+Once the transaction commits, a small thread pool (PROOF_UPLOAD_WORKERS
+threads) uploads the image with retries, stores the URL on the reading
+and clears the stored bytes. Uploads left pending by a restart are
+picked up by the process_proof_uploads maintenance task, which may run
+in another process (the run_report_jobs worker): the image lives in the
+database, not on the web process's disk.
+
+Each upload is claimed with a conditional UPDATE (pending -> uploading),
+so a request's worker thread and the maintenance task never upload the
+same image twice.
+
+The storage backend is chosen by PROOF_IMAGE_UPLOADER:
+- 'cloudinary' (default): upload to Cloudinary
+- 'local': copy into MEDIA_ROOT/meter_proofs (development and tests)
+- a dotted path to a callable(file_path, public_id) -> URL
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings as django_settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UploaderNotConfigured(Exception):
+    """Raised by an uploader backend that cannot run in this environment."""
+
+
+# ============================================================================
+# UPLOADER BACKENDS
+# ============================================================================
+def cloudinary_upload(file_path, public_id) -> str:
+    """Upload an image file to Cloudinary and return its secure URL."""
+    try:
+        from cloudinary import uploader as cloudinary_uploader  # type: ignore
+    except ImportError:
+        raise UploaderNotConfigured("Cloudinary is not installed")
+    if not getattr(django_settings, 'CLOUDINARY_AVAILABLE', False):
+        raise UploaderNotConfigured("Cloudinary is not configured")
+
+    result = cloudinary_uploader.upload(
+        str(file_path),
+        folder="waterworks/meter_proofs",
+        public_id=public_id,
+        overwrite=True,
+        resource_type="image"
+    )
+    return result.get('secure_url')
+
+
+def local_upload(file_path, public_id) -> str:
+    """Copy an image into MEDIA_ROOT/meter_proofs and return its media URL."""
+    target_dir = Path(django_settings.MEDIA_ROOT) / 'meter_proofs'
+    target_dir.mkdir(parents=True, exist_ok=True)
+    file_name = f"{public_id}{Path(file_path).suffix}"
+    shutil.copyfile(file_path, target_dir / file_name)
+    return f"{django_settings.MEDIA_URL}meter_proofs/{file_name}"
+
+
+UPLOADERS = {
+    'cloudinary': cloudinary_upload,
+    'local': local_upload,
+}
+
+
+def get_uploader():
+    """Return the uploader callable selected by PROOF_IMAGE_UPLOADER."""
+    name = getattr(django_settings, 'PROOF_IMAGE_UPLOADER', 'cloudinary')
+    return UPLOADERS.get(name) or import_string(name)
+
+
+# ============================================================================
+# QUEUE
+# ============================================================================
+def enqueue_proof_upload(reading, image_bytes, public_id, extension='jpg', kind='image'):
+    """
+    Store a proof image and queue its upload.
+
+    Call inside the request that saved the reading; the upload starts
+    once the transaction commits.
+
+    Args:
+        reading: Saved MeterReading the image belongs to
+        image_bytes: Decoded image content
+        public_id: Name of the image at the storage provider
+        extension: File extension the image is uploaded with
+        kind: 'image' (sets proof_image_url) or 'thumbnail' (sets proof_thumbnail_url)
+
+    Returns:
+        The created ProofImageUpload
+
+    Example:
+        >>> upload = enqueue_proof_upload(reading, base64.b64decode(data), f"reading_{reading.id}")
+    """
+    from .models import ProofImageUpload
+
+    upload = ProofImageUpload.objects.create(
+        reading=reading,
+        image_data=image_bytes,
+        extension=extension,
+        public_id=public_id,
+        kind=kind,
+    )
+    transaction.on_commit(lambda: submit_proof_upload(upload.id))
+    return upload
+
+
+def submit_proof_upload(upload_id) -> None:
+    """Hand a queued upload to the worker pool (no-op when PROOF_UPLOAD_WORKERS is 0)."""
+    global _executor
+
+    workers = getattr(django_settings, 'PROOF_UPLOAD_WORKERS', 2)
+    if workers <= 0:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='proof-upload')
+    _executor.submit(_run_in_worker, upload_id)
+
+
+def _run_in_worker(upload_id):
+    # Worker threads open their own DB connection; close it when done
+    close_old_connections()
+    try:
+        process_proof_upload(upload_id)
+    except Exception as e:
+        logger.error(f"Proof upload {upload_id} crashed: {e}", exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def process_proof_upload(upload_id, max_attempts=None, backoff=None) -> str:
+    """
+    Upload one queued proof image, retrying with exponential backoff.
+
+    The upload is claimed first (pending -> uploading in one conditional
+    UPDATE); if another worker got it, nothing is done. The stored image
+    is written to a temporary file for the uploader backend. On success
+    the reading's proof_image_url (or proof_thumbnail_url) is set and the
+    stored bytes are cleared. If the uploader is not configured the upload
+    is skipped, as the synchronous upload used to do.
+
+    Args:
+        upload_id: ProofImageUpload ID
+        max_attempts: Attempts before giving up (default PROOF_UPLOAD_MAX_ATTEMPTS)
+        backoff: Seconds to wait before the first retry, doubled each time
+            (default PROOF_UPLOAD_RETRY_BACKOFF)
+
+    Returns:
+        Final status ('uploaded', 'failed', 'skipped'), or the current
+        status if the upload was no longer pending
+    """
+    from .models import MeterReading, ProofImageUpload
+
+    max_attempts = max_attempts or getattr(django_settings, 'PROOF_UPLOAD_MAX_ATTEMPTS', 3)
+    backoff = getattr(django_settings, 'PROOF_UPLOAD_RETRY_BACKOFF', 2) if backoff is None else backoff
+
+    claimed = ProofImageUpload.objects.filter(id=upload_id, status='pending').update(
+        status='uploading', updated_at=timezone.now()
+    )
+    if not claimed:
+        return ProofImageUpload.objects.filter(id=upload_id).values_list('status', flat=True).first() or 'missing'
+    upload = ProofImageUpload.objects.get(id=upload_id)
+
+    with tempfile.NamedTemporaryFile(suffix=f".{upload.extension}", delete=False) as image_file:
+        image_file.write(bytes(upload.image_data))
+
+    uploader = get_uploader()
+    try:
+        while True:
+            upload.attempts += 1
+            try:
+                url = uploader(image_file.name, upload.public_id)
+            except UploaderNotConfigured as e:
+                logger.warning(f"{e}. Skipping proof image upload for reading {upload.reading_id}.")
+                upload.status, upload.last_error = 'skipped', str(e)
+                break
+            except Exception as e:
+                logger.error(f"Proof upload {upload.id} attempt {upload.attempts} failed: {e}")
+                upload.last_error = str(e)
+                if upload.attempts >= max_attempts:
+                    upload.status = 'failed'
+                    break
+                time.sleep(backoff * 2 ** (upload.attempts - 1))
+                continue
+
+            url_field = 'proof_thumbnail_url' if upload.kind == 'thumbnail' else 'proof_image_url'
+            MeterReading.objects.filter(id=upload.reading_id).update(**{url_field: url})
+            upload.status, upload.last_error = 'uploaded', ''
+            break
+    finally:
+        os.remove(image_file.name)
+
+    update_fields = ['status', 'attempts', 'last_error', 'updated_at']
+    if upload.status in ('uploaded', 'skipped'):
+        # Failed uploads keep the image so they can be retried by hand
+        upload.image_data = b''
+        update_fields.append('image_data')
+    upload.save(update_fields=update_fields)
+    return upload.status
+
+
+def process_pending_uploads(older_than=None) -> dict:
+    """
+    Process uploads still pending, e.g. after a restart lost the worker queue.
+
+    Args:
+        older_than: Optional timedelta; only uploads queued before now minus
+            this are processed (skips ones the workers are still handling).
+            Uploads claimed longer ago than this whose worker died are put
+            back in the queue first.
+
+    Returns:
+        Dictionary mapping final status to count
+    """
+    from .models import ProofImageUpload
+
+    pending = ProofImageUpload.objects.filter(status='pending')
+    if older_than:
+        cutoff = timezone.now() - older_than
+        ProofImageUpload.objects.filter(status='uploading', updated_at__lt=cutoff).update(status='pending')
+        pending = pending.filter(created_at__lt=cutoff)
+
+    summary = {}
+    for upload_id in pending.values_list('id', flat=True):
+        status = process_proof_upload(upload_id)
+        summary[status] = summary.get(status, 0) + 1
+    return summary
@@ -70,6 +70,9 @@ urlpatterns = [
     path('reports/', views.reports, name='reports'),
     path('reports/barangay/<int:barangay_id>/', views.barangay_report, name='barangay_report'),
     path('reports/export-excel/', views.export_report_excel, name='export_report_excel'),
+    path('reports/jobs/', views.request_report_job, name='request_report_job'),
+    path('reports/jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:job_id>/download/', views.download_report_job, name='download_report_job'),
 
     path('system-settings-verification/', views.system_settings_verification, name='system_settings_verification'),
     path('system-management/', views.system_management, name='system_management'),
@@ -89,10 +92,12 @@ urlpatterns = [
     path('api/login/', views.api_login, name='api_login'),
     path('api/logout/', views.api_logout, name='api_logout'),
     path('api/consumers/', views.api_consumers, name='api_consumers'),
+    path('api/consumers/sync/', views.api_consumers_sync, name='api_consumers_sync'),
     path('api/consumers/<int:consumer_id>/previous-reading/', views.api_get_previous_reading, name='api_get_previous_reading'),
     path('api/consumers/<int:consumer_id>/bill/', views.api_get_consumer_bill, name='api_get_consumer_bill'),
     path('api/consumers/<int:consumer_id>/bills/', views.api_get_consumer_bills, name='api_get_consumer_bills'),
     path('api/meter-readings/', views.api_submit_reading, name='api_submit_reading'),
+    path('api/meter-readings/batch/', views.api_submit_reading_batch, name='api_submit_reading_batch'),
     path('api/rates/', views.api_get_current_rates, name='api_get_current_rates'),
     path('api/settings/', views.api_get_system_settings, name='api_get_system_settings'),
     path('api/settings/check-version/', views.api_check_settings_version, name='api_check_settings_version'),
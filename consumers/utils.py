@@ -31,7 +31,7 @@ def calculate_tiered_water_bill(consumption: int, usage_type: str, settings=None
     Args:
         consumption: Water consumption in cubic meters
         usage_type: 'Residential' or 'Commercial'
-        settings: Optional SystemSetting instance (will fetch if not provided)
+        settings: Optional SystemSetting or SettingsSnapshot (defaults to the cached snapshot)
 
     Returns:
         Tuple of (total_amount, average_rate, breakdown_dict)
@@ -39,11 +39,11 @@ def calculate_tiered_water_bill(consumption: int, usage_type: str, settings=None
         - average_rate: Effective average rate per cubic meter
         - breakdown_dict: Detailed breakdown of calculation
     """
-    from .models import SystemSetting
+    from .settings_cache import get_settings_snapshot
 
     # Get system settings if not provided
     if settings is None:
-        settings = SystemSetting.objects.first()
+        settings = get_settings_snapshot()
 
     # Set default rates based on usage type
     if usage_type == 'Commercial':
@@ -165,6 +165,176 @@ def calculate_tiered_water_bill(consumption: int, usage_type: str, settings=None
     return (total_amount, average_rate, breakdown)
 
 
+# Default tier rates used when no SystemSetting row exists.
+# Order: (minimum_charge, tier2_rate, tier3_rate, tier4_rate, tier5_rate)
+DEFAULT_TIER_RATES = {
+    'Residential': (Decimal('75.00'), Decimal('15.00'), Decimal('16.00'), Decimal('17.00'), Decimal('18.00')),
+    'Commercial': (Decimal('100.00'), Decimal('18.00'), Decimal('20.00'), Decimal('22.00'), Decimal('24.00')),
+}
+
+
+def _to_centavos(amount: Decimal) -> int:
+    """Convert a peso Decimal to an integer number of centavos."""
+    return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def compile_tier_rate_table(settings=None) -> Dict[str, Dict]:
+    """
+    Build a rate table for batch pricing from SystemSetting.
+
+    The table is built once per billing run and passed to
+    calculate_tiered_water_bills() so the settings row is not re-read for
+    every reading. Rates are kept both as Decimals (for the breakdown
+    fields stored on Bill) and as integer centavos (for the arithmetic).
+
+    Args:
+        settings: Optional SystemSetting or SettingsSnapshot (defaults to the cached snapshot)
+
+    Returns:
+        Dict keyed by usage type ('Residential', 'Commercial') with
+        'minimum_charge', 'tier2_rate' .. 'tier5_rate' and 'centavos'.
+    """
+    from .settings_cache import get_settings_snapshot
+
+    if settings is None:
+        settings = get_settings_snapshot()
+
+    # Snapshots carry a table compiled once per settings version
+    precompiled = getattr(settings, 'tier_table', None)
+    if precompiled is not None:
+        return precompiled
+
+    table = {}
+    for usage_type, defaults in DEFAULT_TIER_RATES.items():
+        if settings:
+            prefix = usage_type.lower()
+            rates = (
+                getattr(settings, f'{prefix}_minimum_charge'),
+                getattr(settings, f'{prefix}_tier2_rate'),
+                getattr(settings, f'{prefix}_tier3_rate'),
+                getattr(settings, f'{prefix}_tier4_rate'),
+                getattr(settings, f'{prefix}_tier5_rate'),
+            )
+        else:
+            rates = defaults
+
+        table[usage_type] = {
+            'minimum_charge': rates[0],
+            'tier2_rate': rates[1],
+            'tier3_rate': rates[2],
+            'tier4_rate': rates[3],
+            'tier5_rate': rates[4],
+            'centavos': tuple(_to_centavos(rate) for rate in rates),
+        }
+
+    return table
+
+
+def calculate_tiered_water_bills(consumptions, usage_types, rate_table=None, settings=None) -> Dict[str, list]:
+    """
+    Price a whole batch of consumptions with the tiered rate structure.
+
+    Produces the same figures as calculate_tiered_water_bill() for every
+    item, but works column-wise: tier units are found with min/max clamps
+    instead of per-reading branching, and all money is summed in integer
+    centavos so the results match the scalar function to the centavo.
+
+    Args:
+        consumptions: Sequence of consumption values (m³)
+        usage_types: Sequence of usage types, same length as consumptions
+        rate_table: Optional table from compile_tier_rate_table()
+        settings: Optional SystemSetting instance, used only when
+            rate_table is not provided
+
+    Returns:
+        Dict of parallel lists: 'consumption', 'usage_type',
+        'tier1_units' .. 'tier5_units', 'tier1_amount' .. 'tier5_amount',
+        'total_amount' and 'average_rate'. The rate table used is
+        available under 'rate_table'.
+
+    Example:
+        >>> batch = calculate_tiered_water_bills([3, 25], ['Residential', 'Commercial'])
+        >>> batch['total_amount']
+        [Decimal('75.00'), Decimal('500.00')]
+    """
+    consumptions = [int(c) for c in consumptions]
+    usage_types = ['Commercial' if u == 'Commercial' else 'Residential' for u in usage_types]
+
+    if len(consumptions) != len(usage_types):
+        raise ValueError("consumptions and usage_types must be the same length")
+
+    if rate_table is None:
+        rate_table = compile_tier_rate_table(settings)
+
+    centavos = [rate_table[u]['centavos'] for u in usage_types]
+
+    # Units per tier: 1-5, 6-10, 11-20, 21-50, 51+
+    tier1_units = [min(max(c, 0), 5) for c in consumptions]
+    tier2_units = [min(max(c - 5, 0), 5) for c in consumptions]
+    tier3_units = [min(max(c - 10, 0), 10) for c in consumptions]
+    tier4_units = [min(max(c - 20, 0), 30) for c in consumptions]
+    tier5_units = [max(c - 50, 0) for c in consumptions]
+
+    # Amounts in centavos (tier 1 is always the flat minimum charge)
+    tier1_cents = [r[0] for r in centavos]
+    tier2_cents = [u * r[1] for u, r in zip(tier2_units, centavos)]
+    tier3_cents = [u * r[2] for u, r in zip(tier3_units, centavos)]
+    tier4_cents = [u * r[3] for u, r in zip(tier4_units, centavos)]
+    tier5_cents = [u * r[4] for u, r in zip(tier5_units, centavos)]
+    total_cents = [sum(t) for t in zip(tier1_cents, tier2_cents, tier3_cents, tier4_cents, tier5_cents)]
+
+    # Average rate rounded ROUND_HALF_UP to the centavo (0 for zero consumption)
+    average_cents = [
+        (2 * total + c) // (2 * c) if c > 0 else 0
+        for total, c in zip(total_cents, consumptions)
+    ]
+
+    def to_pesos(values):
+        return [Decimal(v).scaleb(-2) for v in values]
+
+    return {
+        'consumption': consumptions,
+        'usage_type': usage_types,
+        'tier1_units': tier1_units,
+        'tier2_units': tier2_units,
+        'tier3_units': tier3_units,
+        'tier4_units': tier4_units,
+        'tier5_units': tier5_units,
+        'tier1_amount': to_pesos(tier1_cents),
+        'tier2_amount': to_pesos(tier2_cents),
+        'tier3_amount': to_pesos(tier3_cents),
+        'tier4_amount': to_pesos(tier4_cents),
+        'tier5_amount': to_pesos(tier5_cents),
+        'total_amount': to_pesos(total_cents),
+        'average_rate': to_pesos(average_cents),
+        'rate_table': rate_table,
+    }
+
+
+def tiered_bill_breakdown(batch: Dict[str, list], index: int) -> Dict:
+    """
+    Return the breakdown dict for one item of a calculate_tiered_water_bills() batch.
+
+    The dict has the same keys as the breakdown returned by
+    calculate_tiered_water_bill(), so it can be used wherever a Bill is
+    created from a breakdown.
+    """
+    rates = batch['rate_table'][batch['usage_type'][index]]
+    breakdown = {
+        'consumption': batch['consumption'][index],
+        'usage_type': batch['usage_type'][index],
+        'minimum_charge': rates['minimum_charge'],
+        'total_amount': batch['total_amount'][index],
+        'average_rate': batch['average_rate'][index],
+    }
+    for tier in range(1, 6):
+        breakdown[f'tier{tier}_units'] = batch[f'tier{tier}_units'][index]
+        breakdown[f'tier{tier}_amount'] = batch[f'tier{tier}_amount'][index]
+        if tier > 1:
+            breakdown[f'tier{tier}_rate'] = rates[f'tier{tier}_rate']
+    return breakdown
+
+
 def calculate_penalty(bill, settings=None) -> Tuple[Decimal, int, str]:
     """
     Calculate the penalty amount for an overdue bill.
@@ -177,7 +347,7 @@ def calculate_penalty(bill, settings=None) -> Tuple[Decimal, int, str]:
 
     Args:
         bill: The Bill instance to calculate penalty for
-        settings: Optional SystemSetting instance (will fetch if not provided)
+        settings: Optional SystemSetting or SettingsSnapshot (defaults to the cached snapshot)
 
     Returns:
         Tuple of (penalty_amount, days_overdue, calculation_details)
@@ -190,11 +360,11 @@ def calculate_penalty(bill, settings=None) -> Tuple[Decimal, int, str]:
         >>> print(f"Penalty: ₱{penalty} ({days} days late)")
         >>> print(details)
     """
-    from .models import SystemSetting
+    from .settings_cache import get_settings_snapshot
 
     # Get system settings if not provided
     if settings is None:
-        settings = SystemSetting.objects.first()
+        settings = get_settings_snapshot()
 
     # Default return values
     zero_penalty = (Decimal('0.00'), 0, "No penalty applied")
@@ -290,10 +460,10 @@ def update_bill_penalty(bill, settings=None, save=True) -> Tuple[bool, str]:
         - changed: Boolean indicating if penalty was changed
         - message: String describing what happened
     """
-    from .models import SystemSetting
+    from .settings_cache import get_settings_snapshot
 
     if settings is None:
-        settings = SystemSetting.objects.first()
+        settings = get_settings_snapshot()
 
     # Don't update paid bills
     if bill.status == 'Paid':
@@ -435,10 +605,10 @@ def get_payment_breakdown(bill, settings=None) -> dict:
     Returns:
         Dictionary with payment breakdown details
     """
-    from .models import SystemSetting
+    from .settings_cache import get_settings_snapshot
 
     if settings is None:
-        settings = SystemSetting.objects.first()
+        settings = get_settings_snapshot()
 
     # Update penalty calculation first
     update_bill_penalty(bill, settings, save=True)
@@ -487,33 +657,146 @@ def get_payment_breakdown(bill, settings=None) -> dict:
     return breakdown
 
 
-def bulk_update_penalties(queryset=None) -> Tuple[int, int]:
+def sweep_penalties(queryset=None, settings=None, today=None) -> dict:
     """
-    Bulk update penalties for all pending overdue bills.
+    Recompute penalty_amount and days_overdue for pending bills in bulk.
 
-    This can be called from a management command or scheduled task
-    to keep penalties up to date.
+    Set-based replacement for calling update_bill_penalty() on every bill.
+    The same rules as calculate_penalty() are expressed as SQL CASE
+    expressions, so the whole sweep runs in a handful of statements no
+    matter how many bills are pending:
+
+    - Waived penalties are left untouched
+    - Bills not yet due get no penalty and 0 days overdue
+    - Bills within the grace period get no penalty but keep days overdue
+    - Percentage penalties are rounded ROUND_HALF_UP to the centavo
+    - Fixed penalties use fixed_penalty_amount
+    - max_penalty_amount caps the penalty (0 means no cap)
+
+    Only rows whose values actually change are written.
 
     Args:
-        queryset: Optional queryset of bills to update. If None, updates all pending bills.
+        queryset: Optional queryset of bills to sweep. If None, sweeps all pending bills.
+        settings: Optional SystemSetting or SettingsSnapshot (defaults to the cached snapshot)
+        today: Optional date to compute against (defaults to today)
 
     Returns:
-        Tuple of (updated_count, total_count)
+        Dictionary summarizing the sweep:
+        - checked: Pending, non-waived bills considered
+        - updated: Bills whose penalty or days overdue changed
+        - newly_penalized: Bills that received their first penalty
+        - penalized: Bills carrying a penalty after the sweep
+        - previous_total_penalty: Sum of penalties before the sweep
+        - total_penalty: Sum of penalties after the sweep
     """
-    from .models import Bill, SystemSetting
+    from .models import Bill
+    from .settings_cache import get_settings_snapshot
+    from django.db import transaction
+    from django.db.models import Case, When, Value, F, Q, Sum, Count, DecimalField, IntegerField, BigIntegerField
+    from django.db.models.functions import Cast, Least, Round
+
+    if settings is None:
+        settings = get_settings_snapshot()
 
-    settings = SystemSetting.objects.first()
+    if today is None:
+        today = timezone.now().date()
 
     if queryset is None:
         queryset = Bill.objects.filter(status='Pending')
+    bills = queryset.filter(status='Pending', penalty_waived=False)
+
+    money = DecimalField(max_digits=10, decimal_places=2)
+    zero = Value(Decimal('0.00'), output_field=money)
+
+    if settings and not settings.penalty_enabled:
+        # Penalties disabled - every pending bill carries no penalty
+        new_days = Value(0, output_field=IntegerField())
+        new_penalty = zero
+    else:
+        grace_period = settings.penalty_grace_period_days if settings else 0
+        penalty_type = settings.penalty_type if settings else 'percentage'
+        penalty_rate = settings.penalty_rate if settings else Decimal('10.00')
+        fixed_amount = settings.fixed_penalty_amount if settings else Decimal('50.00')
+        max_penalty = settings.max_penalty_amount if settings else Decimal('500.00')
+
+        # days_overdue is constant per due date, and pending bills share few due dates
+        due_dates = bills.filter(due_date__lt=today).values_list('due_date', flat=True).distinct().order_by()
+        new_days = Case(
+            *[When(due_date=due_date, then=Value((today - due_date).days)) for due_date in due_dates],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+
+        if penalty_type == 'percentage':
+            # Work in integer centavos so rounding is exact on every backend:
+            # penalty = ROUND_HALF_UP(total_cents * rate% / 100)
+            total_cents = Cast(Round(F('total_amount') * Value(100)), BigIntegerField())
+            rate_hundredths = _to_centavos(penalty_rate)
+            penalty_cents = Cast(
+                (total_cents * Value(rate_hundredths) + Value(5000)) / Value(10000),
+                BigIntegerField()
+            )
+            penalty_expr = Cast(penalty_cents, money) * Value(Decimal('0.01'), output_field=money)
+            if max_penalty > 0:
+                penalty_expr = Least(penalty_expr, Value(max_penalty, output_field=money))
+        else:
+            capped = min(fixed_amount, max_penalty) if max_penalty > 0 else fixed_amount
+            penalty_expr = Value(capped, output_field=money)
+
+        # Penalty applies only once the grace period has passed
+        new_penalty = Case(
+            When(due_date__lt=today - timezone.timedelta(days=grace_period), then=penalty_expr),
+            default=zero,
+            output_field=money
+        )
+
+    with transaction.atomic():
+        before = bills.aggregate(
+            checked=Count('id'),
+            total=Sum('penalty_amount'),
+        )
+
+        changed = bills.annotate(new_penalty=new_penalty, new_days=new_days).filter(
+            ~Q(penalty_amount=F('new_penalty')) | ~Q(days_overdue=F('new_days'))
+        )
+        updated = Bill.objects.filter(pk__in=changed.values('pk')).update(
+            penalty_amount=new_penalty,
+            days_overdue=new_days,
+        )
+
+        # Stamp the date a penalty was first applied
+        newly_penalized = bills.filter(
+            penalty_amount__gt=0,
+            penalty_applied_date__isnull=True
+        ).update(penalty_applied_date=today)
+
+        after = bills.aggregate(
+            penalized=Count('id', filter=Q(penalty_amount__gt=0)),
+            total=Sum('penalty_amount'),
+        )
+
+    return {
+        'checked': before['checked'],
+        'updated': updated,
+        'newly_penalized': newly_penalized,
+        'penalized': after['penalized'],
+        'previous_total_penalty': before['total'] or Decimal('0.00'),
+        'total_penalty': after['total'] or Decimal('0.00'),
+    }
 
-    updated = 0
-    total = queryset.count()
 
-    for bill in queryset:
-        changed, _ = update_bill_penalty(bill, settings, save=True)
-        if changed:
-            updated += 1
+def bulk_update_penalties(queryset=None) -> Tuple[int, int]:
+    """
+    Bulk update penalties for all pending overdue bills.
 
-    return (updated, total)
+    This can be called from a management command or scheduled task
+    to keep penalties up to date. Delegates to sweep_penalties().
 
+    Args:
+        queryset: Optional queryset of bills to update. If None, updates all pending bills.
+
+    Returns:
+        Tuple of (updated_count, total_count)
+    """
+    summary = sweep_penalties(queryset)
+    return (summary['updated'], summary['checked'])
@@ -50,56 +50,10 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
 
 
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
-
-
 # Helper function to get previous confirmed reading
 def get_previous_reading(consumer):
     """Get the most recent confirmed meter reading for a consumer."""
@@ -184,6 +138,11 @@ def backup_database(request):
     one JSON file per model/table. The ZIP is named with the current timestamp
     so staff can keep weekly archives on a flash drive.
 
+    Tables are streamed row by row into a spooled temporary file (see
+    exports.write_fixture), so memory use does not grow with the data.
+    backup_format='jsonl' writes newline-delimited fixtures instead of
+    JSON arrays.
+
     Included tables:
     - Consumers, Barangays, Puroks, MeterBrands
     - Bills, Payments, MeterReadings (Supports monthly filtering)
@@ -191,12 +150,12 @@ def backup_database(request):
     - Users (username, email, role — NO passwords)
     - User Login History, User Activities
     """
+    import shutil
+    import tempfile
     import zipfile
-    import io
-    import json as _json
     from datetime import datetime as _dt
-    from django.core import serializers as dj_serializers
-    from django.http import HttpResponse
+    from django.http import FileResponse
+    from ..exports import FIXTURE_FORMATS, write_fixture
 
     # Superadmin-only guard
     if not request.user.is_superuser:
@@ -212,6 +171,10 @@ def backup_database(request):
     
     is_filtered = backup_month != 'all' and backup_year != 'all'
 
+    backup_format = request.POST.get('backup_format', 'json')
+    if backup_format not in FIXTURE_FORMATS:
+        backup_format = 'json'
+
     # ---- Tables to export ----
     # Each tuple: (filename_in_zip, queryset)
     from ..models import (
@@ -220,9 +183,10 @@ def backup_database(request):
         StaffProfile
     )
     
-    bills_qs = Bill.objects.select_related('consumer').all()
-    payments_qs = Payment.objects.select_related('consumer', 'bill').all()
-    readings_qs = MeterReading.objects.select_related('consumer').all()
+    # Fixtures store foreign keys as IDs, so no related rows are joined in
+    bills_qs = Bill.objects.all()
+    payments_qs = Payment.objects.all()
+    readings_qs = MeterReading.objects.all()
 
     if is_filtered:
         bills_qs = bills_qs.filter(billing_period__month=backup_month, billing_period__year=backup_year)
@@ -230,22 +194,22 @@ def backup_database(request):
         readings_qs = readings_qs.filter(reading_date__month=backup_month, reading_date__year=backup_year)
 
     tables = [
-        ('consumers.json', Consumer.objects.select_related('barangay', 'purok', 'meter_brand').all()),
+        ('consumers.json', Consumer.objects.all()),
         ('barangays.json', Barangay.objects.all()),
-        ('puroks.json', Purok.objects.select_related('barangay').all()),
+        ('puroks.json', Purok.objects.all()),
         ('meter_brands.json', MeterBrand.objects.all()),
         ('bills.json', bills_qs),
         ('payments.json', payments_qs),
         ('meter_readings.json', readings_qs),
         ('system_settings.json', SystemSetting.objects.all()),
-        ('system_setting_changes.json', SystemSettingChangeLog.objects.select_related('changed_by').all()),
-        ('user_login_history.json', UserLoginEvent.objects.select_related('user').all()),
-        ('user_activities.json', UserActivity.objects.select_related('user').all()),
-        ('staff_profiles.json', StaffProfile.objects.select_related('user', 'barangay').all()),
+        ('system_setting_changes.json', SystemSettingChangeLog.objects.all()),
+        ('user_login_history.json', UserLoginEvent.objects.all()),
+        ('user_activities.json', UserActivity.objects.all()),
+        ('staff_profiles.json', StaffProfile.objects.all()),
     ]
 
-    # ---- Build ZIP in memory ----
-    zip_buffer = io.BytesIO()
+    # ---- Build ZIP in a spooled temporary file (moves to disk past 8 MB) ----
+    zip_file = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
     timestamp = _dt.now().strftime('%Y-%m-%d_%H-%M')
     
     if is_filtered:
@@ -255,17 +219,25 @@ def backup_database(request):
         filename = f'balilihan_backup_ALL_{timestamp}.zip'
         period_text = "All Time (Full Backup)"
 
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+    with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zf:
         total_records = 0
 
         for tbl_filename, queryset in tables:
-            try:
-                data = dj_serializers.serialize('json', queryset, indent=2)
-                zf.writestr(f'data/{tbl_filename}', data)
-                total_records += queryset.count()
-            except Exception as e:
-                # Write an error note for this table instead of failing the entire backup
-                zf.writestr(f'data/{tbl_filename}.ERROR.txt', f"Error exporting table: {str(e)}")
+            if backup_format == 'jsonl':
+                tbl_filename += 'l'
+            # Serialize the table to its own spooled file first, so a table that
+            # fails halfway never leaves a truncated member in the ZIP
+            with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as table_file:
+                try:
+                    table_records = write_fixture(table_file, queryset, backup_format)
+                except Exception as e:
+                    # Write an error note for this table instead of failing the entire backup
+                    zf.writestr(f'data/{tbl_filename}.ERROR.txt', f"Error exporting table: {str(e)}")
+                    continue
+                table_file.seek(0)
+                with zf.open(f'data/{tbl_filename}', 'w', force_zip64=True) as member:
+                    shutil.copyfileobj(table_file, member)
+                total_records += table_records
 
         # ---- Write a human-readable README ----
         readme = f"""BALILIHAN WATERWORKS SYSTEM BACKUP
@@ -273,6 +245,7 @@ def backup_database(request):
 Backup Date  : {_dt.now().strftime('%B %d, %Y %I:%M %p')}
 Generated By : {request.user.get_full_name() or request.user.username} ({request.user.username})
 Backup Scope : {period_text}
+File Format  : {"Newline-delimited JSON (.jsonl)" if backup_format == 'jsonl' else "JSON (.json)"}
 Total Records: {total_records}
 
 CONTENTS
@@ -292,7 +265,7 @@ data/staff_profiles.json       — Staff user accounts and roles
 
 HOW TO RESTORE
 --------------
-These .json files are Django "Fixtures". They contain structured database records.
+These .json (or .jsonl) files are Django "Fixtures". They contain structured database records.
 Contact your system developer and provide this ZIP file.
 The developer can use `python manage.py loaddata <filename.json>` to completely restore the database perfectly in case of a crash or data loss.
 
@@ -304,7 +277,7 @@ Do NOT share this file over the internet.
 """
         zf.writestr('README.txt', readme)
 
-    zip_buffer.seek(0)
+    zip_file.seek(0)
 
     # ---- Log the backup action ----
     try:
@@ -323,9 +296,7 @@ Do NOT share this file over the internet.
         pass
 
     # ---- Stream ZIP as download response ----
-    response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return FileResponse(zip_file, as_attachment=True, filename=filename, content_type='application/zip')
 
 
 
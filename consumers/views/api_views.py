@@ -8,7 +8,7 @@ from ..decorators import (
     consumer_edit_permission_required, disconnect_permission_required,
     user_management_permission_required, system_settings_permission_required,
     billing_permission_required, reports_permission_required, view_only_for_admin,
-    rate_limit_login, role_required
+    rate_limit_login, role_required, idempotent, api_caller_authenticated
 )
 from django.db.models import Q, Max, Count, Sum, OuterRef, Subquery, Value, F
 from django.db.models.functions import Concat, TruncMonth
@@ -50,54 +50,14 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request, get_request_token, revoke_token
+from ..api_encoding import negotiated_response
 from ..forms import ConsumerForm
-
-
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
+from ..badges import invalidate_all_notifications
+from ..readings import latest_reading_subquery, previous_confirmed_values
+from ..settings_cache import cached_settings_response, conditional_response, get_settings_snapshot, get_settings_version
+from ..images import normalize_proof_image
+from ..uploads import enqueue_proof_upload
 
 
 # Helper function to get previous confirmed reading
@@ -146,6 +106,7 @@ def calculate_water_bill(consumer, consumption):
 # Bills are now generated immediately upon meter reading submission.
 # ============================================================================
 @csrf_exempt  # Be careful with CSRF in production, consider using proper tokens for mobile apps
+@idempotent('submit_reading', authorize=api_caller_authenticated)
 def api_submit_reading(request):
     """
     API endpoint for Android app to submit meter readings.
@@ -162,6 +123,9 @@ def api_submit_reading(request):
     - consumer_name, id_number, reading_date
     - previous_reading, current_reading, consumption
     - rate, total_amount, field_staff_name
+
+    A retry carrying the same Idempotency-Key header (or idempotency_key
+    field) returns the original response without writing again.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -233,8 +197,20 @@ def api_submit_reading(request):
                 'message': f'Current reading ({current_reading}) cannot be less than previous reading ({previous_reading})'
             }, status=400)
 
+        # Get system settings once - used for pricing and the billing schedule
+        setting = get_settings_snapshot()
+
         # Calculate bill using tiered rates
-        rate, total_amount, breakdown = calculate_water_bill(consumer, consumption)
+        from ..utils import compile_tier_rate_table, calculate_tiered_water_bills, tiered_bill_breakdown
+        breakdown = tiered_bill_breakdown(
+            calculate_tiered_water_bills(
+                [consumption], [consumer.usage_type],
+                rate_table=compile_tier_rate_table(setting)
+            ),
+            0
+        )
+        rate = float(breakdown['average_rate'])
+        total_amount = float(breakdown['total_amount'])
 
         # Determine the authenticated user (from session or token)
         current_user = request.user if request.user.is_authenticated else api_user
@@ -282,8 +258,7 @@ def api_submit_reading(request):
                 reading_date__lt=reading_date
             ).order_by('-reading_date').first()
 
-            # Get system settings for billing schedule
-            setting = SystemSetting.objects.first()
+            # Billing schedule from the settings fetched above
             if setting:
                 billing_day = setting.billing_day_of_month
                 due_day = setting.due_day_of_month
@@ -384,10 +359,281 @@ def api_submit_reading(request):
 
 
 
+# ============================================================================
+# API VIEW: BATCH METER READING SUBMISSION (OFFLINE SYNC)
+# ============================================================================
+# Field staff read whole puroks offline and sync later. The app queues one
+# item per reading, each with its own idempotency key, and posts the queue
+# in one request. Items are validated and priced together and written in
+# one transaction; a retried item returns its stored result instead of
+# creating a second reading and bill.
+# ============================================================================
+MAX_READING_BATCH_SIZE = 500
+READING_BATCH_SCOPE = 'reading_batch'
+
+
+@csrf_exempt
+def api_submit_reading_batch(request):
+    """
+    API endpoint for Android app to submit many meter readings at once.
+
+    Request:
+    {
+        "token": "<session token>",          # or Authorization: Bearer
+        "readings": [
+            {"idempotency_key": "b5e1...", "consumer_id": 12, "reading": 345, "reading_date": "2026-10-01"},
+            ...
+        ]
+    }
+
+    Like api_submit_reading, new readings are auto-confirmed and billed;
+    an unconfirmed reading on the same date is updated instead.
+
+    Returns one result per item, in request order:
+    - status: 'created', 'updated', 'replayed' (key seen before; the
+      stored result is returned) or 'error'
+    - the same bill details as api_submit_reading, or 'error'
+    Failed items are not stored, so they can be corrected and resent
+    with the same key.
+    """
+    from django.db import IntegrityError, transaction
+    from ..billing import generate_bills_for_readings
+    from ..idempotency import get_stored_responses, store_responses
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    # Authenticate once for the whole batch
+    current_user = request.user if request.user.is_authenticated else authenticate_api_request(request)
+    if not current_user:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON in request body'}, status=400)
+
+    items = data.get('readings') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({'error': 'Missing required field: readings (non-empty list)'}, status=400)
+    if len(items) > MAX_READING_BATCH_SIZE:
+        return JsonResponse({'error': f'Too many readings. Send at most {MAX_READING_BATCH_SIZE} per request.'}, status=400)
+
+    results = [None] * len(items)
+
+    def fail(index, key, message):
+        results[index] = {'idempotency_key': key, 'status': 'error', 'error': message}
+
+    # ------------------------------------------------------------------
+    # 1. Parse every item
+    # ------------------------------------------------------------------
+    parsed = []  # (index, key, consumer_id, reading_value, reading_date)
+    seen_keys = set()
+    today = timezone.now().date()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            fail(index, None, 'Each reading must be an object')
+            continue
+        key = str(item.get('idempotency_key') or '').strip()
+        if not key or len(key) > 100:
+            fail(index, key or None, 'Missing or invalid idempotency_key')
+            continue
+        if key in seen_keys:
+            fail(index, key, 'Duplicate idempotency_key in batch')
+            continue
+        seen_keys.add(key)
+
+        if item.get('consumer_id') is None or item.get('reading') is None:
+            fail(index, key, 'Missing required fields: consumer_id or reading')
+            continue
+        try:
+            consumer_id = int(item['consumer_id'])
+        except (ValueError, TypeError):
+            fail(index, key, 'Invalid consumer_id')
+            continue
+        try:
+            reading_value = int(item['reading'])
+            if reading_value < 0:
+                raise ValueError("Reading value cannot be negative")
+        except (ValueError, TypeError):
+            fail(index, key, 'Invalid reading value. Must be a non-negative number.')
+            continue
+        if item.get('reading_date'):
+            try:
+                reading_date = datetime.strptime(item['reading_date'], '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                fail(index, key, 'Invalid date format. Use YYYY-MM-DD.')
+                continue
+        else:
+            reading_date = today
+
+        parsed.append((index, key, consumer_id, reading_value, reading_date))
+
+    # ------------------------------------------------------------------
+    # 2. Replay keys that were already processed (one indexed lookup)
+    # ------------------------------------------------------------------
+    stored = get_stored_responses(READING_BATCH_SCOPE, [key for _, key, _, _, _ in parsed], user=current_user)
+    pending = []
+    for entry in parsed:
+        index, key = entry[0], entry[1]
+        if key in stored:
+            results[index] = {**stored[key], 'idempotency_key': key, 'status': 'replayed'}
+        else:
+            pending.append(entry)
+
+    # ------------------------------------------------------------------
+    # 3. Validate against consumers and existing readings (two queries)
+    # ------------------------------------------------------------------
+    consumers = Consumer.objects.select_related('barangay').in_bulk(
+        {consumer_id for _, _, consumer_id, _, _ in pending}
+    )
+    existing_readings = {
+        (reading.consumer_id, reading.reading_date): reading
+        for reading in MeterReading.objects.filter(
+            consumer_id__in=consumers.keys(),
+            reading_date__in={reading_date for _, _, _, _, reading_date in pending}
+        )
+    }
+
+    field_staff_name = current_user.get_full_name() or current_user.username
+    to_create = []  # (index, key, MeterReading)
+    to_update = []  # (index, key, MeterReading)
+    claimed_dates = set()
+    for index, key, consumer_id, reading_value, reading_date in pending:
+        consumer = consumers.get(consumer_id)
+        if consumer is None:
+            fail(index, key, 'Consumer not found')
+            continue
+        if consumer.status == 'disconnected':
+            fail(index, key, f'{consumer.first_name} {consumer.last_name} is currently disconnected. Meter reading not allowed.')
+            continue
+        if (consumer_id, reading_date) in claimed_dates:
+            fail(index, key, f'Duplicate reading for {consumer.id_number} on {reading_date} in batch')
+            continue
+        claimed_dates.add((consumer_id, reading_date))
+
+        existing = existing_readings.get((consumer_id, reading_date))
+        if existing and existing.is_confirmed:
+            fail(index, key, f"Reading for {consumer.id_number} on {reading_date} is already confirmed and cannot be updated via API.")
+        elif existing:
+            existing.reading_value = reading_value
+            existing.source = 'app_scanned'  # OCR scan from Smart Meter Reader app
+            to_update.append((index, key, existing))
+        else:
+            to_create.append((index, key, MeterReading(
+                consumer=consumer,
+                reading_date=reading_date,
+                reading_value=reading_value,
+                source='app_scanned',  # OCR scan from Smart Meter Reader app
+                submitted_by=current_user,
+            )))
+
+    # ------------------------------------------------------------------
+    # 4. Write readings, bills and stored responses in one transaction
+    # ------------------------------------------------------------------
+    try:
+        with transaction.atomic():
+            new_responses = {}
+
+            MeterReading.objects.bulk_update(
+                [reading for _, _, reading in to_update], ['reading_value', 'source'], batch_size=500
+            )
+            for index, key, reading in to_update:
+                consumer = consumers[reading.consumer_id]
+                results[index] = new_responses[key] = {
+                    'idempotency_key': key,
+                    'status': 'updated',
+                    'message': 'Unconfirmed reading updated',
+                    'consumer_name': f"{consumer.first_name} {consumer.last_name}",
+                    'id_number': consumer.id_number,
+                    'reading_date': str(reading.reading_date),
+                    'current_reading': reading.reading_value,
+                    'field_staff_name': field_staff_name,
+                }
+
+            MeterReading.objects.bulk_create([reading for _, _, reading in to_create], batch_size=500)
+            billing = generate_bills_for_readings(
+                MeterReading.objects.filter(id__in=[reading.id for _, _, reading in to_create]),
+                senior_citizen_discount=True
+            )
+
+            # Readings that would go below the previous reading are not kept
+            reject_reasons = {reject['reading_id']: reject['reason'] for reject in billing['rejects']}
+            if reject_reasons:
+                MeterReading.objects.filter(id__in=reject_reasons.keys()).delete()
+
+            bills = {bill.current_reading_id: bill for bill in billing['bills']}
+            for index, key, reading in to_create:
+                if reading.id in reject_reasons:
+                    fail(index, key, reject_reasons[reading.id])
+                    continue
+                consumer = consumers[reading.consumer_id]
+                bill = bills[reading.id]
+                previous_value = bill.previous_reading.reading_value if bill.previous_reading else (consumer.first_reading or 0)
+                results[index] = new_responses[key] = {
+                    'idempotency_key': key,
+                    'status': 'created',
+                    'message': 'Reading submitted successfully',
+                    'consumer_name': f"{consumer.first_name} {consumer.last_name}",
+                    'id_number': consumer.id_number,
+                    'reading_date': str(reading.reading_date),
+                    'previous_reading': int(previous_value),
+                    'current_reading': int(reading.reading_value),
+                    'consumption': int(bill.consumption),
+                    'rate': float(bill.rate_per_cubic),
+                    'total_amount': float(bill.total_amount),
+                    'field_staff_name': field_staff_name,
+                }
+
+            store_responses(READING_BATCH_SCOPE, new_responses, user=current_user)
+
+            if bills:
+                # One summary notification and activity entry for the whole batch
+                Notification.objects.create(
+                    user=None,  # Notify all admins
+                    notification_type='meter_reading',
+                    title='Meter Readings Submitted',
+                    message=f'{len(bills)} meter reading(s) submitted by {field_staff_name}',
+                    redirect_url=reverse('consumers:meter_reading_overview')
+                )
+            if new_responses:
+                current_session = UserLoginEvent.objects.filter(
+                    user=current_user,
+                    logout_timestamp__isnull=True,
+                    status='success'
+                ).order_by('-login_timestamp').first()
+                UserActivity.objects.create(
+                    user=current_user,
+                    action='meter_reading_submitted',
+                    description=f"Batch sync: {len(bills)} reading(s) submitted, {len(to_update)} updated",
+                    login_event=current_session
+                )
+    except IntegrityError:
+        # Another request with the same keys committed first; retrying replays its results
+        return JsonResponse({'error': 'Batch is already being processed. Retry to receive its results.'}, status=409)
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Error submitting reading batch: {e}", exc_info=True)
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+    statuses = [result['status'] for result in results]
+    return JsonResponse({
+        'status': 'success',
+        'results': results,
+        'created': statuses.count('created'),
+        'updated': statuses.count('updated'),
+        'replayed': statuses.count('replayed'),
+        'errors': statuses.count('error'),
+    })
+
+
+
 # ============================================================================
 # API VIEW: SUBMIT MANUAL READING WITH PROOF IMAGE
 # ============================================================================
 @csrf_exempt
+@idempotent('submit_manual_reading', authorize=api_caller_authenticated)
 def api_submit_manual_reading(request):
     """
     API endpoint for Android app to submit manual reading with proof photo.
@@ -403,12 +649,19 @@ def api_submit_manual_reading(request):
         "token": "session_token_from_login"
     }
 
+    Or multipart/form-data with consumer_id, reading, reading_date and
+    token fields and the photo as a proof_image file, which avoids the
+    base64 overhead.
+
     Flow:
     1. Save reading with is_confirmed=False
-    2. Upload proof image to Cloudinary
+    2. Downscale and recompress the photo (consumers/images.py) and queue
+       it with a thumbnail; a background worker uploads both to Cloudinary
     3. Create notification for admin
     4. Admin reviews and confirms/rejects
     5. Bill generated only after confirmation
+
+    Retries carrying the same Idempotency-Key are replayed (see api_submit_reading).
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Method not allowed'}, status=405)
@@ -422,13 +675,17 @@ def api_submit_manual_reading(request):
         # Determine the authenticated user (from session or token)
         current_user = request.user if request.user.is_authenticated else api_user
 
-        data = json.loads(request.body.decode('utf-8'))
+        if request.content_type == 'multipart/form-data':
+            data = request.POST
+            proof_image_source = request.FILES.get('proof_image')
+        else:
+            data = json.loads(request.body.decode('utf-8'))
+            proof_image_source = data.get('proof_image')
 
         # Extract data
         consumer_id = data.get('consumer_id')
         reading_value = data.get('reading')
         reading_date_str = data.get('reading_date')
-        proof_image_base64 = data.get('proof_image')
 
         # Validate required fields
         if not consumer_id or reading_value is None:
@@ -487,30 +744,20 @@ def api_submit_manual_reading(request):
 
         consumption = current_reading - previous_reading
 
-        # Upload proof image to Cloudinary (if provided)
-        proof_image_url = None
-        if proof_image_base64:
+        # Decode and normalize proof image (if provided); it is uploaded in the background
+        proof_image = None
+        if proof_image_source:
             try:
-                # Check if Cloudinary is configured and available
-                if not CLOUDINARY_AVAILABLE or cloudinary_uploader is None:
-                    import logging
-                    logging.warning("Cloudinary not configured. Skipping image upload for reading.")
-                else:
-                    # Upload to Cloudinary
-                    upload_result = cloudinary_uploader.upload(
-                        f"data:image/jpeg;base64,{proof_image_base64}",
-                        folder="waterworks/meter_proofs",
-                        public_id=f"reading_{consumer.id_number}_{reading_date}",
-                        overwrite=True,
-                        resource_type="image"
-                    )
-                    proof_image_url = upload_result.get('secure_url')
-            except Exception as e:
+                if isinstance(proof_image_source, str):
+                    if proof_image_source.startswith('data:'):
+                        proof_image_source = proof_image_source.split(',', 1)[1]
+                    proof_image_source = base64.b64decode(proof_image_source, validate=True)
+                proof_image = normalize_proof_image(proof_image_source)
+            except (ValueError, IndexError) as e:
                 import logging
-                logging.error(f"Cloudinary upload error: {e}")
-                # We do NOT return a 500 here anymore.
-                # If the image fails, we still want to save the actual reading numbers.
-                proof_image_url = None
+                logging.error(f"Invalid proof image for reading: {e}")
+                # If the image is unusable, we still want to save the actual reading numbers.
+                proof_image = None
 
         # Create meter reading (NOT confirmed - needs admin review)
         reading = MeterReading.objects.create(
@@ -519,10 +766,19 @@ def api_submit_manual_reading(request):
             reading_value=current_reading,
             source='app_manual',  # Manual entry from Smart Meter Reader app
             is_confirmed=False,  # Needs admin confirmation
-            proof_image_url=proof_image_url,
             submitted_by=current_user  # Use current_user (from session or token)
         )
 
+        # Spool the image and thumbnail; background workers upload them and set the URLs
+        proof_upload_status = None
+        if proof_image:
+            public_id = f"reading_{consumer.id_number}_{reading_date}"
+            enqueue_proof_upload(reading, proof_image['image'], public_id=public_id,
+                                 extension=proof_image['extension'])
+            enqueue_proof_upload(reading, proof_image['thumbnail'], public_id=f"{public_id}_thumb",
+                                 extension=proof_image['extension'], kind='thumbnail')
+            proof_upload_status = 'queued'
+
         # Create notification for admin - redirect to pending readings page
         from django.urls import reverse
         Notification.objects.create(
@@ -568,7 +824,9 @@ def api_submit_manual_reading(request):
             'previous_reading': previous_reading,
             'current_reading': current_reading,
             'consumption': consumption,
-            'proof_image_url': proof_image_url,
+            'proof_image_url': None,  # Set once the background upload finishes
+            'proof_thumbnail_url': None,
+            'proof_upload_status': proof_upload_status,
             'status': 'pending_confirmation',
             'field_staff_name': field_staff_name
         })
@@ -630,7 +888,7 @@ def api_confirm_reading(request, reading_id):
 
         # Calculate bill using tiered rates
         from ..utils import calculate_tiered_water_bill
-        setting = SystemSetting.objects.first()
+        setting = get_settings_snapshot()
 
         if setting:
             billing_day = setting.billing_day_of_month
@@ -690,6 +948,7 @@ def api_confirm_reading(request, reading_id):
             related_object_id=reading.id,
             notification_type='meter_reading'
         ).update(is_read=True, read_at=timezone.now())
+        invalidate_all_notifications()
 
         return JsonResponse({
             'status': 'success',
@@ -752,6 +1011,7 @@ def api_reject_reading(request, reading_id):
             related_object_id=reading.id,
             notification_type='meter_reading'
         ).update(is_read=True, read_at=timezone.now())
+        invalidate_all_notifications()
 
         # Create notification for field staff about rejection
         if reading.submitted_by:
@@ -920,7 +1180,8 @@ def api_get_pending_readings(request):
 
     GET /api/readings/pending/
 
-    Returns list of readings that need admin review.
+    Returns list of readings that need admin review. Supports the
+    compact encodings of consumers/api_encoding.py.
     """
     try:
         readings = MeterReading.objects.filter(
@@ -929,17 +1190,15 @@ def api_get_pending_readings(request):
             source='app_manual'  # Manual entry from Smart Meter Reader app
         ).select_related('consumer', 'consumer__barangay', 'submitted_by').order_by('-created_at')
 
+        readings = list(readings)
+        previous = previous_confirmed_values(readings)
+
         data = []
         for r in readings:
             # Calculate consumption
-            prev = MeterReading.objects.filter(
-                consumer=r.consumer,
-                is_confirmed=True,
-                reading_date__lt=r.reading_date
-            ).order_by('-reading_date').first()
-
-            if prev:
-                consumption = r.reading_value - prev.reading_value
+            prev_value = previous[r.id]
+            if prev_value is not None:
+                consumption = r.reading_value - prev_value
             else:
                 baseline = r.consumer.first_reading if r.consumer.first_reading else 0
                 consumption = r.reading_value - baseline
@@ -954,15 +1213,16 @@ def api_get_pending_readings(request):
                 'reading_value': r.reading_value,
                 'consumption': consumption,
                 'proof_image_url': r.proof_image_url,
+                'proof_thumbnail_url': r.proof_thumbnail_url,
                 'submitted_by': r.submitted_by.get_full_name() if r.submitted_by else 'Unknown',
                 'submitted_at': r.created_at.isoformat(),
             })
 
-        return JsonResponse({
+        return negotiated_response(request, {
             'status': 'success',
             'pending_readings': data,
             'total': len(data)
-        })
+        }, rows_key='pending_readings')
 
     except Exception as e:
         import logging
@@ -1087,21 +1347,13 @@ def api_logout(request):
         return JsonResponse({'error': 'Method not allowed'}, status=405)
 
     try:
-        # Get token from request body or Authorization header
-        token = None
-        if request.body:
-            try:
-                data = json.loads(request.body)
-                token = data.get('token')
-            except json.JSONDecodeError:
-                pass
-
-        if not token:
-            auth_header = request.headers.get('Authorization', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header[7:]
+        # Get token from Authorization header or request body
+        token = get_request_token(request)
 
         if token:
+            # Delete the session and drop the token from the auth caches
+            revoke_token(token)
+
             # Find and update the session
             latest_session = UserLoginEvent.objects.filter(
                 session_key=token,
@@ -1141,105 +1393,209 @@ def api_logout(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _field_consumer_queryset(barangay):
+    """
+    Consumers of a barangay annotated with everything the field app lists.
+
+    The latest confirmed reading value and the status of the latest reading
+    are correlated subqueries, so only one row per consumer is read instead
+    of prefetching each consumer's whole reading history.
+    """
+    from django.db.models import Exists
+
+    return Consumer.objects.filter(
+        barangay=barangay
+    ).select_related(
+        'barangay', 'purok'
+    ).annotate(
+        latest_confirmed_value_db=latest_reading_subquery('reading_value', confirmed_only=True),
+        latest_reading_id_db=latest_reading_subquery('id'),
+        latest_is_confirmed_db=latest_reading_subquery('is_confirmed'),
+        latest_is_rejected_db=latest_reading_subquery('is_rejected'),
+        latest_rejection_reason_db=latest_reading_subquery('rejection_reason'),
+        # Annotate pending bills count (1 query for all consumers)
+        pending_bills_count_db=Count(
+            'bills',
+            filter=Q(bills__status='Pending')
+        ),
+        # Annotate delinquent status (no separate query needed)
+        has_overdue_db=Exists(
+            Bill.objects.filter(
+                consumer=OuterRef('pk'),
+                status='Pending',
+                due_date__lt=timezone.now().date()
+            )
+        )
+    )
+
+
+# Derived fields left out of compact encodings (see consumers/api_encoding.py)
+FIELD_CONSUMER_ALIASES = ('name', 'address', 'is_active', 'previous_reading')
+
+
+def _serialize_field_consumer(consumer):
+    """Build the field app's JSON entry for a consumer from _field_consumer_queryset()."""
+    latest_reading_value = consumer.latest_confirmed_value_db or 0
+
+    # Get the exact status of the most recently submitted reading
+    current_reading_status = 'none'
+    rejection_reason = None
+    if consumer.latest_reading_id_db:
+        if consumer.latest_is_confirmed_db:
+            current_reading_status = 'confirmed'
+        elif consumer.latest_is_rejected_db:
+            current_reading_status = 'rejected'
+            rejection_reason = consumer.latest_rejection_reason_db
+        else:
+            current_reading_status = 'pending'
+
+    return {
+        'id': consumer.id,
+        'id_number': consumer.id_number,  # Numeric ID format: 2025110001
+        'name': f"{consumer.first_name} {consumer.last_name}",
+        'first_name': consumer.first_name,
+        'last_name': consumer.last_name,
+        'serial_number': consumer.serial_number,
+        'household_number': consumer.household_number,
+        'barangay': consumer.barangay.name if consumer.barangay else '',
+        'purok': consumer.purok.name if consumer.purok else '',
+        'address': f"{consumer.purok.name if consumer.purok else ''}, {consumer.barangay.name if consumer.barangay else ''}",
+        'phone_number': consumer.phone_number,
+        'status': consumer.status,  # 'active' or 'disconnected'
+        'is_active': consumer.status == 'active',
+        'usage_type': consumer.usage_type,  # 'Residential' or 'Commercial' - needed for accurate rate calculation
+        'latest_confirmed_reading': latest_reading_value,
+        'previous_reading': latest_reading_value,  # Alias for Android app compatibility
+        # Delinquent status from annotated field (no extra query!)
+        'is_delinquent': consumer.has_overdue_db,
+        'pending_bills_count': consumer.pending_bills_count_db,
+        # Reading validation status for the mobile app
+        'current_reading_status': current_reading_status,
+        'rejection_reason': rejection_reason
+    }
+
+
 @csrf_exempt
 @login_required
 def api_consumers(request):
     """
     Get consumers for the staff's assigned barangay.
-    OPTIMIZED: Uses prefetch_related and annotations to avoid N+1 queries.
+    OPTIMIZED: Latest readings and bill counts are annotated in a single query.
+
+    Send Accept: application/vnd.waterworks.columnar+json (or
+    application/msgpack) for the compact columnar encoding.
     """
     try:
-        from django.db.models import Prefetch, Exists, OuterRef
-
         profile = StaffProfile.objects.select_related('assigned_barangay').get(user=request.user)
 
-        # PERFORMANCE FIX: Prefetch latest reading and annotate bill counts
-        # This reduces 300+ queries to just 3 queries for 100 consumers
-        consumers = Consumer.objects.filter(
-            barangay=profile.assigned_barangay
-        ).select_related(
-            'barangay', 'purok'
-        ).prefetch_related(
-            # Prefetch only the latest confirmed reading per consumer
-            Prefetch(
-                'meter_readings',
-                queryset=MeterReading.objects.filter(
-                    is_confirmed=True
-                ).order_by('-reading_date', '-created_at'),
-                to_attr='latest_readings_list'
-            ),
-            # Prefetch the absolute latest reading to check its status (e.g. pending, rejected)
-            Prefetch(
-                'meter_readings',
-                queryset=MeterReading.objects.order_by('-reading_date', '-created_at'),
-                to_attr='all_recent_readings_list'
-            )
-        ).annotate(
-            # Annotate pending bills count (1 query for all consumers)
-            pending_bills_count_db=Count(
-                'bills',
-                filter=Q(bills__status='Pending')
-            ),
-            # Annotate delinquent status (no separate query needed)
-            has_overdue_db=Exists(
-                Bill.objects.filter(
-                    consumer=OuterRef('pk'),
-                    status='Pending',
-                    due_date__lt=timezone.now().date()
-                )
-            )
-        )
+        consumers = _field_consumer_queryset(profile.assigned_barangay)
+        data = [_serialize_field_consumer(consumer) for consumer in consumers]
+
+        return negotiated_response(request, data, aliases=FIELD_CONSUMER_ALIASES)
+    except StaffProfile.DoesNotExist:
+        return JsonResponse({'error': 'No assigned barangay'}, status=403)
+
+
+# Cursors are moved back by this much so rows committed by transactions
+# that were still running when the previous cursor was issued are not missed.
+SYNC_CURSOR_OVERLAP = timedelta(minutes=2)
 
-        data = []
-        for consumer in consumers:
-            # Get latest confirmed reading from prefetched data
-            latest_reading_value = 0
-            if consumer.latest_readings_list:
-                latest_reading_value = consumer.latest_readings_list[0].reading_value
-
-            # Get the exact status of the most recently submitted reading
-            current_reading_status = 'none'
-            rejection_reason = None
-            if consumer.all_recent_readings_list:
-                latest_all = consumer.all_recent_readings_list[0]
-                if latest_all.is_confirmed:
-                    current_reading_status = 'confirmed'
-                elif latest_all.is_rejected:
-                    current_reading_status = 'rejected'
-                    rejection_reason = latest_all.rejection_reason
-                else:
-                    current_reading_status = 'pending'
-
-            # Append consumer data using annotated fields
-            data.append({
-                'id': consumer.id,
-                'id_number': consumer.id_number,  # Numeric ID format: 2025110001
-                'name': f"{consumer.first_name} {consumer.last_name}",
-                'first_name': consumer.first_name,
-                'last_name': consumer.last_name,
-                'serial_number': consumer.serial_number,
-                'household_number': consumer.household_number,
-                'barangay': consumer.barangay.name if consumer.barangay else '',
-                'purok': consumer.purok.name if consumer.purok else '',
-                'address': f"{consumer.purok.name if consumer.purok else ''}, {consumer.barangay.name if consumer.barangay else ''}",
-                'phone_number': consumer.phone_number,
-                'status': consumer.status,  # 'active' or 'disconnected'
-                'is_active': consumer.status == 'active',
-                'usage_type': consumer.usage_type,  # 'Residential' or 'Commercial' - needed for accurate rate calculation
-                'latest_confirmed_reading': latest_reading_value,
-                'previous_reading': latest_reading_value,  # Alias for Android app compatibility
-                # Delinquent status from annotated field (no extra query!)
-                'is_delinquent': consumer.has_overdue_db,
-                'pending_bills_count': consumer.pending_bills_count_db,
-                # Reading validation status for the mobile app
-                'current_reading_status': current_reading_status,
-                'rejection_reason': rejection_reason
-            })
 
-        return JsonResponse(data, safe=False)
+@csrf_exempt
+@login_required
+def api_consumers_sync(request):
+    """
+    Incremental consumer list for the field app.
+
+    GET /api/consumers/sync/?since=<cursor>
+
+    Returns only the consumers of the staff's barangay whose profile, latest
+    reading status or bill counts may have changed since the cursor, the IDs
+    of consumers removed from the barangay, and the cursor for the next call.
+    Without a cursor (or with one older than the tombstone retention period)
+    the full list is returned with full_sync=true and the client should
+    replace its cache.
+
+    Response:
+    {
+        "consumers": [...],      # same entries as /api/consumers/
+        "removed": [12, 57],     # consumer IDs to drop
+        "cursor": "2026-10-17T08:15:00+00:00",
+        "full_sync": false
+    }
+    """
+    from django.db.models import Exists
+    from django.utils.dateparse import parse_datetime
+    from ..maintenance import SYNC_TOMBSTONE_RETENTION_DAYS
+    from ..models import ConsumerTombstone
+
+    try:
+        profile = StaffProfile.objects.select_related('assigned_barangay').get(user=request.user)
     except StaffProfile.DoesNotExist:
         return JsonResponse({'error': 'No assigned barangay'}, status=403)
 
+    # Taken before any query so changes made while we read are picked up next time
+    cursor = timezone.now()
+
+    since = None
+    # An unencoded '+' in the UTC offset arrives as a space
+    since_param = request.GET.get('since', '').strip().replace(' ', '+')
+    if since_param:
+        try:
+            since = parse_datetime(since_param)
+        except ValueError:
+            since = None
+        if since is None:
+            return JsonResponse({'error': 'Invalid since cursor'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+
+    full_sync = since is None or since < cursor - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    consumers = _field_consumer_queryset(profile.assigned_barangay)
+    removed = []
+
+    if not full_sync:
+        since = since - SYNC_CURSOR_OVERLAP
+        today = timezone.now().date()
+
+        consumers = consumers.filter(
+            # Profile edits (status, name, purok, ...), moves into this barangay,
+            # and bill/reading edits or deletes (see touch_consumer_for_sync)
+            Q(updated_at__gte=since)
+            # New, confirmed or rejected readings
+            | Exists(MeterReading.objects.filter(
+                Q(created_at__gte=since) | Q(confirmed_at__gte=since) | Q(rejected_at__gte=since),
+                consumer=OuterRef('pk'),
+            ))
+            # New bills and payments change the pending bill count
+            | Exists(Bill.objects.filter(consumer=OuterRef('pk'), created_at__gte=since))
+            | Exists(Payment.objects.filter(bill__consumer=OuterRef('pk'), payment_date__gte=since))
+            # Pending bills that fell due since the cursor make the consumer delinquent
+            | Exists(Bill.objects.filter(
+                consumer=OuterRef('pk'),
+                status='Pending',
+                due_date__gte=since.date(),
+                due_date__lt=today,
+            ))
+        )
+
+        removed = list(
+            ConsumerTombstone.objects.filter(
+                barangay=profile.assigned_barangay,
+                removed_at__gte=since,
+            ).exclude(
+                # Moved away and back again
+                consumer_id__in=Consumer.objects.filter(barangay=profile.assigned_barangay).values('id')
+            ).values_list('consumer_id', flat=True).distinct()
+        )
+
+    return negotiated_response(request, {
+        'consumers': [_serialize_field_consumer(consumer) for consumer in consumers],
+        'removed': removed,
+        'cursor': cursor.isoformat(),
+        'full_sync': full_sync,
+    }, rows_key='consumers', aliases=FIELD_CONSUMER_ALIASES)
+
 
 
 @csrf_exempt
@@ -1285,6 +1641,41 @@ def api_get_previous_reading(request, consumer_id):
         return JsonResponse({'error': 'Consumer not found'}, status=404)
 
 
+def _rates_payload(setting):
+    """Build the api_get_current_rates body from a settings snapshot."""
+    return {
+        'status': 'success',
+        # Residential Tiered Rates
+        'residential': {
+            'minimum_charge': float(setting.residential_minimum_charge),  # Tier 1: 1-5 m³
+            'tier2_rate': float(setting.residential_tier2_rate),  # 6-10 m³
+            'tier3_rate': float(setting.residential_tier3_rate),  # 11-20 m³
+            'tier4_rate': float(setting.residential_tier4_rate),  # 21-50 m³
+            'tier5_rate': float(setting.residential_tier5_rate),  # 51+ m³
+        },
+        # Commercial Tiered Rates
+        'commercial': {
+            'minimum_charge': float(setting.commercial_minimum_charge),  # Tier 1: 1-5 m³
+            'tier2_rate': float(setting.commercial_tier2_rate),  # 6-10 m³
+            'tier3_rate': float(setting.commercial_tier3_rate),  # 11-20 m³
+            'tier4_rate': float(setting.commercial_tier4_rate),  # 21-50 m³
+            'tier5_rate': float(setting.commercial_tier5_rate),  # 51+ m³
+        },
+        # Tier brackets info for reference
+        'tier_brackets': {
+            'tier1': '1-5 m³ (minimum charge)',
+            'tier2': '6-10 m³',
+            'tier3': '11-20 m³',
+            'tier4': '21-50 m³',
+            'tier5': '51+ m³'
+        },
+        # Legacy rates (for backward compatibility)
+        'residential_rate_per_cubic': float(setting.residential_rate_per_cubic),
+        'commercial_rate_per_cubic': float(setting.commercial_rate_per_cubic),
+        'updated_at': setting.updated_at.isoformat()
+    }
+
+
 # NEW: API View for fetching the current water rates (Residential & Commercial)
 @csrf_exempt
 @login_required
@@ -1293,46 +1684,17 @@ def api_get_current_rates(request):
     API endpoint for the Android app to fetch all tiered water rates.
 
     Returns complete tiered rate structure for both Residential and Commercial.
+
+    The body is cached per settings version and sent with ETag and
+    Last-Modified headers; a poll with a matching If-None-Match or
+    If-Modified-Since gets an empty 304 (see consumers/settings_cache.py).
     """
     try:
-        # Get the first (or only) SystemSetting object (singleton pattern)
-        setting = SystemSetting.objects.first()
-        if not setting:
+        response = cached_settings_response(request, 'rates', _rates_payload)
+        if response is None:
             # Handle the case where no SystemSetting exists
             return JsonResponse({'error': 'System settings not configured.'}, status=500)
-
-        # Return all tiered rates as JSON
-        return JsonResponse({
-            'status': 'success',
-            # Residential Tiered Rates
-            'residential': {
-                'minimum_charge': float(setting.residential_minimum_charge),  # Tier 1: 1-5 m³
-                'tier2_rate': float(setting.residential_tier2_rate),  # 6-10 m³
-                'tier3_rate': float(setting.residential_tier3_rate),  # 11-20 m³
-                'tier4_rate': float(setting.residential_tier4_rate),  # 21-50 m³
-                'tier5_rate': float(setting.residential_tier5_rate),  # 51+ m³
-            },
-            # Commercial Tiered Rates
-            'commercial': {
-                'minimum_charge': float(setting.commercial_minimum_charge),  # Tier 1: 1-5 m³
-                'tier2_rate': float(setting.commercial_tier2_rate),  # 6-10 m³
-                'tier3_rate': float(setting.commercial_tier3_rate),  # 11-20 m³
-                'tier4_rate': float(setting.commercial_tier4_rate),  # 21-50 m³
-                'tier5_rate': float(setting.commercial_tier5_rate),  # 51+ m³
-            },
-            # Tier brackets info for reference
-            'tier_brackets': {
-                'tier1': '1-5 m³ (minimum charge)',
-                'tier2': '6-10 m³',
-                'tier3': '11-20 m³',
-                'tier4': '21-50 m³',
-                'tier5': '51+ m³'
-            },
-            # Legacy rates (for backward compatibility)
-            'residential_rate_per_cubic': float(setting.residential_rate_per_cubic),
-            'commercial_rate_per_cubic': float(setting.commercial_rate_per_cubic),
-            'updated_at': setting.updated_at.isoformat()
-        })
+        return response
 
     except Exception as e:
         # Log unexpected errors
@@ -1480,7 +1842,8 @@ def api_get_consumer_bills(request, consumer_id):
 
     URL: /api/consumers/<consumer_id>/bills/
 
-    Returns list of all bills (history) for the consumer.
+    Returns list of all bills (history) for the consumer. Supports the
+    compact encodings of consumers/api_encoding.py.
     """
     try:
         consumer = Consumer.objects.get(id=consumer_id)
@@ -1505,14 +1868,14 @@ def api_get_consumer_bills(request, consumer_id):
                 'current_reading': bill.current_reading.reading_value if bill.current_reading else 0,
             })
 
-        return JsonResponse({
+        return negotiated_response(request, {
             'status': 'success',
             'consumer_id': consumer.id,
             'consumer_name': f"{consumer.first_name} {consumer.last_name}",
             'id_number': consumer.id_number,
             'total_bills': len(bills_list),
             'bills': bills_list
-        })
+        }, rows_key='bills')
 
     except Consumer.DoesNotExist:
         return JsonResponse({
@@ -1531,6 +1894,68 @@ def api_get_consumer_bills(request, consumer_id):
 # ============================================================================
 # API VIEW: GET SYSTEM SETTINGS FOR MOBILE APP
 # ============================================================================
+def _system_settings_payload(setting):
+    """Build the api_get_system_settings body from a settings snapshot."""
+    return {
+        'status': 'success',
+
+        # Reading Schedule - Controls when field staff should submit readings
+        'reading_schedule': {
+            'start_day': setting.reading_start_day,
+            'end_day': setting.reading_end_day,
+            'description': f'Day {setting.reading_start_day} to Day {setting.reading_end_day} of each month'
+        },
+
+        # Billing Schedule - Controls dates shown on bills
+        'billing_schedule': {
+            'billing_day': setting.billing_day_of_month,
+            'due_day': setting.due_day_of_month,
+            'description': f'Bills dated Day {setting.billing_day_of_month}, Due Day {setting.due_day_of_month}'
+        },
+
+        # Penalty Settings
+        'penalty': {
+            'enabled': setting.penalty_enabled,
+            'type': setting.penalty_type,
+            'rate': float(setting.penalty_rate) if setting.penalty_type == 'percentage' else None,
+            'fixed_amount': float(setting.fixed_penalty_amount) if setting.penalty_type == 'fixed' else None,
+            'grace_period_days': setting.penalty_grace_period_days,
+            'max_amount': float(setting.max_penalty_amount) if setting.max_penalty_amount > 0 else None,
+            'description': f'{setting.penalty_rate}% penalty applied after Day {setting.due_day_of_month}' if setting.penalty_enabled else 'Penalties disabled'
+        },
+
+        # Residential Tiered Rates
+        'residential_rates': {
+            'minimum_charge': float(setting.residential_minimum_charge),
+            'tier2_rate': float(setting.residential_tier2_rate),
+            'tier3_rate': float(setting.residential_tier3_rate),
+            'tier4_rate': float(setting.residential_tier4_rate),
+            'tier5_rate': float(setting.residential_tier5_rate),
+        },
+
+        # Commercial Tiered Rates
+        'commercial_rates': {
+            'minimum_charge': float(setting.commercial_minimum_charge),
+            'tier2_rate': float(setting.commercial_tier2_rate),
+            'tier3_rate': float(setting.commercial_tier3_rate),
+            'tier4_rate': float(setting.commercial_tier4_rate),
+            'tier5_rate': float(setting.commercial_tier5_rate),
+        },
+
+        # Tier brackets info
+        'tier_brackets': {
+            'tier1': '1-5 m³ (minimum charge)',
+            'tier2': '6-10 m³',
+            'tier3': '11-20 m³',
+            'tier4': '21-50 m³',
+            'tier5': '51+ m³'
+        },
+
+        # Metadata
+        'updated_at': setting.updated_at.isoformat(),
+    }
+
+
 @csrf_exempt
 def api_get_system_settings(request):
     """
@@ -1547,70 +1972,16 @@ def api_get_system_settings(request):
     1. Show field staff the current reading period
     2. Display billing information to users
     3. Calculate estimated bills with current rates
+
+    The body is cached per settings version and sent with ETag and
+    Last-Modified headers; a poll with a matching If-None-Match or
+    If-Modified-Since gets an empty 304 (see consumers/settings_cache.py).
     """
     try:
-        setting = SystemSetting.objects.first()
-        if not setting:
+        response = cached_settings_response(request, 'settings', _system_settings_payload)
+        if response is None:
             return JsonResponse({'error': 'System settings not configured.'}, status=500)
-
-        return JsonResponse({
-            'status': 'success',
-
-            # Reading Schedule - Controls when field staff should submit readings
-            'reading_schedule': {
-                'start_day': setting.reading_start_day,
-                'end_day': setting.reading_end_day,
-                'description': f'Day {setting.reading_start_day} to Day {setting.reading_end_day} of each month'
-            },
-
-            # Billing Schedule - Controls dates shown on bills
-            'billing_schedule': {
-                'billing_day': setting.billing_day_of_month,
-                'due_day': setting.due_day_of_month,
-                'description': f'Bills dated Day {setting.billing_day_of_month}, Due Day {setting.due_day_of_month}'
-            },
-
-            # Penalty Settings
-            'penalty': {
-                'enabled': setting.penalty_enabled,
-                'type': setting.penalty_type,
-                'rate': float(setting.penalty_rate) if setting.penalty_type == 'percentage' else None,
-                'fixed_amount': float(setting.fixed_penalty_amount) if setting.penalty_type == 'fixed' else None,
-                'grace_period_days': setting.penalty_grace_period_days,
-                'max_amount': float(setting.max_penalty_amount) if setting.max_penalty_amount > 0 else None,
-                'description': f'{setting.penalty_rate}% penalty applied after Day {setting.due_day_of_month}' if setting.penalty_enabled else 'Penalties disabled'
-            },
-
-            # Residential Tiered Rates
-            'residential_rates': {
-                'minimum_charge': float(setting.residential_minimum_charge),
-                'tier2_rate': float(setting.residential_tier2_rate),
-                'tier3_rate': float(setting.residential_tier3_rate),
-                'tier4_rate': float(setting.residential_tier4_rate),
-                'tier5_rate': float(setting.residential_tier5_rate),
-            },
-
-            # Commercial Tiered Rates
-            'commercial_rates': {
-                'minimum_charge': float(setting.commercial_minimum_charge),
-                'tier2_rate': float(setting.commercial_tier2_rate),
-                'tier3_rate': float(setting.commercial_tier3_rate),
-                'tier4_rate': float(setting.commercial_tier4_rate),
-                'tier5_rate': float(setting.commercial_tier5_rate),
-            },
-
-            # Tier brackets info
-            'tier_brackets': {
-                'tier1': '1-5 m³ (minimum charge)',
-                'tier2': '6-10 m³',
-                'tier3': '11-20 m³',
-                'tier4': '21-50 m³',
-                'tier5': '51+ m³'
-            },
-
-            # Metadata
-            'updated_at': setting.updated_at.isoformat(),
-        })
+        return response
 
     except Exception as e:
         import logging
@@ -1645,10 +2016,14 @@ def api_check_settings_version(request):
     1. App stores last_updated timestamp from /api/settings/ response
     2. Periodically calls this endpoint with last_updated
     3. If settings_changed = true, fetches full settings from /api/settings/
+
+    The settings version is cached, and the response carries ETag and
+    Last-Modified headers so a conditional GET for an unchanged version
+    gets an empty 304.
     """
     try:
-        setting = SystemSetting.objects.first()
-        if not setting:
+        updated_at = get_settings_version()
+        if updated_at is None:
             return JsonResponse({
                 'status': 'error',
                 'message': 'System settings not configured'
@@ -1678,7 +2053,7 @@ def api_check_settings_version(request):
                     last_updated = timezone.make_aware(last_updated)
 
                 # Check if settings were updated after last sync
-                settings_changed = setting.updated_at > last_updated
+                settings_changed = updated_at > last_updated
             except (ValueError, AttributeError):
                 # If parsing fails, assume settings changed (force sync)
                 settings_changed = True
@@ -1686,16 +2061,16 @@ def api_check_settings_version(request):
             # No last_updated provided, assume first sync
             settings_changed = True
 
-        return JsonResponse({
+        return conditional_response(request, updated_at, lambda: JsonResponse({
             'status': 'success',
             'settings_changed': settings_changed,
-            'current_version': setting.updated_at.isoformat(),
+            'current_version': updated_at.isoformat(),
             'message': 'Settings have been updated. Please sync.' if settings_changed else 'Settings are up to date.',
             'last_change': {
-                'date': setting.updated_at.strftime('%Y-%m-%d'),
-                'time': setting.updated_at.strftime('%I:%M %p')
+                'date': updated_at.strftime('%Y-%m-%d'),
+                'time': updated_at.strftime('%I:%M %p')
             }
-        })
+        }))
 
     except Exception as e:
         import logging
@@ -1707,12 +2082,21 @@ def api_check_settings_version(request):
         }, status=500)
 
 
+def _smart_meter_api_key_valid(request):
+    """Check the X-API-Key header against SMART_METER_API_KEY (False if not configured)."""
+    from decouple import config
+    expected_api_key = config('SMART_METER_API_KEY', default='')
+    return bool(expected_api_key) and request.META.get('HTTP_X_API_KEY', '') == expected_api_key
+
+
 @csrf_exempt
+@idempotent('smart_meter_webhook', authorize=_smart_meter_api_key_valid)
 def smart_meter_webhook(request):
     """
     Webhook endpoint for IoT smart meters to submit readings.
     Requires API key authentication via X-API-Key header.
     Set SMART_METER_API_KEY in .env file.
+    Retries carrying the same Idempotency-Key header are replayed.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Invalid method'}, status=405)
@@ -1720,13 +2104,12 @@ def smart_meter_webhook(request):
     # Authenticate using API key from header
     from decouple import config
     expected_api_key = config('SMART_METER_API_KEY', default='')
-    provided_api_key = request.META.get('HTTP_X_API_KEY', '')
 
     if not expected_api_key:
         # API key not configured - reject all requests for security
         return JsonResponse({'error': 'Webhook not configured'}, status=503)
 
-    if provided_api_key != expected_api_key:
+    if not _smart_meter_api_key_valid(request):
         # Invalid or missing API key
         return JsonResponse({'error': 'Unauthorized'}, status=401)
 
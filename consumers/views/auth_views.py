@@ -50,56 +50,10 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
 
 
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
-
-
 # Helper function to get previous confirmed reading
 def get_previous_reading(consumer):
     """Get the most recent confirmed meter reading for a consumer."""
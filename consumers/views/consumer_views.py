@@ -14,7 +14,7 @@ from ..decorators import (
     rate_limit_login, role_required
 )
 from django.db.models import (
-    Q, Max, Count, Sum, OuterRef, Subquery, Value, F,
+    Q, Max, Count, Sum, OuterRef, Subquery, Exists, Value, F,
     Case, When, CharField
 )
 from django.db.models.functions import Concat, TruncMonth
@@ -56,56 +56,10 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
 
 
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
-
-
 # Helper function to get previous confirmed reading
 def get_previous_reading(consumer):
     """Get the most recent confirmed meter reading for a consumer."""
@@ -140,38 +94,38 @@ def calculate_water_bill(consumer, consumption):
 
 @login_required
 def export_delinquent_consumers(request):
+    from ..exports import EXPORT_CHUNK_SIZE, stream_csv
+
     month = request.GET.get('month')
     year = request.GET.get('year')
 
     # Use billing_period (not billing_date)
-    bills = Bill.objects.filter(status='Pending')
+    bills = Bill.objects.filter(consumer=OuterRef('pk'), status='Pending')
     if month and year:
         bills = bills.filter(billing_period__month=month, billing_period__year=year)
 
-    consumers = Consumer.objects.filter(bills__in=bills).distinct()
-
-    response = HttpResponse(
-        content_type='text/csv',
-        headers={'Content-Disposition': f'attachment; filename="delinquent_consumers_{month or "all"}_{year or "all"}.csv"'},
+    # Total of all pending bills, summed by the database in the same query
+    consumers = Consumer.objects.filter(Exists(bills)).select_related('barangay').annotate(
+        total_pending=Sum('bills__total_amount', filter=Q(bills__status='Pending'))
     )
 
-    writer = csv.writer(response)
-    writer.writerow(['First Name', 'Middle Name', 'Last Name', 'Phone', 'Barangay', 'Serial', 'Pending Bills'])
-
-    for consumer in consumers:
-        pending_bills = consumer.bills.filter(status='Pending')
-        total_pending = sum(b.total_amount for b in pending_bills)  # Use total_amount
-        writer.writerow([
+    rows = (
+        [
             consumer.first_name,
             consumer.middle_name or "",
             consumer.last_name,
             consumer.phone_number,
             consumer.barangay.name if consumer.barangay else "",
             consumer.serial_number,
-            total_pending
-        ])
-
-    return response
+            consumer.total_pending.quantize(Decimal("0.01")),
+        ]
+        for consumer in consumers.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return stream_csv(
+        f'delinquent_consumers_{month or "all"}_{year or "all"}.csv',
+        ['First Name', 'Middle Name', 'Last Name', 'Phone', 'Barangay', 'Serial', 'Pending Bills'],
+        rows,
+    )
 
 
 @login_required
@@ -483,8 +437,7 @@ def export_consumers_by_barangay(request):
         barangay_id  – (optional) ID of the Barangay to filter by.
                        If empty / 0, exports ALL consumers.
     """
-    import csv as _csv
-    from django.http import HttpResponse as _HR
+    from ..exports import EXPORT_CHUNK_SIZE, stream_csv
 
     barangay_id = request.GET.get('barangay_id', '').strip()
 
@@ -502,19 +455,15 @@ def export_consumers_by_barangay(request):
     else:
         filename = "consumers_all_barangays.csv"
 
-    response = _HR(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    writer = _csv.writer(response)
     # ---- Header row (same columns as the import template) ----
-    writer.writerow([
+    header = [
         'first_name', 'middle_name', 'last_name', 'suffix',
         'birth_date', 'gender', 'phone_number',
         'civil_status', 'spouse_name',
         'barangay', 'purok', 'household_number',
         'usage_type', 'meter_brand', 'serial_number',
         'first_reading', 'registration_date', 'status'
-    ])
+    ]
 
     # Normalize maps so exported values are guaranteed to pass re-import validation
     GENDER_NORM = {'male': 'Male', 'female': 'Female', 'other': 'Other'}
@@ -523,35 +472,36 @@ def export_consumers_by_barangay(request):
     SUFFIX_NORM = {'jr.': 'Jr.', 'sr.': 'Sr.', 'ii': 'II', 'iii': 'III', 'iv': 'IV', 'v': 'V'}
     STATUS_NORM = {'active': 'active', 'disconnected': 'disconnected'}
 
-    for c in consumers_qs:
-        raw_gender  = (c.gender or '').strip()
-        raw_civil   = (c.civil_status or '').strip()
-        raw_usage   = (c.usage_type or '').strip()
-        raw_suffix  = (c.suffix or '').strip()
-        raw_status  = (c.status or 'active').strip().lower()
-
-        writer.writerow([
-            c.first_name or '',
-            c.middle_name or '',
-            c.last_name or '',
-            SUFFIX_NORM.get(raw_suffix.lower(), raw_suffix),
-            c.birth_date.strftime('%Y-%m-%d') if c.birth_date else '',
-            GENDER_NORM.get(raw_gender.lower(), raw_gender),
-            c.phone_number or '',
-            CIVIL_NORM.get(raw_civil.lower(), raw_civil),
-            c.spouse_name or '',
-            c.barangay.name if c.barangay else '',
-            c.purok.name if c.purok else '',
-            c.household_number or '',
-            USAGE_NORM.get(raw_usage.lower(), raw_usage),
-            c.meter_brand.name if c.meter_brand else '',
-            c.serial_number or '',
-            c.first_reading if c.first_reading is not None else '0',
-            c.registration_date.strftime('%Y-%m-%d') if c.registration_date else '',
-            STATUS_NORM.get(raw_status, 'active'),
-        ])
-
-    return response
+    def rows():
+        for c in consumers_qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            raw_gender  = (c.gender or '').strip()
+            raw_civil   = (c.civil_status or '').strip()
+            raw_usage   = (c.usage_type or '').strip()
+            raw_suffix  = (c.suffix or '').strip()
+            raw_status  = (c.status or 'active').strip().lower()
+
+            yield [
+                c.first_name or '',
+                c.middle_name or '',
+                c.last_name or '',
+                SUFFIX_NORM.get(raw_suffix.lower(), raw_suffix),
+                c.birth_date.strftime('%Y-%m-%d') if c.birth_date else '',
+                GENDER_NORM.get(raw_gender.lower(), raw_gender),
+                c.phone_number or '',
+                CIVIL_NORM.get(raw_civil.lower(), raw_civil),
+                c.spouse_name or '',
+                c.barangay.name if c.barangay else '',
+                c.purok.name if c.purok else '',
+                c.household_number or '',
+                USAGE_NORM.get(raw_usage.lower(), raw_usage),
+                c.meter_brand.name if c.meter_brand else '',
+                c.serial_number or '',
+                c.first_reading if c.first_reading is not None else '0',
+                c.registration_date.strftime('%Y-%m-%d') if c.registration_date else '',
+                STATUS_NORM.get(raw_status, 'active'),
+            ]
+
+    return stream_csv(filename, header, rows())
 
 
 
@@ -947,10 +897,8 @@ def edit_consumer(request, consumer_id):
 
             # Recalculate senior citizen discount on pending bills if birth_date changed
             if form.cleaned_data.get('birth_date') != old_birth_date:
-                from ..utils import update_bill_penalty
-                pending_bills = consumer.bills.filter(status='Pending')
-                for bill in pending_bills:
-                    update_bill_penalty(bill, save=True)
+                from ..utils import sweep_penalties
+                sweep_penalties(consumer.bills.filter(status='Pending'))
 
             # Track activity
             try:
@@ -50,56 +50,10 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
 
 
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
-
-
 # Helper function to get previous confirmed reading
 def get_previous_reading(consumer):
     """Get the most recent confirmed meter reading for a consumer."""
@@ -136,54 +90,14 @@ def calculate_water_bill(consumer, consumption):
 @login_required
 def home(request):
     """Staff dashboard - unified landing page for all roles with role-based metric widgets."""
-    from ..models import Notification
-
-
-
-    # Auto-cleanup: Delete notifications older than 1 month
-    one_month_ago = datetime.now() - timedelta(days=30)
-    Notification.objects.filter(created_at__lt=one_month_ago).delete()
+    from ..models import MonthlyRollup
+    from ..kpis import get_dashboard_kpis
 
     current_month = datetime.now().month
     current_year = datetime.now().year
-    today = datetime.now().date()
-
-    # Get counts
-    connected_count = Consumer.objects.filter(status='active').count()
-    disconnected_count = Consumer.objects.filter(status='disconnected').count()
-
-    # Delinquent count (consumers with pending bills older than today)
-    delinquent_count = Consumer.objects.filter(
-        bills__status='Pending',
-        bills__billing_period__lt=datetime.now().date()
-    ).distinct().count()
-
-    # ==========================================
-    # REVENUE CALCULATIONS
-    # ==========================================
-    # Today's Revenue
-    today_revenue = Payment.objects.filter(
-        payment_date=today
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    # This Month's Revenue
-    monthly_revenue = Payment.objects.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    # Annual Revenue (Current Year)
-    annual_revenue = Payment.objects.filter(
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    # Total Revenue (All Time)
-    total_revenue = Payment.objects.aggregate(
-        total=Sum('amount_paid')
-    )['total'] or Decimal('0.00')
 
-    # Today's payment count
-    today_payment_count = Payment.objects.filter(payment_date=today).count()
+    # Consumer counts, revenue and bill status counters (cached, see consumers.kpis)
+    kpis = get_dashboard_kpis()
 
     # Handle report filter - support both month_year and separate month/year
     month_year = request.GET.get('month_year')
@@ -215,30 +129,24 @@ def home(request):
     end_date = datetime.now().date()
     start_date = end_date - relativedelta(months=5)
 
-    monthly_payments = Payment.objects.filter(
-        payment_date__gte=start_date,
-        payment_date__lte=end_date
-    ).annotate(
-        month=TruncMonth('payment_date')
-    ).values('month').annotate(
-        total=Sum('amount_paid')
-    ).order_by('month')
+    trend_rollups = MonthlyRollup.objects.annotate(
+        period_index=F('year') * 12 + F('month')
+    ).filter(period_index__gte=start_date.year * 12 + start_date.month)
+
+    monthly_payments = trend_rollups.filter(payment_count__gt=0).values('year', 'month').annotate(
+        total=Sum('income')
+    ).order_by('year', 'month')
 
     revenue_labels = []
     revenue_data = []
     revenue_list = []  # For template iteration
     for item in monthly_payments:
-        label = item['month'].strftime('%b %Y')
+        label = date(item['year'], item['month'], 1).strftime('%b %Y')
         amount = float(item['total'] or 0)
         revenue_labels.append(label)
         revenue_data.append(amount)
         revenue_list.append((label, amount))
 
-    # Chart Data: Payment Status Distribution
-    total_bills = Bill.objects.filter(status__in=['Pending', 'Unpaid', 'Overdue']).count()  # Outstanding bills only
-    paid_bills = Bill.objects.filter(status='Paid').count()
-    pending_bills = Bill.objects.filter(status='Pending').count()
-
     # Get all barangays for filter dropdown
     all_barangays = Barangay.objects.all().order_by('name')
 
@@ -290,48 +198,44 @@ def home(request):
     barangay_counts = [item['count'] for item in barangay_data]
 
     # Chart Data: Monthly Consumption Trend
-    monthly_consumption = Bill.objects.filter(
-        billing_period__gte=start_date
-    ).annotate(
-        month=TruncMonth('billing_period')
-    ).values('month').annotate(
+    monthly_consumption = trend_rollups.filter(bills_issued__gt=0).values('year', 'month').annotate(
         total_consumption=Sum('consumption')
-    ).order_by('month')
+    ).order_by('year', 'month')
 
     consumption_labels = []
     consumption_data = []
     for item in monthly_consumption:
-        consumption_labels.append(item['month'].strftime('%b %Y'))
+        consumption_labels.append(date(item['year'], item['month'], 1).strftime('%b %Y'))
         consumption_data.append(float(item['total_consumption'] or 0))
 
     # Create a date object for proper month/year formatting in template
     selected_date = date(selected_year, selected_month, 1)
 
     context = {
-        'connected_count': connected_count,
-        'disconnected_count': disconnected_count,
-        'delinquent_count': delinquent_count,
+        'connected_count': kpis['connected_count'],
+        'disconnected_count': kpis['disconnected_count'],
+        'delinquent_count': kpis['delinquent_count'],
         'delinquent_bills': delinquent_bills,
         'total_delinquent_amount': total_delinquent_amount,
         'selected_date': selected_date,
         'current_date': datetime.now(),
         # Revenue data
-        'today_revenue': today_revenue,
-        'monthly_revenue': monthly_revenue,
-        'annual_revenue': annual_revenue,
-        'total_revenue': total_revenue,
-        'today_payment_count': today_payment_count,
+        'today_revenue': kpis['today_revenue'],
+        'monthly_revenue': kpis['monthly_revenue'],
+        'annual_revenue': kpis['annual_revenue'],
+        'total_revenue': kpis['total_revenue'],
+        'today_payment_count': kpis['today_payment_count'],
         # Chart data
         'revenue_labels': json.dumps(revenue_labels),
         'revenue_data': json.dumps(revenue_data),
         'revenue_list': revenue_list,
-        'paid_bills': paid_bills,
-        'pending_bills': pending_bills,
+        'paid_bills': kpis['paid_bills'],
+        'pending_bills': kpis['pending_bills'],
         'barangay_labels': json.dumps(barangay_labels),
         'barangay_counts': json.dumps(barangay_counts),
         'consumption_labels': json.dumps(consumption_labels),
         'consumption_data': json.dumps(consumption_data),
-        'total_bills': total_bills,
+        'total_bills': kpis['total_bills'],
         'all_barangays': all_barangays,
         'consumer_bill_status': json.dumps(consumer_bill_status, default=str),
     }
@@ -341,33 +245,16 @@ def home(request):
 @login_required
 def dashboard_stats_partial(request):
     """HTMX endpoint to return only the top 5 stat cards for real-time polling"""
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    today = datetime.now().date()
+    from ..kpis import get_dashboard_kpis
 
-    connected_count = Consumer.objects.filter(status='active').count()
-    disconnected_count = Consumer.objects.filter(status='disconnected').count()
-
-    delinquent_count = Consumer.objects.filter(
-        bills__status='Pending',
-        bills__billing_period__lt=today
-    ).distinct().count()
-
-    monthly_revenue = Payment.objects.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    annual_revenue = Payment.objects.filter(
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
+    kpis = get_dashboard_kpis()
 
     context = {
-        'connected_count': connected_count,
-        'disconnected_count': disconnected_count,
-        'delinquent_count': delinquent_count,
-        'monthly_revenue': monthly_revenue,
-        'annual_revenue': annual_revenue,
+        'connected_count': kpis['connected_count'],
+        'disconnected_count': kpis['disconnected_count'],
+        'delinquent_count': kpis['delinquent_count'],
+        'monthly_revenue': kpis['monthly_revenue'],
+        'annual_revenue': kpis['annual_revenue'],
     }
     return render(request, 'consumers/partials/_dashboard_stats.html', context)
 
@@ -381,6 +268,8 @@ def cashier_income_dashboard(request):
     Displays: Today | This Month | Custom Range totals per user who processed payments.
     Helps cashiers know exactly how much cash they need to remit.
     """
+    from ..remittance import cashier_remittance_totals, empty_remittance_totals, overall_remittance_totals
+
     today = datetime.now().date()
     current_month = today.month
     current_year = today.year
@@ -437,45 +326,15 @@ def cashier_income_dashboard(request):
     except Exception:
         collector_users = User.objects.none()
 
+    # Every cashier's totals in one grouped conditional-aggregation query
+    remittance_totals = cashier_remittance_totals(
+        today, filter_start, filter_end, cashier_ids=[user.id for user in collector_users]
+    )
+
     cashier_income_list = []
 
     for user in collector_users:
-        # Today's total
-        today_total = Payment.objects.filter(
-            processed_by=user,
-            payment_date__date=today
-        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-        # Selected month's total
-        month_total = Payment.objects.filter(
-            processed_by=user,
-            payment_date__month=current_month,
-            payment_date__year=current_year
-        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-        # Filtered period total
-        period_total = Payment.objects.filter(
-            processed_by=user,
-            payment_date__date__gte=filter_start,
-            payment_date__date__lte=filter_end
-        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-        # All-time total
-        alltime_total = Payment.objects.filter(
-            processed_by=user
-        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-        # Transaction counts
-        today_count = Payment.objects.filter(
-            processed_by=user,
-            payment_date__date=today
-        ).count()
-
-        period_count = Payment.objects.filter(
-            processed_by=user,
-            payment_date__date__gte=filter_start,
-            payment_date__date__lte=filter_end
-        ).count()
+        totals = remittance_totals.get(user.id) or empty_remittance_totals()
 
         # Get role display name
         role = 'Staff'
@@ -490,41 +349,14 @@ def cashier_income_dashboard(request):
             'username': user.username,
             'full_name': user.get_full_name() or user.username,
             'role': role,
-            'today_total': today_total,
-            'today_count': today_count,
-            'month_total': month_total,
-            'period_total': period_total,
-            'period_count': period_count,
-            'alltime_total': alltime_total,
+            **totals,
         })
 
     # Sort by period total descending (highest collector first)
     cashier_income_list.sort(key=lambda x: x['period_total'], reverse=True)
 
     # --- Overall Totals ---
-    overall_today = Payment.objects.filter(
-        payment_date__date=today
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    overall_month = Payment.objects.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    overall_period = Payment.objects.filter(
-        payment_date__date__gte=filter_start,
-        payment_date__date__lte=filter_end
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    overall_alltime = Payment.objects.aggregate(
-        total=Sum('amount_paid')
-    )['total'] or Decimal('0.00')
-
-    overall_today_count = Payment.objects.filter(payment_date__date=today).count()
-    overall_period_count = Payment.objects.filter(
-        payment_date__date__gte=filter_start,
-        payment_date__date__lte=filter_end
-    ).count()
+    overall = overall_remittance_totals(today, filter_start, filter_end)
 
     # --- My Processed Consumers Breakdown (for the logged in user) ---
     barangay_filter = request.GET.get('barangay', '')
@@ -568,12 +400,12 @@ def cashier_income_dashboard(request):
 
     context = {
         'cashier_income_list': cashier_income_list,
-        'overall_today': overall_today,
-        'overall_month': overall_month,
-        'overall_period': overall_period,
-        'overall_alltime': overall_alltime,
-        'overall_today_count': overall_today_count,
-        'overall_period_count': overall_period_count,
+        'overall_today': overall['today_total'],
+        'overall_month': overall['month_total'],
+        'overall_period': overall['period_total'],
+        'overall_alltime': overall['alltime_total'],
+        'overall_today_count': overall['today_count'],
+        'overall_period_count': overall['period_count'],
         'today': today,
         'current_month': current_month,
         'current_year': current_year,
@@ -599,7 +431,8 @@ def print_cashier_remittance(request, user_id):
     Can be configured via GET params to include/exclude consumer names.
     """
     from django.shortcuts import get_object_or_404
-    
+    from ..remittance import cashier_remittance_totals, empty_remittance_totals
+
     target_user = get_object_or_404(User, id=user_id)
     today = datetime.now().date()
     current_month = today.month
@@ -650,32 +483,15 @@ def print_cashier_remittance(request, user_id):
 
     barangay_filter = request.GET.get('barangay', '')
     
+    # Retrieve totals for this user in one conditional-aggregation query
+    totals = cashier_remittance_totals(
+        today, filter_start, filter_end, cashier_ids=[target_user.id], barangay_id=barangay_filter or None
+    ).get(target_user.id) or empty_remittance_totals()
+
     base_qs = Payment.objects.filter(processed_by=target_user)
     if barangay_filter:
         base_qs = base_qs.filter(bill__consumer__barangay_id=barangay_filter)
 
-    # Retrieve totals for this user
-    today_total = base_qs.filter(
-        payment_date__date=today
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    month_total = base_qs.filter(
-        payment_date__month=current_month,
-        payment_date__year=current_year
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
-    period_total = base_qs.filter(
-        payment_date__date__gte=filter_start,
-        payment_date__date__lte=filter_end
-    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-    
-    period_count = base_qs.filter(
-        payment_date__date__gte=filter_start,
-        payment_date__date__lte=filter_end
-    ).count()
-
-    alltime_total = base_qs.aggregate(total=Sum('amount_paid'))['total'] or Decimal('0.00')
-
     # Get consumers processed
     consumers_list = []
     from django.db.models import Count
@@ -716,11 +532,11 @@ def print_cashier_remittance(request, user_id):
         'month_from': selected_month_from, 'year_from': selected_year_from, 'month_to': selected_month_to, 'year_to': selected_year_to,
         
         
-        'today_total': today_total,
-        'month_total': month_total,
-        'period_total': period_total,
-        'period_count': period_count,
-        'alltime_total': alltime_total,
+        'today_total': totals['today_total'],
+        'month_total': totals['month_total'],
+        'period_total': totals['period_total'],
+        'period_count': totals['period_count'],
+        'alltime_total': totals['alltime_total'],
         'consumers_list': consumers_list,
         'selected_barangay_name': Barangay.objects.get(id=barangay_filter).name if barangay_filter else 'All Barangays',
     }
@@ -53,55 +53,13 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
-from .misc_views import get_consumer_display_id
-
-
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
+from ..billing import generate_bills_for_readings
+from ..exports import ExcelColumn, stream_excel
+from ..readings import latest_reading_rows, latest_readings_for
+from ..settings_cache import get_settings_snapshot
+from .misc_views import export_meter_readings_excel, get_consumer_display_id
 
 
 # Helper function to get previous confirmed reading
@@ -335,46 +293,9 @@ def barangay_meter_readings(request, barangay_id):
     # Get all active consumers in this barangay
     consumers = Consumer.objects.filter(barangay=barangay, status='active').select_related('barangay').order_by('id')
 
-    readings_with_data = []
-    for consumer in consumers:
-        if filter_month:
-            # Get latest reading for this consumer within the filtered month
-            latest_reading = MeterReading.objects.filter(
-                consumer=consumer,
-                reading_date__gte=month_start,
-                reading_date__lte=month_end
-            ).order_by('-reading_date', '-created_at').first()
-        else:
-            # Get latest reading for this consumer (unconfirmed takes priority for display)
-            latest_reading = MeterReading.objects.filter(consumer=consumer).order_by('-reading_date', '-created_at').first()
-
-        if latest_reading:
-            # Find previous confirmed reading
-            prev = MeterReading.objects.filter(
-                consumer=consumer,
-                is_confirmed=True,
-                reading_date__lt=latest_reading.reading_date
-            ).order_by('-reading_date').first()
-
-            # Calculate consumption
-            if prev:
-                consumption = latest_reading.reading_value - prev.reading_value
-            else:
-                # First reading - use consumer's first_reading as baseline
-                baseline = consumer.first_reading if consumer.first_reading else 0
-                consumption = latest_reading.reading_value - baseline
-        else:
-            latest_reading = None
-            prev = None
-            consumption = None
-
-        readings_with_data.append({
-            'consumer': consumer,
-            'reading': latest_reading,
-            'prev_reading': prev,
-            'consumption': consumption,
-            'display_id': get_consumer_display_id(consumer),
-        })
+    readings_with_data = latest_reading_rows(consumers, start=month_start, end=month_end)
+    for item in readings_with_data:
+        item['display_id'] = get_consumer_display_id(item['consumer'])
 
     # Calculate counts for summary statistics
     pending_count = sum(1 for item in readings_with_data if item['reading'] and not item['reading'].is_confirmed)
@@ -409,38 +330,9 @@ def barangay_meter_readings_print(request, barangay_id):
     # Get all active consumers in this barangay
     consumers = Consumer.objects.filter(barangay=barangay, status='active').select_related('barangay').order_by('id')
 
-    readings_with_data = []
-    for consumer in consumers:
-        # Get latest reading for this consumer
-        latest_reading = MeterReading.objects.filter(consumer=consumer).order_by('-reading_date', '-created_at').first()
-
-        if latest_reading:
-            # Find previous confirmed reading
-            prev = MeterReading.objects.filter(
-                consumer=consumer,
-                is_confirmed=True,
-                reading_date__lt=latest_reading.reading_date
-            ).order_by('-reading_date').first()
-
-            # Calculate consumption
-            if prev:
-                consumption = latest_reading.reading_value - prev.reading_value
-            else:
-                # First reading - use consumer's first_reading as baseline
-                baseline = consumer.first_reading if consumer.first_reading else 0
-                consumption = latest_reading.reading_value - baseline
-        else:
-            latest_reading = None
-            prev = None
-            consumption = None
-
-        readings_with_data.append({
-            'consumer': consumer,
-            'reading': latest_reading,
-            'prev_reading': prev,
-            'consumption': consumption,
-            'display_id': get_consumer_display_id(consumer),
-        })
+    readings_with_data = latest_reading_rows(consumers)
+    for item in readings_with_data:
+        item['display_id'] = get_consumer_display_id(item['consumer'])
 
     # Calculate summary statistics
     total_consumers = len(readings_with_data)
@@ -464,6 +356,17 @@ def barangay_meter_readings_print(request, barangay_id):
 # ───────────────────────────────────────
 # NEW: Confirm All Readings in Barangay
 # ───────────────────────────────────────
+def _report_billing_run(request, result, scope=""):
+    """Flash the outcome of a generate_bills_for_readings() run."""
+    if result['confirmed_count'] > 0:
+        messages.success(request, f"✅ {result['confirmed_count']} readings confirmed and bills generated{scope}.")
+
+    rejects = result['rejects']
+    if rejects:
+        details = '; '.join(f"Reading {r['reading_id']}: {r['reason']}" for r in rejects[:3])
+        messages.warning(request, f"⚠️ {len(rejects)} readings could not be processed: {details}")
+
+
 @login_required
 def confirm_all_readings(request, barangay_id):
     if request.method != "POST":
@@ -473,86 +376,11 @@ def confirm_all_readings(request, barangay_id):
     readings_to_confirm = MeterReading.objects.filter(
         consumer__barangay=barangay,
         is_confirmed=False
-    ).exclude(source='app_manual').select_related('consumer')
+    ).exclude(source='app_manual')
 
-    success_count = 0
-    for reading in readings_to_confirm:
-        try:
-            # Find previous confirmed reading
-            prev = MeterReading.objects.filter(
-                consumer=reading.consumer,
-                is_confirmed=True,
-                reading_date__lt=reading.reading_date
-            ).order_by('-reading_date').first()
-
-            # Calculate consumption
-            if prev:
-                # Has previous reading - validate current >= previous
-                if reading.reading_value < prev.reading_value:
-                    continue
-                cons = reading.reading_value - prev.reading_value
-            else:
-                # First reading for this consumer - use consumer's first_reading as baseline
-                baseline = reading.consumer.first_reading if reading.consumer.first_reading else 0
-                if reading.reading_value < baseline:
-                    continue
-                cons = reading.reading_value - baseline
-
-            # Get system settings and calculate using TIERED RATES
-            from ..utils import calculate_tiered_water_bill
-
-            setting = SystemSetting.objects.first()
-            if setting:
-                billing_day = setting.billing_day_of_month
-                due_day = setting.due_day_of_month
-            else:
-                billing_day = 1
-                due_day = 20
-
-            # Calculate bill using TIERED RATES
-            total, average_rate, breakdown = calculate_tiered_water_bill(
-                consumption=cons,
-                usage_type=reading.consumer.usage_type,
-                settings=setting
-            )
+    result = generate_bills_for_readings(readings_to_confirm, confirmed_by=request.user)
+    _report_billing_run(request, result)
 
-            bill = Bill.objects.create(
-                consumer=reading.consumer,
-                previous_reading=prev,
-                current_reading=reading,
-                billing_period=reading.reading_date.replace(day=billing_day),
-                due_date=reading.reading_date.replace(day=due_day),
-                consumption=cons,
-                # Store ACTUAL tier breakdown
-                tier1_consumption=breakdown['tier1_units'],
-                tier1_amount=breakdown['tier1_amount'],
-                tier2_consumption=breakdown['tier2_units'],
-                tier2_rate=breakdown['tier2_rate'],
-                tier2_amount=breakdown['tier2_amount'],
-                tier3_consumption=breakdown['tier3_units'],
-                tier3_rate=breakdown['tier3_rate'],
-                tier3_amount=breakdown['tier3_amount'],
-                tier4_consumption=breakdown['tier4_units'],
-                tier4_rate=breakdown['tier4_rate'],
-                tier4_amount=breakdown['tier4_amount'],
-                tier5_consumption=breakdown['tier5_units'],
-                tier5_rate=breakdown['tier5_rate'],
-                tier5_amount=breakdown['tier5_amount'],
-                rate_per_cubic=average_rate,
-                fixed_charge=Decimal('0.00'),
-                total_amount=total,
-                status='Pending'
-            )
-            reading.is_confirmed = True
-            reading.save()
-            success_count += 1
-        except Exception as e:
-            import logging
-            logging.error(f"Error confirming reading {reading.id}: {str(e)}")
-            continue
-
-    if success_count > 0:
-        messages.success(request, f"✅ {success_count} readings confirmed and bills generated.")
     return redirect('consumers:barangay_meter_readings', barangay_id=barangay_id)
 
 
@@ -568,96 +396,14 @@ def confirm_all_readings_global(request):
     # Get all unconfirmed readings, excluding ones that require photo verification
     readings_to_confirm = MeterReading.objects.filter(
         is_confirmed=False
-    ).exclude(source='app_manual').select_related('consumer')
+    ).exclude(source='app_manual')
 
-    success_count = 0
-    error_count = 0
-
-    for reading in readings_to_confirm:
-        try:
-            consumer = reading.consumer
-
-            # Find previous confirmed reading
-            prev = MeterReading.objects.filter(
-                consumer=consumer,
-                is_confirmed=True,
-                reading_date__lt=reading.reading_date
-            ).order_by('-reading_date').first()
-
-            # Calculate consumption
-            if prev:
-                if reading.reading_value < prev.reading_value:
-                    continue
-                cons = reading.reading_value - prev.reading_value
-            else:
-                # First reading for this consumer - use consumer's first_reading as baseline
-                baseline = consumer.first_reading if consumer.first_reading else 0
-                if reading.reading_value < baseline:
-                    continue
-                cons = reading.reading_value - baseline
-
-            # Get system settings and calculate using TIERED RATES
-            from ..utils import calculate_tiered_water_bill
-
-            setting = SystemSetting.objects.first()
-            if setting:
-                billing_day = setting.billing_day_of_month
-                due_day = setting.due_day_of_month
-            else:
-                billing_day = 1
-                due_day = 20
-
-            # Calculate bill using TIERED RATES
-            total, average_rate, breakdown = calculate_tiered_water_bill(
-                consumption=cons,
-                usage_type=consumer.usage_type,
-                settings=setting
-            )
+    result = generate_bills_for_readings(readings_to_confirm, confirmed_by=request.user)
+    _report_billing_run(request, result, scope=" across all barangays")
 
-            bill = Bill.objects.create(
-                consumer=consumer,
-                previous_reading=prev,
-                current_reading=reading,
-                billing_period=reading.reading_date.replace(day=billing_day),
-                due_date=reading.reading_date.replace(day=due_day),
-                consumption=cons,
-                # Store ACTUAL tier breakdown
-                tier1_consumption=breakdown['tier1_units'],
-                tier1_amount=breakdown['tier1_amount'],
-                tier2_consumption=breakdown['tier2_units'],
-                tier2_rate=breakdown['tier2_rate'],
-                tier2_amount=breakdown['tier2_amount'],
-                tier3_consumption=breakdown['tier3_units'],
-                tier3_rate=breakdown['tier3_rate'],
-                tier3_amount=breakdown['tier3_amount'],
-                tier4_consumption=breakdown['tier4_units'],
-                tier4_rate=breakdown['tier4_rate'],
-                tier4_amount=breakdown['tier4_amount'],
-                tier5_consumption=breakdown['tier5_units'],
-                tier5_rate=breakdown['tier5_rate'],
-                tier5_amount=breakdown['tier5_amount'],
-                rate_per_cubic=average_rate,
-                fixed_charge=Decimal('0.00'),
-                total_amount=total,
-                status='Pending'
-            )
-            reading.is_confirmed = True
-            reading.save()
-            success_count += 1
-        except Exception as e:
-            import logging
-            logging.error(f"Error confirming reading {reading.id}: {str(e)}")
-            error_count += 1
-            continue
-
-    if success_count > 0:
-        messages.success(request, f"✅ {success_count} readings confirmed and bills generated across all barangays.")
-    else:
+    if result['confirmed_count'] == 0 and not result['rejects']:
         messages.info(request, "No unconfirmed readings found.")
 
-    if error_count > 0:
-        messages.warning(request, f"⚠️ {error_count} readings could not be processed.")
-
     return redirect('consumers:meter_readings')
 
 
@@ -670,80 +416,39 @@ def export_barangay_readings(request, barangay_id):
     barangay = get_object_or_404(Barangay, id=barangay_id)
     current_month = date.today().replace(day=1)
 
-    # Get latest reading per consumer in this barangay
-    consumer_ids = Consumer.objects.filter(barangay=barangay).values_list('id', flat=True)
-    if not consumer_ids:
-        readings = MeterReading.objects.none()
-    else:
-        latest_date_subq = MeterReading.objects.filter(
-            consumer=OuterRef('pk')
-        ).order_by().values('consumer').annotate(
-            max_date=Max('reading_date')
-        ).values('max_date')[:1]
-
-        readings = MeterReading.objects.select_related('consumer').filter(
-            consumer__barangay=barangay,
-            reading_date=Subquery(latest_date_subq)
-        ).order_by('consumer__id')
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"{barangay.name} Readings"
-
-    headers = [
-        'ID Number',           # ← Changed from "Account ID"
-        'Consumer Name',
-        'Current',
-        'Previous',
-        'Consumption (m³)',
-        'Date',
-        'Status'
+    # Latest reading per consumer in this barangay, with its previous confirmed reading
+    latest = latest_readings_for(Consumer.objects.filter(barangay=barangay))
+    readings = sorted(latest.values(), key=lambda reading: reading.consumer_id)
+    consumers = Consumer.objects.in_bulk([reading.consumer_id for reading in readings])
+
+    columns = [
+        ExcelColumn('ID Number', 15),           # ← Changed from "Account ID"
+        ExcelColumn('Consumer Name', 30),
+        ExcelColumn('Current', 10, 'number'),
+        ExcelColumn('Previous', 10, 'number'),
+        ExcelColumn('Consumption (m³)', 18, 'number'),
+        ExcelColumn('Date', 12, 'center'),
+        ExcelColumn('Status', 12, 'center'),
     ]
-    ws.append(headers)
 
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    for col in range(1, len(headers) + 1):
-        ws.cell(1, col).fill = header_fill
-        ws.cell(1, col).font = header_font
-
-    for r in readings:
-        prev = MeterReading.objects.filter(
-            consumer=r.consumer,
-            is_confirmed=True,
-            reading_date__lt=r.reading_date
-        ).order_by('-reading_date').first()
-        cons = (r.reading_value - prev.reading_value) if prev else '—'
-        display_id = get_consumer_display_id(r.consumer)
-
-        ws.append([
-            display_id,
-            f"{r.consumer.first_name} {r.consumer.last_name}",
-            r.reading_value,
-            prev.reading_value if prev else '—',
-            cons,
-            r.reading_date.strftime('%Y-%m-%d'),
-            'Confirmed' if r.is_confirmed else 'Pending'
-        ])
-
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 30)
-        ws.column_dimensions[column].width = adjusted_width
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def rows():
+        for r in readings:
+            consumer = consumers[r.consumer_id]
+            prev = r.prev_reading
+            yield [
+                get_consumer_display_id(consumer),
+                f"{consumer.first_name} {consumer.last_name}",
+                r.reading_value,
+                prev.reading_value if prev else '—',
+                (r.reading_value - prev.reading_value) if prev else '—',
+                r.reading_date.strftime('%Y-%m-%d'),
+                'Confirmed' if r.is_confirmed else 'Pending'
+            ]
+
+    return stream_excel(
+        f'Readings_{barangay.name}_{current_month.strftime("%Y-%m")}.xlsx',
+        f"{barangay.name} Readings", columns, rows(), border=False
     )
-    response['Content-Disposition'] = f'attachment; filename=Readings_{barangay.name}_{current_month.strftime("%Y-%m")}.xlsx'
-    wb.save(response)
-    return response
 
 
 # ============================================================================
@@ -816,7 +521,7 @@ def confirm_reading(request, reading_id):
 
         # Generate bill
         from ..utils import calculate_tiered_water_bill
-        setting = SystemSetting.objects.first()
+        setting = get_settings_snapshot()
 
         billing_day = setting.billing_day_of_month if setting else 1
         due_day = setting.due_day_of_month if setting else 20
@@ -1272,97 +977,11 @@ def confirm_selected_readings(request, barangay_id):
         messages.warning(request, "No readings were selected for confirmation.")
         return redirect('consumers:barangay_meter_readings', barangay_id=barangay_id)
 
-    success_count = 0
+    readings_to_confirm = MeterReading.objects.filter(id__in=reading_ids)
+    result = generate_bills_for_readings(readings_to_confirm, confirmed_by=request.user)
+    _report_billing_run(request, result)
 
-    # Process selected readings
-    error_count = 0
-    error_details = []
-    for reading_id in reading_ids:
-        try:
-            reading = MeterReading.objects.get(id=reading_id)
-            if reading.is_confirmed:
-                continue
-
-            consumer = reading.consumer
-            prev = MeterReading.objects.filter(
-                consumer=consumer,
-                is_confirmed=True,
-                reading_date__lt=reading.reading_date
-            ).order_by('-reading_date').first()
-
-            # Calculate consumption
-            if prev:
-                if reading.reading_value < prev.reading_value:
-                    continue
-                cons = reading.reading_value - prev.reading_value
-            else:
-                # First reading - use consumer's first_reading as baseline
-                baseline = consumer.first_reading if consumer.first_reading else 0
-                if reading.reading_value < baseline:
-                    continue
-                cons = reading.reading_value - baseline
-
-            # Get system settings and calculate using TIERED RATES
-            from ..utils import calculate_tiered_water_bill
-
-            setting = SystemSetting.objects.first()
-            if setting:
-                billing_day = setting.billing_day_of_month
-                due_day = setting.due_day_of_month
-            else:
-                billing_day = 1
-                due_day = 20
-
-            # Calculate bill using TIERED RATES
-            total, average_rate, breakdown = calculate_tiered_water_bill(
-                consumption=cons,
-                usage_type=consumer.usage_type,
-                settings=setting
-            )
-
-            Bill.objects.create(
-                consumer=consumer,
-                previous_reading=prev,
-                current_reading=reading,
-                billing_period=reading.reading_date.replace(day=billing_day),
-                due_date=reading.reading_date.replace(day=due_day),
-                consumption=cons,
-                # Store ACTUAL tier breakdown
-                tier1_consumption=breakdown['tier1_units'],
-                tier1_amount=breakdown['tier1_amount'],
-                tier2_consumption=breakdown['tier2_units'],
-                tier2_rate=breakdown['tier2_rate'],
-                tier2_amount=breakdown['tier2_amount'],
-                tier3_consumption=breakdown['tier3_units'],
-                tier3_rate=breakdown['tier3_rate'],
-                tier3_amount=breakdown['tier3_amount'],
-                tier4_consumption=breakdown['tier4_units'],
-                tier4_rate=breakdown['tier4_rate'],
-                tier4_amount=breakdown['tier4_amount'],
-                tier5_consumption=breakdown['tier5_units'],
-                tier5_rate=breakdown['tier5_rate'],
-                tier5_amount=breakdown['tier5_amount'],
-                rate_per_cubic=average_rate,
-                fixed_charge=Decimal('0.00'),
-                total_amount=total,
-                status='Pending'
-            )
-            reading.is_confirmed = True
-            reading.save()
-            success_count += 1
-        except Exception as e:
-            import logging
-            logging.error(f"Error confirming reading {reading_id}: {str(e)}")
-            error_count += 1
-            error_details.append(f"Reading {reading_id}: {str(e)}")
-            continue
-
-    if success_count > 0:
-        messages.success(request, f"✅ {success_count} readings confirmed and bills generated.")
-    elif error_count == 0 and success_count == 0:
+    if result['confirmed_count'] == 0 and not result['rejects']:
         messages.info(request, "No new readings to confirm (may already be confirmed).")
 
-    if error_count > 0:
-        messages.error(request, f"⚠️ {error_count} readings failed: {'; '.join(error_details[:3])}")
-
     return redirect('consumers:barangay_meter_readings', barangay_id=barangay_id)
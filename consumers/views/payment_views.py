@@ -50,54 +50,9 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
-
-
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
+from ..settings_cache import get_settings_snapshot
 
 
 # Helper function to get previous confirmed reading
@@ -158,32 +113,41 @@ def inquire(request):
     Displays consumers with pending bills and shows a water bill for the selected consumer.
     Users can uncheck newer months to issue a partial bill (oldest months first).
     """
-    from ..utils import calculate_penalty, update_bill_penalty, get_payment_breakdown
+    from ..utils import get_payment_breakdown, sweep_penalties
 
     # Get system settings for penalty calculation
-    system_settings = SystemSetting.objects.first()
+    system_settings = get_settings_snapshot()
 
     # ===== GET REQUEST - Show only consumers with pending bills =====
     selected_consumer_id = request.GET.get('consumer')
     selected_barangay = request.GET.get('barangay', '')
 
-    # Load all active consumers
-    consumers = Consumer.objects.filter(status='active').select_related('barangay', 'purok').order_by('last_name', 'first_name')
+    # Annotate each active consumer with its latest pending bill in one query.
+    # Penalties shown in the list are the stored values kept current by the
+    # sweep_penalties maintenance task (or manage.py update_penalties), not
+    # recomputed per request.
+    latest_pending_bill = Bill.objects.filter(
+        consumer=OuterRef('pk'),
+        status='Pending'
+    ).order_by('-billing_period').values('id')[:1]
+
+    consumers = Consumer.objects.filter(status='active').select_related('barangay', 'purok').annotate(
+        latest_pending_bill_id=Subquery(latest_pending_bill)
+    ).filter(latest_pending_bill_id__isnull=False).order_by('last_name', 'first_name')
 
     # Apply barangay filter
     if selected_barangay:
         consumers = consumers.filter(barangay_id=selected_barangay)
 
-    # Build consumer bills dictionary - only pending bills
-    consumer_bills = {}
-    for c in consumers:
-        bill = c.bills.filter(status='Pending').order_by('-billing_period').first()
-        if bill:
-            update_bill_penalty(bill, system_settings, save=True)
-            consumer_bills[c.id] = bill
-
     # Show only consumers with pending bills
-    consumers = [c for c in consumers if c.id in consumer_bills]
+    consumers = list(consumers)
+
+    bills_by_id = Bill.objects.in_bulk([c.latest_pending_bill_id for c in consumers])
+
+    # Build consumer bills dictionary - only pending bills. A bill paid or
+    # deleted since the consumer query drops its consumer from the list.
+    consumers = [c for c in consumers if c.latest_pending_bill_id in bills_by_id]
+    consumer_bills = {c.id: bills_by_id[c.latest_pending_bill_id] for c in consumers}
 
     # Load barangays for filter dropdown
     barangays = Barangay.objects.all().order_by('name')
@@ -194,6 +158,10 @@ def inquire(request):
 
     if selected_consumer_id:
         selected_consumer = get_object_or_404(Consumer, id=selected_consumer_id)
+
+        # Recompute penalties on demand only for the consumer being billed
+        sweep_penalties(selected_consumer.bills.filter(status='Pending'), system_settings)
+
         latest_bill = selected_consumer.bills.filter(status='Pending').order_by('-billing_period').first()
 
         if latest_bill:
@@ -201,8 +169,6 @@ def inquire(request):
 
         # Get all pending bills for ledger-style water bill display
         pending_bills = selected_consumer.bills.filter(status='Pending').order_by('billing_period')
-        for bill in pending_bills:
-            update_bill_penalty(bill, system_settings, save=True)
 
     # Count total pending bills
     total_pending_bills = Bill.objects.filter(status='Pending').count()
@@ -240,7 +206,7 @@ def process_payment(request):
     from ..utils import update_bill_penalty, get_payment_breakdown
     from ..models import Notification
 
-    system_settings = SystemSetting.objects.first()
+    system_settings = get_settings_snapshot()
 
     selected_consumer_id = request.GET.get('consumer')
     selected_barangay = request.GET.get('barangay', '')
@@ -420,7 +386,7 @@ def water_bill_print(request, consumer_id):
     """
     from ..utils import update_bill_penalty
 
-    system_settings = SystemSetting.objects.first()
+    system_settings = get_settings_snapshot()
     consumer = get_object_or_404(Consumer.objects.select_related('barangay', 'purok'), id=consumer_id)
 
     # Support partial bill: ?bills=id1,id2,id3
@@ -50,56 +50,10 @@ from ..models import (
     StaffProfile, UserLoginEvent, MeterBrand, PasswordResetToken, UserActivity,
     SystemSettingChangeLog, Notification
 )
+from ..api_auth import authenticate_api_request
 from ..forms import ConsumerForm
 
 
-# Helper function to authenticate API requests using session token
-def authenticate_api_request(request):
-    """
-    Authenticate API request using session token from Authorization header or request body.
-    Returns the user if authenticated, None otherwise.
-    """
-    from django.contrib.sessions.models import Session
-
-    token = None
-
-    # Try Authorization header first (Bearer token)
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header[7:]
-
-    # Try request body if no header token
-    if not token and request.body:
-        try:
-            data = json.loads(request.body.decode('utf-8'))
-            token = data.get('token')
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            pass
-
-    if not token:
-        return None
-
-    try:
-        # Find the session by key
-        session = Session.objects.get(session_key=token)
-
-        # Check if session is expired
-        if session.expire_date < timezone.now():
-            return None
-
-        # Get user from session data
-        session_data = session.get_decoded()
-        user_id = session_data.get('_auth_user_id')
-
-        if user_id:
-            user = User.objects.get(id=user_id)
-            return user
-    except (Session.DoesNotExist, User.DoesNotExist):
-        pass
-
-    return None
-
-
 # Helper function to get previous confirmed reading
 def get_previous_reading(consumer):
     """Get the most recent confirmed meter reading for a consumer."""
@@ -140,7 +94,7 @@ def reports(request):
     Supports cross-year date ranges via year_from + month_from → year_to + month_to.
     """
     import calendar as cal
-    from django.db.models.functions import ExtractMonth, ExtractYear
+    from ..models import MonthlyRollup
 
     now = datetime.now()
     current_year = now.year
@@ -197,21 +151,24 @@ def reports(request):
             m = 1
             y += 1
 
+    # Income and consumption come from the precomputed monthly rollups,
+    # so the cost stays flat no matter how much payment history exists
+    range_rollups = MonthlyRollup.objects.annotate(
+        period_index=F('year') * 12 + F('month')
+    ).filter(
+        period_index__gte=year_from * 12 + month_from,
+        period_index__lte=year_to * 12 + month_to,
+        payment_count__gt=0,
+    )
+
     # --- All Barangays: monthly totals (income + consumption) ---
     monthly_qs = (
-        Payment.objects.filter(
-            payment_date__date__gte=from_date,
-            payment_date__date__lte=to_date,
-        )
-        .annotate(
-            yr=ExtractYear('payment_date'),
-            mo=ExtractMonth('payment_date'),
-        )
-        .values('yr', 'mo')
-        .annotate(total=Sum('amount_paid'), consumption=Sum('bill__consumption'))
-        .order_by('yr', 'mo')
+        range_rollups
+        .values('year', 'month')
+        .annotate(total=Sum('income'), consumption=Sum('paid_consumption'))
+        .order_by('year', 'month')
     )
-    monthly_dict = {(row['yr'], row['mo']): row for row in monthly_qs}
+    monthly_dict = {(row['year'], row['month']): row for row in monthly_qs}
     monthly_data = []
     range_total_income = 0
     range_total_consumption = 0
@@ -234,27 +191,20 @@ def reports(request):
 
     # --- Per Barangay: monthly totals (income + consumption) ---
     per_brgy_qs = (
-        Payment.objects.filter(
-            payment_date__date__gte=from_date,
-            payment_date__date__lte=to_date,
-        )
-        .annotate(
-            yr=ExtractYear('payment_date'),
-            mo=ExtractMonth('payment_date'),
-        )
-        .values('bill__consumer__barangay__id', 'bill__consumer__barangay__name', 'yr', 'mo')
-        .annotate(total=Sum('amount_paid'), consumption=Sum('bill__consumption'))
-        .order_by('bill__consumer__barangay__name', 'yr', 'mo')
+        range_rollups
+        .values('barangay__id', 'barangay__name', 'year', 'month')
+        .annotate(total=Sum('income'), consumption=Sum('paid_consumption'))
+        .order_by('barangay__name', 'year', 'month')
     )
     brgy_map = {}
     for row in per_brgy_qs:
-        brgy_id = row['bill__consumer__barangay__id']
-        brgy_name = row['bill__consumer__barangay__name']
+        brgy_id = row['barangay__id']
+        brgy_name = row['barangay__name']
         if brgy_id not in brgy_map:
             brgy_map[brgy_id] = {'name': brgy_name, 'months': {}, 'range_total': 0, 'range_consumption': 0}
         amount = row['total'] or 0
         cons = row['consumption'] or 0
-        brgy_map[brgy_id]['months'][(row['yr'], row['mo'])] = {'total': amount, 'consumption': cons}
+        brgy_map[brgy_id]['months'][(row['year'], row['month'])] = {'total': amount, 'consumption': cons}
         brgy_map[brgy_id]['range_total'] += amount
         brgy_map[brgy_id]['range_consumption'] += cons
 
@@ -305,7 +255,7 @@ def barangay_report(request, barangay_id):
     Replicates the physical ledger book used by the waterworks office.
     """
     from datetime import date
-    import calendar
+    from ..ledger import get_barangay_ledger, invalidate_barangay_ledger
 
     barangay = get_object_or_404(Barangay, id=barangay_id)
 
@@ -316,52 +266,13 @@ def barangay_report(request, barangay_id):
     except (TypeError, ValueError):
         year = date.today().year
 
-    # Get all active consumers in this barangay, sorted by last name
-    consumers = Consumer.objects.filter(
-        barangay=barangay,
-        status='active'
-    ).order_by('last_name', 'first_name')
-
-    # Build ledger data for each consumer
-    month_names = [calendar.month_name[m] for m in range(1, 13)]
-    consumer_ledger = []
+    # ?refresh=1 rebuilds the precomputed ledger table for this barangay-year
+    if request.GET.get('refresh') == '1':
+        invalidate_barangay_ledger(barangay.id, year)
 
-    for consumer in consumers:
-        # Get all bills for this consumer in the selected year
-        bills = Bill.objects.filter(
-            consumer=consumer,
-            billing_period__year=year
-        ).select_related('consumer', 'current_reading')
-
-        # Get all payments for bills in this year
-        payments = Payment.objects.filter(
-            bill__consumer=consumer,
-            bill__billing_period__year=year
-        ).select_related('bill')
-
-        # Build month-by-month data
-        months_data = []
-        for month_num in range(1, 13):
-            bill = bills.filter(billing_period__month=month_num).first()
-            payment = payments.filter(bill__billing_period__month=month_num).first()
-
-            month_entry = {
-                'month': month_names[month_num - 1],
-                'consumption': bill.consumption if bill else '',
-                'amount_due': bill.total_amount if bill else '',
-                'penalty': bill.effective_penalty if bill and bill.effective_penalty > 0 else '',
-                'amount_paid': payment.amount_paid if payment else '',
-                'receipt_number': payment.or_number if payment else '',
-                'date_issued': payment.payment_date if payment else '',
-                'reading': bill.current_reading.reading_value if bill and bill.current_reading else '',
-                'initial': '',
-            }
-            months_data.append(month_entry)
-
-        consumer_ledger.append({
-            'consumer': consumer,
-            'months': months_data,
-        })
+    # Build ledger data for all active consumers (sorted by last name)
+    # from one bills query and one payments query
+    consumer_ledger = get_barangay_ledger(barangay, year)
 
     # Year range for selector (registration year of earliest consumer to current year + 1)
     current_year = date.today().year
@@ -374,7 +285,7 @@ def barangay_report(request, barangay_id):
         'year': year,
         'year_choices': year_choices,
         'consumer_ledger': consumer_ledger,
-        'consumer_count': consumers.count(),
+        'consumer_count': len(consumer_ledger),
     }
 
     return render(request, 'consumers/barangay_report.html', context)
@@ -383,12 +294,9 @@ def barangay_report(request, barangay_id):
 
 @login_required
 def export_report_excel(request):
-    """Export report as Excel (.xlsx) file with formatting"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from io import BytesIO
+    """Export report as Excel (.xlsx) file with formatting, streamed in constant memory"""
     from datetime import datetime
+    from ..exports import EXPORT_CHUNK_SIZE, ExcelColumn, TitleLine, stream_excel
 
     report_type = request.GET.get('report_type', 'revenue')
     date_from_str = request.GET.get('date_from')
@@ -403,183 +311,108 @@ def export_report_excel(request):
     except:
         return HttpResponse("Invalid date format", status=400)
 
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-
     # Date range for display
     date_range_display = f"{date_from.strftime('%B %d, %Y')} - {date_to.strftime('%B %d, %Y')}"
     date_range_short = f"{date_from.strftime('%Y%m%d')}-{date_to.strftime('%Y%m%d')}"
 
-    # Styling
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    title_font = Font(bold=True, size=14)
-    total_font = Font(bold=True, size=11)
-    total_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    def title_lines(title):
+        return [
+            TitleLine(f"BALILIHAN WATERWORKS - {title}", 'title'),
+            TitleLine(f"Period: {date_range_display}"),
+            TitleLine(f"Generated: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}"),
+        ]
+
+    # Running totals filled in while rows stream out
+    totals = {}
 
     if report_type == 'revenue':
         # Revenue Report
-        ws.title = f"Revenue Report"
-
-        # Title
-        ws['A1'] = "BALILIHAN WATERWORKS - REVENUE REPORT"
-        ws['A1'].font = title_font
-        ws['A2'] = f"Period: {date_range_display}"
-        ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}"
-
-        # Headers
-        headers = ['OR Number', 'Consumer Name', 'ID Number', 'Payment Date', 'Amount Paid', 'Change Given', 'Total Received']
-        ws.append([])  # Empty row
-        ws.append(headers)
-
-        header_row = ws[5]
-        for cell in header_row:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-
-        # Data
+        columns = [
+            ExcelColumn('OR Number', 14),
+            ExcelColumn('Consumer Name', 30),
+            ExcelColumn('ID Number', 14),
+            ExcelColumn('Payment Date', 14),
+            ExcelColumn('Amount Paid', 14, 'money'),
+            ExcelColumn('Change Given', 14, 'money'),
+            ExcelColumn('Total Received', 16, 'money'),
+        ]
         payments = Payment.objects.filter(
             payment_date__gte=date_from,
             payment_date__lte=date_to
         ).select_related('bill__consumer').order_by('payment_date')
-
-        total_amount = 0
-        total_change = 0
-        total_received = 0
-
-        for payment in payments:
-            consumer = payment.bill.consumer
-            ws.append([
-                payment.or_number,
-                consumer.full_name,
-                consumer.id_number or '—',
-                payment.payment_date.strftime('%Y-%m-%d'),
-                float(payment.amount_paid),
-                float(payment.change),
-                float(payment.received_amount)
-            ])
-            total_amount += payment.amount_paid
-            total_change += payment.change
-            total_received += payment.received_amount
-
-        # Total row
-        total_row = ws.max_row + 1
-        ws[f'A{total_row}'] = 'TOTAL'
-        ws[f'A{total_row}'].font = total_font
-        ws[f'E{total_row}'] = float(total_amount)
-        ws[f'F{total_row}'] = float(total_change)
-        ws[f'G{total_row}'] = float(total_received)
-
-        for col in ['A', 'E', 'F', 'G']:
-            ws[f'{col}{total_row}'].font = total_font
-            ws[f'{col}{total_row}'].fill = total_fill
-            ws[f'{col}{total_row}'].border = border
-
-        # Format currency columns
-        for row in range(6, ws.max_row + 1):
-            for col in ['E', 'F', 'G']:
-                ws[f'{col}{row}'].number_format = '₱#,##0.00'
-                ws[f'{col}{row}'].border = border
-                ws[f'{col}{row}'].alignment = Alignment(horizontal='right')
-
+        totals.update(amount=0, change=0, received=0)
+
+        def rows():
+            for payment in payments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                consumer = payment.bill.consumer
+                totals['amount'] += payment.amount_paid
+                totals['change'] += payment.change
+                totals['received'] += payment.received_amount
+                yield [
+                    payment.or_number,
+                    consumer.full_name,
+                    consumer.id_number or '—',
+                    payment.payment_date.strftime('%Y-%m-%d'),
+                    float(payment.amount_paid),
+                    float(payment.change),
+                    float(payment.received_amount)
+                ]
+
+        def total_row():
+            return ['TOTAL', None, None, None,
+                    float(totals['amount']), float(totals['change']), float(totals['received'])]
+
+        title = "REVENUE REPORT"
+        sheet_name = "Revenue Report"
         filename = f"Revenue_Report_{date_range_short}.xlsx"
 
     elif report_type == 'delinquency':
         # Delinquency Report
-        ws.title = f"Delinquency Report"
-
-        # Title
-        ws['A1'] = "BALILIHAN WATERWORKS - DELINQUENT ACCOUNTS REPORT"
-        ws['A1'].font = title_font
-        ws['A2'] = f"Period: {date_range_display}"
-        ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}"
-
-        # Headers
-        headers = ['ID Number', 'Consumer Name', 'Barangay', 'Billing Period', 'Due Date', 'Amount Due', 'Status']
-        ws.append([])
-        ws.append(headers)
-
-        header_row = ws[5]
-        for cell in header_row:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-
-        # Data
+        columns = [
+            ExcelColumn('ID Number', 14),
+            ExcelColumn('Consumer Name', 30),
+            ExcelColumn('Barangay', 18),
+            ExcelColumn('Billing Period', 16),
+            ExcelColumn('Due Date', 12),
+            ExcelColumn('Amount Due', 14, 'money'),
+            ExcelColumn('Status', 10),
+        ]
         bills = Bill.objects.filter(
             billing_period__gte=date_from,
             billing_period__lte=date_to,
             status__in=['Pending', 'Overdue']
         ).select_related('consumer__barangay').order_by('consumer__id_number')
-
-        total_due = 0
-
-        for bill in bills:
-            consumer = bill.consumer
-            ws.append([
-                consumer.id_number or '—',
-                consumer.full_name,
-                consumer.barangay.name if consumer.barangay else 'N/A',
-                bill.billing_period.strftime('%B %Y'),
-                bill.due_date.strftime('%Y-%m-%d'),
-                float(bill.total_amount),
-                bill.status
-            ])
-            total_due += bill.total_amount
-
-        # Total row
-        total_row = ws.max_row + 1
-        ws[f'A{total_row}'] = 'TOTAL DELINQUENT AMOUNT'
-        ws[f'A{total_row}'].font = total_font
-        ws[f'F{total_row}'] = float(total_due)
-        ws[f'F{total_row}'].font = total_font
-        ws[f'F{total_row}'].fill = total_fill
-        ws[f'F{total_row}'].border = border
-        ws[f'F{total_row}'].number_format = '₱#,##0.00'
-
-        # Format currency column
-        for row in range(6, ws.max_row):
-            ws[f'F{row}'].number_format = '₱#,##0.00'
-            ws[f'F{row}'].border = border
-            ws[f'F{row}'].alignment = Alignment(horizontal='right')
-            for col in ['A', 'B', 'C', 'D', 'E', 'G']:
-                ws[f'{col}{row}'].border = border
-
+        totals.update(due=0)
+
+        def rows():
+            for bill in bills.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                consumer = bill.consumer
+                totals['due'] += bill.total_amount
+                yield [
+                    consumer.id_number or '—',
+                    consumer.full_name,
+                    consumer.barangay.name if consumer.barangay else 'N/A',
+                    bill.billing_period.strftime('%B %Y'),
+                    bill.due_date.strftime('%Y-%m-%d'),
+                    float(bill.total_amount),
+                    bill.status
+                ]
+
+        def total_row():
+            return ['TOTAL DELINQUENT AMOUNT', None, None, None, None, float(totals['due']), None]
+
+        title = "DELINQUENT ACCOUNTS REPORT"
+        sheet_name = "Delinquency Report"
         filename = f"Delinquency_Report_{date_range_short}.xlsx"
 
     elif report_type == 'summary':
         # Summary Report
-        ws.title = f"Summary Report"
-
-        # Title
-        ws['A1'] = "BALILIHAN WATERWORKS - PAYMENT SUMMARY REPORT"
-        ws['A1'].font = title_font
-        ws['A2'] = f"Period: {date_range_display}"
-        ws['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %I:%M %p')}"
-
-        # Headers
-        headers = ['ID Number', 'Consumer Name', 'Total Amount Paid', 'Number of Payments']
-        ws.append([])
-        ws.append(headers)
-
-        header_row = ws[5]
-        for cell in header_row:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-
-        # Data
+        columns = [
+            ExcelColumn('ID Number', 14),
+            ExcelColumn('Consumer Name', 36),
+            ExcelColumn('Total Amount Paid', 18, 'money'),
+            ExcelColumn('Number of Payments', 20, 'number'),
+        ]
         summary_data = Payment.objects.filter(
             payment_date__gte=date_from,
             payment_date__lte=date_to
@@ -594,66 +427,112 @@ def export_report_excel(request):
             total_paid=Sum('amount_paid'),
             count=Count('id')
         ).order_by('bill__consumer__id_number')
-
-        total_amount = 0
-        total_count = 0
-
-        for item in summary_data:
-            ws.append([
-                item['bill__consumer__id_number'] or '—',
-                item['bill__consumer__full_name'],
-                float(item['total_paid']),
-                item['count']
-            ])
-            total_amount += item['total_paid']
-            total_count += item['count']
-
-        # Total row
-        total_row = ws.max_row + 1
-        ws[f'A{total_row}'] = 'TOTAL'
-        ws[f'A{total_row}'].font = total_font
-        ws[f'C{total_row}'] = float(total_amount)
-        ws[f'D{total_row}'] = total_count
-
-        for col in ['A', 'B', 'C', 'D']:
-            ws[f'{col}{total_row}'].font = total_font
-            ws[f'{col}{total_row}'].fill = total_fill
-            ws[f'{col}{total_row}'].border = border
-
-        # Format currency column
-        for row in range(6, ws.max_row + 1):
-            ws[f'C{row}'].number_format = '₱#,##0.00'
-            ws[f'C{row}'].alignment = Alignment(horizontal='right')
-            for col in ['A', 'B', 'C', 'D']:
-                ws[f'{col}{row}'].border = border
-
+        totals.update(amount=0, count=0)
+
+        def rows():
+            for item in summary_data.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                totals['amount'] += item['total_paid']
+                totals['count'] += item['count']
+                yield [
+                    item['bill__consumer__id_number'] or '—',
+                    item['bill__consumer__full_name'],
+                    float(item['total_paid']),
+                    item['count']
+                ]
+
+        def total_row():
+            return ['TOTAL', None, float(totals['amount']), totals['count']]
+
+        title = "PAYMENT SUMMARY REPORT"
+        sheet_name = "Summary Report"
         filename = f"Payment_Summary_{date_range_short}.xlsx"
 
     else:
         return HttpResponse("Invalid report type", status=400)
 
-    # Auto-size columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to response
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return stream_excel(
+        filename, sheet_name, columns, rows(),
+        title_lines=title_lines(title), totals=total_row
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
+
+# ============================================================================
+# BACKGROUND REPORT JOBS
+# ============================================================================
+def _report_job_payload(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'title': job.get_kind_display(),
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('consumers:report_job_status', args=[job.id]),
+        'download_url': reverse('consumers:download_report_job', args=[job.id]) if job.status == 'done' else None,
+    }
+
+
+def _get_report_job(request, job_id):
+    from ..models import ReportJob
+
+    jobs = ReportJob.objects.select_related('requested_by')
+    if not request.user.is_superuser:
+        jobs = jobs.filter(requested_by=request.user)
+    return get_object_or_404(jobs, id=job_id)
+
+
+@login_required
+def request_report_job(request):
+    """
+    Queue a heavy report to be generated in the background.
+
+    POST /reports/jobs/ with 'kind' (see report_jobs.REPORT_JOB_KINDS) and
+    the same parameters as the synchronous download.
+
+    Returns 202 with the job's status, including the status_url to poll.
+    """
+    from ..report_jobs import enqueue_report_job
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        job = enqueue_report_job(request, request.POST.get('kind', ''), request.POST)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(_report_job_payload(job), status=202)
+
+
+@login_required
+def report_job_status(request, job_id):
+    """
+    Poll a report job.
+
+    GET /reports/jobs/<job_id>/
+
+    Returns status ('queued', 'running', 'done', 'failed'), progress and,
+    once done, the download_url.
+    """
+    return JsonResponse(_report_job_payload(_get_report_job(request, job_id)))
+
+
+@login_required
+def download_report_job(request, job_id):
+    """Download a finished report job's file (print views open in the browser)."""
+    from django.http import Http404, StreamingHttpResponse
+    from django.utils.http import content_disposition_header
+    from ..report_jobs import iter_artifact
+
+    job = _get_report_job(request, job_id)
+    if job.status != 'done' or not job.artifact_chunks.exists():
+        raise Http404("Report is not available")
+
+    response = StreamingHttpResponse(iter_artifact(job), content_type=job.content_type)
+    response['Content-Disposition'] = content_disposition_header(
+        not job.content_type.startswith('text/html'), job.artifact_name
+    )
+    response['Content-Length'] = job.artifact_size
     return response
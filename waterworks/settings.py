@@ -50,15 +50,20 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files
+    'consumers.middleware.ApiCompressionMiddleware',  # brotli/gzip for large API responses
     'corsheaders.middleware.CorsMiddleware',  # CORS for Android app
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'consumers.middleware.ApiTokenMiddleware',  # Cached bearer token auth for the Android app
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# API responses at least this many bytes are brotli/gzip compressed (see consumers/middleware.py)
+API_COMPRESSION_MIN_SIZE = config('API_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
 ROOT_URLCONF = 'waterworks.urls'
 
 TEMPLATES = [
@@ -93,6 +98,12 @@ if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
     }
+    # Large exports read through server-side cursors (queryset.iterator()).
+    # Neon's pooled endpoint (PgBouncer in transaction mode) cannot keep them
+    # open between statements; set this when DATABASE_URL points at the pooler.
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = config(
+        'DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool
+    )
 else:
     # Local development database (fallback to SQLite)
     DATABASES = {
@@ -237,6 +248,62 @@ EMAIL_TIMEOUT = 10  # seconds
 RESEND_API_KEY = config('RESEND_API_KEY', default='').strip()
 # resend integration removed
 
+# ============================================================================
+# SHARED CACHE
+# ============================================================================
+# Tokens, dashboard KPIs, notification badges and the settings snapshot are
+# invalidated by whichever process writes (web, run_report_jobs worker,
+# management commands), so every process must use the same cache:
+# - REDIS_URL set: Redis (requires the redis package)
+# - DATABASE_URL set: the database cache table (build.sh runs createcachetable)
+# - Neither (local SQLite development and tests): per-process memory cache
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif DATABASE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'waterworks_cache',
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int)},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ============================================================================
+# CACHE TIMEOUTS
+# ============================================================================
+# Seconds to keep the precomputed barangay ledger table (0 = build every time)
+BARANGAY_LEDGER_CACHE_TIMEOUT = config('BARANGAY_LEDGER_CACHE_TIMEOUT', default=0, cast=int)
+# Seconds before cached dashboard KPI counters are recomputed even without writes
+DASHBOARD_KPI_CACHE_TIMEOUT = config('DASHBOARD_KPI_CACHE_TIMEOUT', default=300, cast=int)
+# Seconds before cached navbar/sidebar notification badges are recomputed even without writes
+NOTIFICATION_BADGE_CACHE_TIMEOUT = config('NOTIFICATION_BADGE_CACHE_TIMEOUT', default=300, cast=int)
+# Read cashier remittance totals from the precomputed DailyRemittance table
+CASHIER_REMITTANCE_USE_DAILY_TABLE = config('CASHIER_REMITTANCE_USE_DAILY_TABLE', default=False, cast=bool)
+# Seconds to remember idempotency keys of mobile submissions (retries within this window are replayed)
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=7 * 24 * 3600, cast=int)
+# Seconds a resolved API token stays in the shared cache / in each worker's LRU, and the LRU size
+API_TOKEN_CACHE_TIMEOUT = config('API_TOKEN_CACHE_TIMEOUT', default=300, cast=int)
+API_TOKEN_LRU_TIMEOUT = config('API_TOKEN_LRU_TIMEOUT', default=30, cast=int)
+API_TOKEN_LRU_SIZE = config('API_TOKEN_LRU_SIZE', default=1024, cast=int)
+# Seconds the settings snapshot and mobile settings/rates responses stay cached (dropped on SystemSetting save)
+SETTINGS_RESPONSE_CACHE_TIMEOUT = config('SETTINGS_RESPONSE_CACHE_TIMEOUT', default=3600, cast=int)
+# Seconds each worker trusts its in-process settings snapshot without the shared version check succeeding
+SETTINGS_SNAPSHOT_LOCAL_TIMEOUT = config('SETTINGS_SNAPSHOT_LOCAL_TIMEOUT', default=30, cast=int)
+# Seconds a worker reuses its last successful settings version check (other processes' changes show up after this)
+SETTINGS_VERSION_CHECK_INTERVAL = config('SETTINGS_VERSION_CHECK_INTERVAL', default=1, cast=float)
+
 # ============================================================================
 
 # ============================================================================
@@ -272,6 +339,29 @@ except ImportError:
     # Silently skip if not installed
     pass
 
+# Proof images are stored in the ProofImageUpload row and uploaded by a background
+# worker pool (see consumers/uploads.py). Uploader: 'cloudinary', 'local' (MEDIA_ROOT) or a dotted path.
+PROOF_IMAGE_UPLOADER = config('PROOF_IMAGE_UPLOADER', default='cloudinary')
+PROOF_UPLOAD_WORKERS = config('PROOF_UPLOAD_WORKERS', default=2, cast=int)
+PROOF_UPLOAD_MAX_ATTEMPTS = config('PROOF_UPLOAD_MAX_ATTEMPTS', default=3, cast=int)
+PROOF_UPLOAD_RETRY_BACKOFF = config('PROOF_UPLOAD_RETRY_BACKOFF', default=2, cast=int)
+
+# Proof photos are downscaled, stripped of EXIF and recompressed before queueing
+# (see consumers/images.py). Format: 'WEBP' or 'JPEG'.
+PROOF_IMAGE_FORMAT = config('PROOF_IMAGE_FORMAT', default='WEBP')
+PROOF_IMAGE_QUALITY = config('PROOF_IMAGE_QUALITY', default=75, cast=int)
+PROOF_IMAGE_MAX_EDGE = config('PROOF_IMAGE_MAX_EDGE', default=1600, cast=int)
+PROOF_THUMBNAIL_EDGE = config('PROOF_THUMBNAIL_EDGE', default=320, cast=int)
+
+# Heavy reports can be queued and generated by the run_report_jobs worker process
+# (see consumers/report_jobs.py). Generated files are stored in the database, so the
+# web process can serve what the worker wrote.
+REPORT_JOB_POLL_INTERVAL = config('REPORT_JOB_POLL_INTERVAL', default=5, cast=float)
+REPORT_JOB_TIMEOUT = config('REPORT_JOB_TIMEOUT', default=1800, cast=int)
+REPORT_JOB_RETENTION_DAYS = config('REPORT_JOB_RETENTION_DAYS', default=7, cast=int)
+# The worker also runs due maintenance tasks (consumers/maintenance.py) at most this often
+REPORT_WORKER_MAINTENANCE_INTERVAL = config('REPORT_WORKER_MAINTENANCE_INTERVAL', default=60, cast=int)
+
 # Add Render domain to trusted origins dynamically
 if RENDER_ENVIRONMENT:
     render_external_url = config('RENDER_EXTERNAL_URL', default='')